@@ -0,0 +1,362 @@
+"""
+Audio format detection and header-only probing.
+
+Uploads are checked against format signatures while they stream in, so
+files that are not audio are rejected before they reach the disk. Once an
+upload is stored, `probe_file` reads duration, codec, sample rate and
+channel count from the container headers (a few kilobytes at the start
+and, for Ogg, the end of the file). Only when the headers are not enough
+does it fall back to ffprobe, bounded by a timeout.
+"""
+
+import json
+import os
+import struct
+import subprocess
+from pathlib import Path
+from typing import Any, BinaryIO, Dict, NamedTuple, Optional
+
+# Bytes needed to recognize every supported format
+SNIFF_BYTES = 12
+
+# How far into the file (after any ID3 tag) the first MPEG frame is searched for
+MPEG_SYNC_SEARCH_BYTES = 64 * 1024
+
+# Bytes read from the end of an Ogg file to find the last page's granule position
+OGG_TAIL_BYTES = 64 * 1024
+
+# A RIFF file may hold metadata chunks before its audio; give up after this many
+MAX_WAV_CHUNKS = 64
+
+# MPEG audio versions and layers that can start a frame (index 1 is reserved)
+_MPEG_VERSIONS = {0b00, 0b10, 0b11}
+_MPEG_LAYERS = {0b01, 0b10, 0b11}
+
+# Bitrates (kbit/s) by bitrate index, for (MPEG-1, layer) and (MPEG-2/2.5, layer)
+_MPEG1_BITRATES = {
+    1: (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    2: (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    3: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+}
+_MPEG2_BITRATES = {
+    1: (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    3: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_MPEG_SAMPLE_RATES = {0b11: (44100, 48000, 32000), 0b10: (22050, 24000, 16000), 0b00: (11025, 12000, 8000)}
+
+_WAV_CODECS = {1: "pcm_{sign}{bits}le", 3: "pcm_f{bits}le", 6: "pcm_alaw", 7: "pcm_mulaw"}
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class AudioInfo:
+    """Stream properties of an audio file; unknown values are None"""
+    __slots__ = ("format", "codec", "duration_seconds", "sample_rate", "channels")
+
+    def __init__(
+        self,
+        format: str,
+        codec: str = None,
+        duration_seconds: float = None,
+        sample_rate: int = None,
+        channels: int = None,
+    ):
+        self.format = format
+        self.codec = codec
+        self.duration_seconds = duration_seconds
+        self.sample_rate = sample_rate
+        self.channels = channels
+
+    def is_complete(self) -> bool:
+        return None not in (self.codec, self.duration_seconds, self.sample_rate, self.channels)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "duration": round(self.duration_seconds, 3) if self.duration_seconds is not None else None,
+            "codec": self.codec,
+            "sampleRate": self.sample_rate,
+            "channels": self.channels,
+        }
+
+
+def _is_mpeg_frame(header: bytes) -> bool:
+    if len(header) < 4 or header[0] != 0xFF or header[1] & 0xE0 != 0xE0:
+        return False
+    version = (header[1] >> 3) & 0b11
+    layer = (header[1] >> 1) & 0b11
+    bitrate_index = header[2] >> 4
+    sample_rate_index = (header[2] >> 2) & 0b11
+    return (
+        version in _MPEG_VERSIONS
+        and layer in _MPEG_LAYERS
+        and bitrate_index not in (0b0000, 0b1111)
+        and sample_rate_index != 0b11
+    )
+
+
+def sniff_format(header: bytes) -> Optional[str]:
+    """Audio format ("wav", "mp3", "flac" or "ogg") of a file starting with `header`, or None."""
+    if header[:4] == b"RIFF" and header[8:12] == b"WAVE":
+        return "wav"
+    if header[:4] == b"fLaC":
+        return "flac"
+    if header[:4] == b"OggS":
+        return "ogg"
+    if header[:3] == b"ID3" or _is_mpeg_frame(header):
+        return "mp3"
+    return None
+
+
+def _id3_size(header: bytes) -> int:
+    """Length of an ID3v2 tag at the start of `header` (0 if there is none)."""
+    if len(header) < 10 or header[:3] != b"ID3":
+        return 0
+    # Syncsafe integer: 7 bits per byte
+    size = (header[6] << 21) | (header[7] << 14) | (header[8] << 7) | header[9]
+    footer = 10 if header[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+class WavLayout(NamedTuple):
+    """Sample format and position of the audio in a RIFF/WAVE file"""
+    format_tag: int  # 1 = integer PCM, 3 = IEEE float (resolved for WAVE_FORMAT_EXTENSIBLE)
+    channels: int
+    sample_rate: int
+    byte_rate: int
+    bits_per_sample: int
+    data_offset: Optional[int]  # None if no data chunk was found
+    data_size: int
+
+
+def read_wav_layout(f: BinaryIO, file_size: int) -> Optional[WavLayout]:
+    """Walk the chunks of a WAV file for its `fmt ` and `data` chunks. None if there is no format."""
+    f.seek(12)
+    fmt_fields = None
+    for _ in range(MAX_WAV_CHUNKS):
+        chunk_header = f.read(8)
+        if len(chunk_header) < 8:
+            break
+        chunk_id, chunk_size = chunk_header[:4], struct.unpack("<I", chunk_header[4:])[0]
+        if chunk_id == b"fmt ":
+            fmt = f.read(min(chunk_size, 40))
+            if len(fmt) < 16:
+                return None
+            format_tag, channels, sample_rate, byte_rate, _, bits = struct.unpack("<HHIIHH", fmt[:16])
+            if format_tag == _WAVE_FORMAT_EXTENSIBLE and len(fmt) >= 26:
+                format_tag = struct.unpack("<H", fmt[24:26])[0]  # first two bytes of the sub-format GUID
+            fmt_fields = (format_tag, channels, sample_rate, byte_rate, bits)
+            f.seek(chunk_size - len(fmt) + (chunk_size & 1), os.SEEK_CUR)
+        elif chunk_id == b"data":
+            if fmt_fields is None:
+                return None
+            data_start = f.tell()
+            # Streamed WAVs may leave the size at 0 or 0xFFFFFFFF; use what is there
+            if chunk_size in (0, 0xFFFFFFFF) or data_start + chunk_size > file_size:
+                chunk_size = file_size - data_start
+            return WavLayout(*fmt_fields, data_start, chunk_size)
+        else:
+            f.seek(chunk_size + (chunk_size & 1), os.SEEK_CUR)
+    return WavLayout(*fmt_fields, None, 0) if fmt_fields else None
+
+
+def _probe_wav(f: BinaryIO, file_size: int) -> Optional[AudioInfo]:
+    layout = read_wav_layout(f, file_size)
+    if layout is None or not layout.sample_rate:
+        return None
+    codec = _WAV_CODECS.get(layout.format_tag, f"wav_0x{layout.format_tag:04x}")
+    bits = layout.bits_per_sample
+    return AudioInfo(
+        "wav",
+        codec=codec.format(sign="u" if bits == 8 else "s", bits=bits),
+        duration_seconds=layout.data_size / layout.byte_rate if layout.data_offset is not None and layout.byte_rate else None,
+        sample_rate=layout.sample_rate,
+        channels=layout.channels,
+    )
+
+
+def _probe_flac(f: BinaryIO, offset: int) -> Optional[AudioInfo]:
+    f.seek(offset + 4)
+    block_header = f.read(4)
+    # STREAMINFO is always the first metadata block
+    if len(block_header) < 4 or block_header[0] & 0x7F != 0:
+        return None
+    streaminfo = f.read(34)
+    if len(streaminfo) < 18:
+        return None
+    packed = int.from_bytes(streaminfo[10:18], "big")
+    sample_rate = packed >> 44
+    channels = ((packed >> 41) & 0b111) + 1
+    total_samples = packed & 0xFFFFFFFFF
+    return AudioInfo(
+        "flac",
+        codec="flac",
+        duration_seconds=total_samples / sample_rate if sample_rate and total_samples else None,
+        sample_rate=sample_rate or None,
+        channels=channels,
+    )
+
+
+def _probe_mp3(f: BinaryIO, offset: int, file_size: int) -> Optional[AudioInfo]:
+    f.seek(offset)
+    data = f.read(MPEG_SYNC_SEARCH_BYTES)
+    start = 0
+    while True:
+        start = data.find(b"\xff", start)
+        if start < 0 or start + 4 > len(data):
+            return None
+        if _is_mpeg_frame(data[start:start + 4]):
+            break
+        start += 1
+
+    header = data[start:start + 4]
+    version = (header[1] >> 3) & 0b11
+    layer = 4 - ((header[1] >> 1) & 0b11)
+    bitrates = _MPEG1_BITRATES if version == 0b11 else _MPEG2_BITRATES
+    bitrate = bitrates[layer][header[2] >> 4] * 1000
+    sample_rate = _MPEG_SAMPLE_RATES[version][(header[2] >> 2) & 0b11]
+    mono = header[3] >> 6 == 0b11
+    if layer == 1:
+        samples_per_frame = 384
+    elif layer == 3 and version != 0b11:
+        samples_per_frame = 576
+    else:
+        samples_per_frame = 1152
+
+    # A Xing/Info or VBRI header in the first frame holds the exact frame count
+    frames = None
+    side_info = (17 if mono else 32) if version == 0b11 else (9 if mono else 17)
+    xing = data[start + 4 + side_info:start + 4 + side_info + 12]
+    vbri = data[start + 36:start + 36 + 18]
+    if xing[:4] in (b"Xing", b"Info") and len(xing) == 12 and struct.unpack(">I", xing[4:8])[0] & 1:
+        frames = struct.unpack(">I", xing[8:12])[0]
+    elif vbri[:4] == b"VBRI" and len(vbri) == 18:
+        frames = struct.unpack(">I", vbri[14:18])[0]
+
+    if frames:
+        duration = frames * samples_per_frame / sample_rate
+    else:
+        # Constant bitrate: the audio bytes divided by the bitrate
+        duration = (file_size - offset - start) * 8 / bitrate
+    return AudioInfo(
+        "mp3",
+        codec=f"mp{layer}",
+        duration_seconds=duration,
+        sample_rate=sample_rate,
+        channels=1 if mono else 2,
+    )
+
+
+def _probe_ogg(f: BinaryIO, file_size: int) -> Optional[AudioInfo]:
+    f.seek(0)
+    page = f.read(27 + 255)
+    if len(page) < 28 or page[:4] != b"OggS":
+        return None
+    serial = page[14:18]
+    segments = page[26]
+    f.seek(27 + segments)
+    packet = f.read(32)
+
+    pre_skip = 0
+    if packet[:7] == b"\x01vorbis" and len(packet) >= 16:
+        info = AudioInfo("ogg", codec="vorbis", channels=packet[11], sample_rate=struct.unpack("<I", packet[12:16])[0])
+        granule_rate = info.sample_rate
+    elif packet[:8] == b"OpusHead" and len(packet) >= 16:
+        pre_skip = struct.unpack("<H", packet[10:12])[0]
+        input_rate = struct.unpack("<I", packet[12:16])[0]
+        info = AudioInfo("ogg", codec="opus", channels=packet[9], sample_rate=input_rate or 48000)
+        granule_rate = 48000  # Opus granule positions always count 48 kHz samples
+    else:
+        return None
+
+    # The granule position of the stream's last page is its length in samples
+    f.seek(max(0, file_size - OGG_TAIL_BYTES))
+    tail = f.read(OGG_TAIL_BYTES)
+    position = tail.rfind(b"OggS")
+    while position >= 0:
+        if tail[position + 14:position + 18] == serial:
+            granule = struct.unpack("<q", tail[position + 6:position + 14])[0]
+            if granule > 0 and granule_rate:
+                info.duration_seconds = max(0, granule - pre_skip) / granule_rate
+            break
+        position = tail.rfind(b"OggS", 0, position)
+    return info
+
+
+def probe_header(path: Path) -> Optional[AudioInfo]:
+    """Stream properties read from the file's headers alone, or None for unknown layouts."""
+    file_size = os.path.getsize(path)
+    with open(path, "rb") as f:
+        head = f.read(SNIFF_BYTES)
+        audio_format = sniff_format(head)
+        if audio_format == "mp3":
+            offset = _id3_size(head[:10])
+            f.seek(offset)
+            # FLAC files are sometimes prefixed with an ID3 tag as well
+            if f.read(4) == b"fLaC":
+                return _probe_flac(f, offset)
+            return _probe_mp3(f, offset, file_size)
+        if audio_format == "wav":
+            return _probe_wav(f, file_size)
+        if audio_format == "flac":
+            return _probe_flac(f, 0)
+        if audio_format == "ogg":
+            return _probe_ogg(f, file_size)
+    return None
+
+
+def probe_with_ffprobe(path: Path, timeout_seconds: float) -> Optional[AudioInfo]:
+    """Stream properties from ffprobe, or None if it is missing, fails or times out."""
+    try:
+        result = subprocess.run(
+            [
+                "ffprobe", "-v", "error",
+                "-select_streams", "a:0",
+                "-show_entries", "stream=codec_name,sample_rate,channels:format=format_name,duration",
+                "-of", "json",
+                str(path)
+            ],
+            capture_output=True,
+            text=True,
+            timeout=timeout_seconds
+        )
+        probed = json.loads(result.stdout or "{}")
+    except (OSError, subprocess.TimeoutExpired, ValueError):
+        return None
+
+    streams = probed.get("streams") or []
+    if not streams:
+        return None
+    stream, container = streams[0], probed.get("format", {})
+    duration = container.get("duration")
+    sample_rate = stream.get("sample_rate")
+    return AudioInfo(
+        (container.get("format_name") or "").split(",")[0] or None,
+        codec=stream.get("codec_name"),
+        duration_seconds=float(duration) if duration not in (None, "N/A") else None,
+        sample_rate=int(sample_rate) if sample_rate else None,
+        channels=stream.get("channels"),
+    )
+
+
+def probe_file(path: Path, ffprobe_timeout_seconds: float = 5.0) -> Optional[AudioInfo]:
+    """
+    Stream properties of an audio file.
+
+    Headers are parsed first; ffprobe only fills in what they could not
+    tell. Returns None if neither recognizes the file.
+    """
+    try:
+        info = probe_header(path)
+    except (OSError, struct.error, KeyError, IndexError):
+        info = None
+    if info is not None and info.is_complete():
+        return info
+
+    probed = probe_with_ffprobe(path, ffprobe_timeout_seconds)
+    if info is None:
+        return probed
+    if probed is not None:
+        for field in ("codec", "duration_seconds", "sample_rate", "channels"):
+            if getattr(info, field) is None:
+                setattr(info, field, getattr(probed, field))
+    return info
@@ -0,0 +1,182 @@
+"""
+Async repository layer used by request handlers
+"""
+
+import asyncio
+from datetime import datetime, timedelta
+from typing import Any, Callable, List, Optional, Dict
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from database.schema import Job, JobMetricRollup, UploadBlob, UploadBlobOwner
+from database.eta import QueueSnapshot
+from database.repositories import JobRepository, UploadBlobRepository, UserQuotaRepository
+from database.rate_limiter import DAY_SECONDS, RATE_LIMIT_BACKEND, rate_limiter, to_epoch
+from database.writer import db_writer
+
+
+async def _write(db: AsyncSession, mutation: Callable[[Session], Any]) -> Any:
+    """
+    Run a mutation with the synchronous repositories.
+
+    SQLite allows a single writer, so there mutations are handed to the
+    shared DatabaseWriter instead of opening a second write transaction.
+    """
+    if db.bind.dialect.name == "sqlite":
+        return await asyncio.wrap_future(db_writer.submit(mutation))
+    return await db.run_sync(mutation)
+
+
+class AsyncJobRepository:
+    """
+    Async counterpart of JobRepository.
+
+    Simple reads are issued directly through the async driver. Methods with
+    more logic (queue tracking, ETA estimation) run the synchronous
+    repository inside `AsyncSession.run_sync`, which still awaits the async
+    driver for every statement, so there is a single implementation of each.
+    On SQLite, writes go through the shared DatabaseWriter instead.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def create_job(
+        self,
+        job_id: str,
+        user_id: str,
+        input_path: str,
+        output_dir: str,
+        stems: int = 2,
+        original_filename: str = None,
+        file_size: int = None,
+        ip_address: str = None,
+        message: str = None,
+        lease_owner: str = None,
+        lease_seconds: int = None
+    ) -> Job:
+        """Create a new job record, leased to `lease_owner` if given"""
+        return await _write(
+            self.db,
+            lambda db: JobRepository(db).create_job(
+                job_id, user_id, input_path, output_dir, stems,
+                original_filename, file_size, ip_address, message,
+                lease_owner, lease_seconds
+            )
+        )
+
+    async def get_job(self, job_id: str) -> Optional[Job]:
+        """Get a job by ID"""
+        return await self.db.get(Job, job_id)
+
+    async def get_jobs(self, job_ids: List[str]) -> List[Job]:
+        """Get several jobs by ID in a single IN query"""
+        if not job_ids:
+            return []
+        result = await self.db.scalars(select(Job).where(Job.id.in_(job_ids)))
+        return list(result)
+
+    async def update_job(self, job_id: str, **fields) -> Optional[Job]:
+        """Update job status and progress (same fields as JobRepository.update_job)"""
+        return await _write(self.db, lambda db: JobRepository(db).update_job(job_id, **fields))
+
+    async def get_queue_snapshot(self) -> QueueSnapshot:
+        """Get predicted start times for every queued job"""
+        return await self.db.run_sync(lambda db: JobRepository(db).get_queue_snapshot())
+
+    async def get_queue_info(self, job_id: str = None) -> Dict[str, Any]:
+        """Get queue position and ETA for a queued job, or for a new job when no ID is given"""
+        return (await self.get_queue_snapshot()).info_for(job_id)
+
+
+class AsyncUserQuotaRepository:
+    """Async counterpart of UserQuotaRepository"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def try_consume(self, user_id: str, file_size_mb: float = 0) -> Dict[str, Any]:
+        """
+        Check the user's quota and, if allowed, count a new job against it.
+
+        With the in-memory limiter this is a dictionary lookup once the user
+        is loaded, and the new counts are written to `user_quotas` in the
+        background. With RATE_LIMIT_BACKEND=database the quota is checked and
+        consumed by one conditional UPDATE, so all API processes share it.
+        """
+        if RATE_LIMIT_BACKEND == "database":
+            return await _write(self.db, lambda db: UserQuotaRepository(db).consume_quota(user_id, file_size_mb))
+
+        if not rate_limiter.is_loaded(user_id):
+            quota, job_times = await _write(self.db, lambda db: _load_window(db, user_id))
+            rate_limiter.load(
+                user_id, quota.jobs_per_hour, quota.jobs_per_day, quota.max_file_size_mb,
+                [to_epoch(created_at) for created_at in job_times]
+            )
+
+        decision, counts = rate_limiter.try_acquire(user_id, file_size_mb)
+        if counts is not None:
+            now = datetime.utcnow()
+            # Not awaited: the counts are informational, the limiter is the source of truth
+            db_writer.submit(lambda db: UserQuotaRepository(db).save_usage(user_id, counts[0], counts[1], now))
+        return decision
+
+
+class AsyncUploadBlobRepository:
+    """Async counterpart of UploadBlobRepository"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_blob(self, sha256: str) -> Optional[UploadBlob]:
+        """Get a stored upload by content hash"""
+        return await self.db.get(UploadBlob, sha256)
+
+    async def get_owned_blob(self, sha256: str, user_id: str) -> Optional[UploadBlob]:
+        """Get a stored upload by content hash if the user uploaded it before"""
+        result = await self.db.scalars(
+            select(UploadBlob)
+            .join(UploadBlobOwner, UploadBlobOwner.sha256 == UploadBlob.sha256)
+            .where(UploadBlob.sha256 == sha256, UploadBlobOwner.user_id == user_id)
+        )
+        return result.first()
+
+    async def register_blob(
+        self,
+        sha256: str,
+        path: str,
+        file_size: int,
+        audio_format: str = None,
+        user_id: str = None,
+        **audio_fields
+    ) -> UploadBlob:
+        """Record an upload (or a repeated upload of the same bytes) by `user_id`"""
+        return await _write(
+            self.db,
+            lambda db: UploadBlobRepository(db).register_blob(
+                sha256, path, file_size, audio_format, user_id=user_id, **audio_fields
+            )
+        )
+
+
+class AsyncMetricRollupRepository:
+    """Async reads of aggregated job metrics"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_rollups(self, granularity: str, since: datetime) -> List[JobMetricRollup]:
+        """Buckets of a granularity starting at or after `since`, oldest first"""
+        result = await self.db.scalars(
+            select(JobMetricRollup)
+            .where(JobMetricRollup.granularity == granularity, JobMetricRollup.bucket_start >= since)
+            .order_by(JobMetricRollup.bucket_start, JobMetricRollup.model_name, JobMetricRollup.stems_count)
+        )
+        return list(result)
+
+
+def _load_window(db: Session, user_id: str):
+    quota_repo = UserQuotaRepository(db)
+    quota = quota_repo.get_or_create_quota(user_id)
+    since = datetime.utcnow() - timedelta(seconds=DAY_SECONDS)
+    return quota, quota_repo.get_recent_job_times(user_id, since)
@@ -3,54 +3,137 @@ Database configuration and session management for Singscape
 """
 
 import os
-from sqlalchemy import create_engine
+from pathlib import Path
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from typing import AsyncIterator
 from sqlalchemy.orm import sessionmaker, Session
-from sqlalchemy.pool import StaticPool
 from database.schema import Base
 
 # Database configuration
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Connection pool tuning for PostgreSQL
+# - pool_size / max_overflow: persistent and burst connections per process
+# - pool_recycle: replace connections older than this (seconds) before the
+#   server or a proxy drops them
+# - pool_pre_ping: test a connection on checkout so stale ones are replaced
+#   instead of failing the request
+POOL_SETTINGS = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE_SECONDS", "1800")),
+    "pool_timeout": int(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30")),
+    "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() == "true",
+}
+
+# SQLite tuning, applied to every new connection
+# - WAL lets readers run concurrently with the (single) writer
+# - synchronous=NORMAL is durable in WAL mode except for the last commits
+#   before a power loss
+# - busy_timeout waits for the write lock instead of failing with
+#   "database is locked" (e.g. while a worker process writes)
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),
+    "cache_size": -20000,  # KiB
+    "temp_store": "MEMORY",
+}
+
+
+def _configure_sqlite(sqlite_engine: Engine):
+    """Apply SQLITE_PRAGMAS and take over transaction control from the sqlite3 driver."""
+
+    @event.listens_for(sqlite_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        # The driver would otherwise BEGIN lazily (and not at all for
+        # SAVEPOINT); let SQLAlchemy emit BEGIN itself
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for name, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    @event.listens_for(sqlite_engine, "begin")
+    def _on_begin(connection):
+        # BEGIN IMMEDIATE takes the write lock up front for connections that will write
+        mode = connection.get_execution_options().get("sqlite_begin", "")
+        connection.exec_driver_sql(f"BEGIN {mode}".strip())
+
+
 # Use SQLite for development, PostgreSQL for production
 if DATABASE_URL and DATABASE_URL.startswith("postgresql"):
     # Production database
-    engine = create_engine(DATABASE_URL)
+    engine = create_engine(DATABASE_URL, **POOL_SETTINGS)
 else:
-    # Development database (SQLite)
+    # Development database (SQLite); one connection per thread from the default pool
     engine = create_engine(
         "sqlite:///./singscape.db",
         connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
     )
+    _configure_sqlite(engine)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for request handlers: same database, asyncpg / aiosqlite driver
+if engine.dialect.name == "postgresql":
+    async_engine = create_async_engine(engine.url.set(drivername="postgresql+asyncpg"), **POOL_SETTINGS)
+else:
+    async_engine = create_async_engine(engine.url.set(drivername="sqlite+aiosqlite"))
+    _configure_sqlite(async_engine.sync_engine)
+
+# Attributes must stay loaded after commit; lazy loads cannot run outside the driver's greenlet
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+# alembic.ini and migrations/ live next to the database package
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
 
 def create_tables():
     """Create all database tables"""
     Base.metadata.create_all(bind=engine)
 
 
-def get_db() -> Session:
-    """Get database session"""
-    db = SessionLocal()
-    try:
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """
+    FastAPI dependency yielding one async session per request.
+
+    Queries await the driver instead of blocking the event loop, so other
+    requests keep being served while this one waits on the database.
+    """
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+
+def run_migrations():
+    """Upgrade the database schema to the latest Alembic revision"""
+    alembic_cfg = Config(str(BACKEND_DIR / "alembic.ini"))
+    alembic_cfg.set_main_option("script_location", str(BACKEND_DIR / "migrations"))
+    alembic_cfg.attributes["configure_logger"] = False
+
+    with engine.begin() as connection:
+        alembic_cfg.attributes["connection"] = connection
+        tables = inspect(connection).get_table_names()
+        if "jobs" in tables and "alembic_version" not in tables:
+            # Tables were created by create_all() before migrations existed
+            command.stamp(alembic_cfg, "0001")
+        command.upgrade(alembic_cfg, "head")
 
 
 def init_database():
     """Initialize database with required tables and basic data"""
-    create_tables()
+    run_migrations()
     print("[Database] Database initialized successfully")
 
 
-# Database session dependency for FastAPI
-def get_db_session():
-    """FastAPI dependency for database session"""
-    db = SessionLocal()
-    try:
-        return db
-    finally:
-        db.close()
\ No newline at end of file
+def get_db_session() -> Session:
+    """
+    Open a session for work outside a request (background threads, workers).
+
+    The caller owns the session and must close it.
+    """
+    return SessionLocal()
@@ -0,0 +1,166 @@
+"""
+Queue ETA estimation from historical job throughput
+"""
+
+import heapq
+import os
+import statistics
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import desc
+from sqlalchemy.orm import Session
+from database.schema import JobMetric
+
+# Model used by AudioProcessor; jobs do not record a per-job model yet
+DEFAULT_MODEL = "htdemucs"
+
+
+class QueueSnapshot:
+    """Predicted start time of every queued job for one view of the queue"""
+
+    def __init__(self, processing_count: int, queued_ids: List[str], waits: List[float], tail_wait: float):
+        self.processing_count = processing_count
+        self.queued_ids = queued_ids
+        self.waits = waits
+        self.tail_wait = tail_wait
+        self._index = {job_id: i for i, job_id in enumerate(queued_ids)}
+
+    def info_for(self, job_id: str = None) -> Dict[str, Any]:
+        """
+        Queue info for a queued job, or for a new job appended to the queue
+        when `job_id` is None or not queued.
+        """
+        index = self._index.get(job_id) if job_id is not None else None
+        if index is None:
+            jobs_ahead, wait = len(self.queued_ids), self.tail_wait
+        else:
+            jobs_ahead, wait = index, self.waits[index]
+
+        return {
+            "jobsAhead": jobs_ahead,
+            "currentlyProcessing": self.processing_count,
+            "position": jobs_ahead + 1,
+            "estimatedWaitSeconds": int(round(wait)),
+        }
+
+
+class QueueEtaEstimator:
+    """
+    Estimates queue wait times from the real-time factor of completed jobs.
+
+    The real-time factor (processing seconds per second of audio) is learned
+    per (model, stems) from recent successful job metrics. Each job's
+    predicted run time is its audio duration times that factor; running jobs
+    contribute only their remaining share. Predicted work is then scheduled
+    in queue order onto the available execution slots to find when each
+    queued job will start.
+    """
+
+    def __init__(
+        self,
+        slots: int = 1,
+        default_job_seconds: float = 240.0,
+        history_days: int = 30,
+        history_limit: int = 1000,
+        refresh_seconds: float = 300.0,
+    ):
+        self.slots = max(1, slots)
+        self.default_job_seconds = default_job_seconds
+        self.history_days = history_days
+        self.history_limit = history_limit
+        self.refresh_seconds = refresh_seconds
+        self._rtf: Dict[Tuple[str, int], float] = {}
+        self._default_rtf: Optional[float] = None
+        self._median_duration: Optional[float] = None
+        self._refreshed_at = 0.0
+        self._lock = threading.Lock()
+
+    def refresh(self, db: Session, force: bool = False) -> None:
+        """Re-learn real-time factors from recent metrics if the cache is stale."""
+        if not force and time.monotonic() - self._refreshed_at < self.refresh_seconds:
+            return
+
+        cutoff = datetime.utcnow() - timedelta(days=self.history_days)
+        rows = (
+            db.query(
+                JobMetric.model_name,
+                JobMetric.stems_count,
+                JobMetric.processing_time_seconds,
+                JobMetric.audio_duration_seconds,
+            )
+            .filter(
+                JobMetric.recorded_at >= cutoff,
+                JobMetric.success == True,
+                JobMetric.audio_duration_seconds > 0,
+                JobMetric.processing_time_seconds > 0,
+            )
+            .order_by(desc(JobMetric.recorded_at))
+            .limit(self.history_limit)
+            .all()
+        )
+
+        samples: Dict[Tuple[str, int], List[float]] = {}
+        durations = []
+        for model_name, stems_count, processing_time, audio_duration in rows:
+            key = (model_name or DEFAULT_MODEL, stems_count or 2)
+            samples.setdefault(key, []).append(processing_time / audio_duration)
+            durations.append(audio_duration)
+
+        with self._lock:
+            self._rtf = {key: statistics.median(values) for key, values in samples.items()}
+            all_rtf = [rtf for values in samples.values() for rtf in values]
+            self._default_rtf = statistics.median(all_rtf) if all_rtf else None
+            self._median_duration = statistics.median(durations) if durations else None
+            self._refreshed_at = time.monotonic()
+
+    def predict_seconds(self, stems: int, audio_duration: float = None, model: str = DEFAULT_MODEL) -> float:
+        """Predicted processing time of a whole job."""
+        with self._lock:
+            rtf = self._rtf.get((model, stems or 2), self._default_rtf)
+            duration = audio_duration or self._median_duration
+
+        if rtf is None or not duration:
+            return self.default_job_seconds
+        return rtf * duration
+
+    def snapshot(self, processing: List[Any], queued: List[Any]) -> QueueSnapshot:
+        """
+        Build a QueueSnapshot.
+
+        `processing` rows need `stems`, `audio_duration_seconds`, `progress`
+        and `processing_started_at`; `queued` rows need `id`, `stems` and
+        `audio_duration_seconds`, in queue order.
+        """
+        now = datetime.utcnow()
+        slots = max(self.slots, len(processing))
+
+        # Time until each busy slot frees up
+        free_at = [0.0] * slots
+        for i, job in enumerate(processing):
+            progress = min(job.progress or 0, 100)
+            remaining = self.predict_seconds(job.stems, job.audio_duration_seconds) * (1 - progress / 100.0)
+            if job.processing_started_at and progress > 0:
+                # Extrapolate from the job's own observed rate once it reports progress
+                elapsed = (now - job.processing_started_at).total_seconds()
+                remaining = elapsed * (100 - progress) / progress
+            free_at[i] = remaining
+        heapq.heapify(free_at)
+
+        waits = []
+        for job in queued:
+            start = heapq.heappop(free_at)
+            waits.append(start)
+            heapq.heappush(free_at, start + self.predict_seconds(job.stems, job.audio_duration_seconds))
+
+        return QueueSnapshot(
+            processing_count=len(processing),
+            queued_ids=[job.id for job in queued],
+            waits=waits,
+            tail_wait=free_at[0],
+        )
+
+
+# Shared estimator; EXECUTION_SLOTS is the number of jobs that run in parallel
+eta_estimator = QueueEtaEstimator(slots=int(os.getenv("EXECUTION_SLOTS", "1")))
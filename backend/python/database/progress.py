@@ -0,0 +1,84 @@
+"""
+Batched progress updates for running jobs
+"""
+
+import threading
+from typing import Dict, Optional
+from database.repositories import JobRepository
+from database.writer import DatabaseWriter
+
+
+class ProgressBatcher:
+    """
+    Buffers the latest progress of each running job and writes all of them
+    to the jobs table in a single statement per interval, submitted through
+    the shared DatabaseWriter.
+
+    Status transitions are not batched; callers write them directly through
+    JobRepository.update_job after calling `discard` for the job.
+    """
+
+    def __init__(self, writer: DatabaseWriter, interval_seconds: float = 2.0):
+        self.writer = writer
+        self.interval_seconds = interval_seconds
+        self._pending: Dict[str, Dict[str, object]] = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def record(self, job_id: str, progress: int, message: str, lease_owner: str = None) -> None:
+        """
+        Buffer a progress update; only the latest update per job is written.
+
+        Updates with a `lease_owner` are dropped once that worker's lease on
+        the job is gone.
+        """
+        with self._lock:
+            self._pending[job_id] = {"progress": progress, "message": message, "lease_owner": lease_owner}
+
+        if self._thread is None:
+            self.flush()
+
+    def discard(self, job_id: str) -> None:
+        """Drop any buffered update for a job, e.g. before writing a terminal state."""
+        with self._lock:
+            self._pending.pop(job_id, None)
+
+    def flush(self) -> int:
+        """Write all buffered updates in one transaction. Returns the number of jobs updated."""
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+
+        if not pending:
+            return 0
+
+        try:
+            return self.writer.run(lambda db: JobRepository(db).bulk_update_progress(pending))
+        except Exception as e:
+            print(f"[Jobs] Failed to write progress for {len(pending)} jobs: {e}")
+            return 0
+
+    def start(self) -> None:
+        """Start the background flush thread."""
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="job-progress-batcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread and flush everything still buffered."""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval_seconds + 5)
+            self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wake.wait(self.interval_seconds)
+            self._wake.clear()
+            self.flush()
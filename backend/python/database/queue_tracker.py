@@ -0,0 +1,137 @@
+"""
+In-memory queue counters maintained on job state transitions
+"""
+
+import bisect
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from database.eta import QueueEtaEstimator, QueueSnapshot
+from database.schema import Job
+
+
+class TrackedJob:
+    """Fields of a queued or processing job that the ETA estimator needs"""
+    __slots__ = ("id", "stems", "audio_duration_seconds", "progress", "processing_started_at")
+
+    def __init__(self, job_id: str, stems: int, audio_duration_seconds: float = None,
+                 progress: int = 0, processing_started_at: datetime = None):
+        self.id = job_id
+        self.stems = stems
+        self.audio_duration_seconds = audio_duration_seconds
+        self.progress = progress
+        self.processing_started_at = processing_started_at
+
+
+class QueueTracker:
+    """
+    Queue depth, processing count and queue order kept in memory.
+
+    Repository methods report every state transition, so counts are O(1)
+    and a job's position is a binary search over the ordered queue instead
+    of a COUNT(*) scan. Transitions made by other processes (e.g. standalone
+    workers) are picked up by `reconcile`, which rebuilds the state from the
+    jobs table and should run on a timer.
+    """
+
+    def __init__(self, snapshot_ttl_seconds: float = 5.0):
+        self.snapshot_ttl_seconds = snapshot_ttl_seconds
+        self._order: List[Tuple[datetime, str]] = []  # sorted (created_at, job_id)
+        self._queued: Dict[str, Tuple[Tuple[datetime, str], TrackedJob]] = {}
+        self._processing: Dict[str, TrackedJob] = {}
+        self._snapshot: Optional[QueueSnapshot] = None
+        self._snapshot_at = 0.0
+        self._ready = False
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        """True once the tracker has been reconciled against the database."""
+        return self._ready
+
+    def counts(self) -> Tuple[int, int]:
+        """Return (queued, processing) job counts."""
+        return len(self._queued), len(self._processing)
+
+    def observe(self, job: Job) -> None:
+        """Record the current state of a job after it was written to the database."""
+        with self._lock:
+            self._remove(job.id)
+            if job.status == "queued":
+                key = (job.created_at, job.id)
+                bisect.insort(self._order, key)
+                self._queued[job.id] = (key, TrackedJob(job.id, job.stems, job.audio_duration_seconds))
+            elif job.status == "processing":
+                self._processing[job.id] = TrackedJob(
+                    job.id, job.stems, job.audio_duration_seconds,
+                    job.progress or 0, job.processing_started_at
+                )
+            self._snapshot = None
+
+    def observe_progress(self, job_id: str, progress: int) -> None:
+        """Record progress of a processing job (does not invalidate the cached snapshot)."""
+        tracked = self._processing.get(job_id)
+        if tracked is not None:
+            tracked.progress = progress
+
+    def reconcile(self, db: Session) -> None:
+        """Rebuild the tracked state from the jobs table."""
+        rows = (
+            db.query(
+                Job.id, Job.status, Job.created_at, Job.stems,
+                Job.audio_duration_seconds, Job.progress, Job.processing_started_at
+            )
+            .filter(Job.status.in_(["queued", "processing"]))
+            .all()
+        )
+
+        order = []
+        queued = {}
+        processing = {}
+        for row in rows:
+            if row.status == "queued":
+                key = (row.created_at, row.id)
+                order.append(key)
+                queued[row.id] = (key, TrackedJob(row.id, row.stems, row.audio_duration_seconds))
+            else:
+                processing[row.id] = TrackedJob(
+                    row.id, row.stems, row.audio_duration_seconds,
+                    row.progress or 0, row.processing_started_at
+                )
+        order.sort()
+
+        with self._lock:
+            if self._ready and (len(queued), len(processing)) != self.counts():
+                print(
+                    f"[Queue] Reconciled counters: queued {len(self._queued)} -> {len(queued)}, "
+                    f"processing {len(self._processing)} -> {len(processing)}"
+                )
+            self._order = order
+            self._queued = queued
+            self._processing = processing
+            self._snapshot = None
+            self._ready = True
+
+    def snapshot(self, estimator: QueueEtaEstimator) -> QueueSnapshot:
+        """Return a QueueSnapshot of the tracked queue, cached until the next transition."""
+        with self._lock:
+            now = time.monotonic()
+            if self._snapshot is None or now - self._snapshot_at > self.snapshot_ttl_seconds:
+                queued = [self._queued[job_id][1] for _, job_id in self._order]
+                self._snapshot = estimator.snapshot(list(self._processing.values()), queued)
+                self._snapshot_at = now
+            return self._snapshot
+
+    def _remove(self, job_id: str) -> None:
+        entry = self._queued.pop(job_id, None)
+        if entry is not None:
+            index = bisect.bisect_left(self._order, entry[0])
+            if index < len(self._order) and self._order[index] == entry[0]:
+                del self._order[index]
+        self._processing.pop(job_id, None)
+
+
+# Shared tracker; the API process reconciles it on a timer
+queue_tracker = QueueTracker()
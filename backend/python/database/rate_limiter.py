@@ -0,0 +1,145 @@
+"""
+Sliding-window job rate limiting per user
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Deque, Dict, Iterable, Optional, Tuple
+
+HOUR_SECONDS = 3600
+DAY_SECONDS = 86400
+
+# "memory" checks quotas in this process; "database" checks and consumes them
+# with one conditional UPDATE on user_quotas, shared by all API processes
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+
+
+def to_epoch(value: datetime) -> float:
+    """Epoch seconds of a naive UTC datetime as stored in the database."""
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+def check_windows(
+    jobs_last_hour: int,
+    jobs_last_day: int,
+    jobs_per_hour: int,
+    jobs_per_day: int,
+    max_file_size_mb: int,
+    file_size_mb: float = 0,
+) -> Dict[str, Any]:
+    """Quota decision for the given window counts, in the shape returned by try_consume."""
+    if file_size_mb > max_file_size_mb:
+        return {"allowed": False, "reason": "FILE_TOO_LARGE", "limit": max_file_size_mb, "requested": file_size_mb}
+    if jobs_last_hour >= jobs_per_hour:
+        return {"allowed": False, "reason": "HOURLY_LIMIT", "limit": jobs_per_hour, "current": jobs_last_hour}
+    if jobs_last_day >= jobs_per_day:
+        return {"allowed": False, "reason": "DAILY_LIMIT", "limit": jobs_per_day, "current": jobs_last_day}
+    return {"allowed": True}
+
+
+class UserWindow:
+    """Limits and recent job start times of one user"""
+    __slots__ = ("jobs_per_hour", "jobs_per_day", "max_file_size_mb", "hour", "day")
+
+    def __init__(self, jobs_per_hour: int, jobs_per_day: int, max_file_size_mb: int):
+        self.jobs_per_hour = jobs_per_hour
+        self.jobs_per_day = jobs_per_day
+        self.max_file_size_mb = max_file_size_mb
+        # Ascending timestamps; neither can hold more than its limit, since
+        # a job is only recorded when both windows have room
+        self.hour: Deque[float] = deque()
+        self.day: Deque[float] = deque()
+
+    def expire(self, now: float) -> None:
+        hour_start = now - HOUR_SECONDS
+        while self.hour and self.hour[0] <= hour_start:
+            self.hour.popleft()
+        day_start = now - DAY_SECONDS
+        while self.day and self.day[0] <= day_start:
+            self.day.popleft()
+
+
+class SlidingWindowRateLimiter:
+    """
+    Exact hourly and daily job limits kept in memory.
+
+    Each user has two ascending rings of job start times, one per window.
+    Expired entries are dropped from the left, so a check is amortized
+    O(1) and never touches the database. A user's window is seeded once
+    from the jobs table (see `load`); afterwards the owner of the limiter
+    persists the counts to `user_quotas` in the background.
+
+    Only valid while a single API process creates jobs; with several
+    processes use the database-backed limiter instead.
+    """
+
+    def __init__(self, prune_every: int = 1000):
+        self.prune_every = prune_every
+        self._users: Dict[str, UserWindow] = {}
+        self._checks = 0
+        self._lock = threading.Lock()
+
+    def is_loaded(self, user_id: str) -> bool:
+        return user_id in self._users
+
+    def load(
+        self,
+        user_id: str,
+        jobs_per_hour: int,
+        jobs_per_day: int,
+        max_file_size_mb: int,
+        job_times: Iterable[float],
+    ) -> None:
+        """Seed a user's window with their limits and recent job start times."""
+        window = UserWindow(jobs_per_hour, jobs_per_day, max_file_size_mb)
+        now = time.time()
+        for started in sorted(job_times):
+            window.day.append(started)
+            window.hour.append(started)
+        window.expire(now)
+
+        with self._lock:
+            # Keep a window that another request seeded first; it may already hold newer jobs
+            self._users.setdefault(user_id, window)
+
+    def try_acquire(self, user_id: str, file_size_mb: float = 0) -> Tuple[Dict[str, Any], Optional[Tuple[int, int]]]:
+        """
+        Check a user's quota and, if allowed, record a job now.
+
+        Returns the quota decision and, when a job was recorded, the new
+        (hourly, daily) counts to persist. The user must have been loaded.
+        """
+        now = time.time()
+        with self._lock:
+            window = self._users[user_id]
+            window.expire(now)
+            decision = check_windows(
+                len(window.hour), len(window.day),
+                window.jobs_per_hour, window.jobs_per_day, window.max_file_size_mb,
+                file_size_mb,
+            )
+            if not decision["allowed"]:
+                return decision, None
+
+            window.hour.append(now)
+            window.day.append(now)
+            counts = (len(window.hour), len(window.day))
+
+            self._checks += 1
+            if self._checks % self.prune_every == 0:
+                self._prune(now)
+            return decision, counts
+
+    def _prune(self, now: float) -> None:
+        # Users without jobs in the last day are reloaded on their next request
+        for window in self._users.values():
+            window.expire(now)
+        for user_id in [user_id for user_id, window in self._users.items() if not window.day]:
+            del self._users[user_id]
+
+
+# Shared limiter for the API process
+rate_limiter = SlidingWindowRateLimiter()
@@ -2,11 +2,18 @@
 Database repository layer for job management
 """
 
+import os
+from collections import Counter
 from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Any
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, and_, or_
-from database.schema import Job, JobMetric, UserQuota
+from sqlalchemy.sql import func
+from sqlalchemy import desc, and_, or_, bindparam, case, delete, false, literal, literal_column, true, update
+from sqlalchemy.exc import IntegrityError
+from database.schema import Job, JobMetric, JobMetricRollup, JobMetricRollupWatermark, UploadBlob, UploadBlobOwner, UserQuota
+from database.eta import QueueSnapshot, eta_estimator
+from database.queue_tracker import queue_tracker
+from database.rate_limiter import check_windows
 
 
 class JobRepository:
@@ -24,9 +31,12 @@ class JobRepository:
         stems: int = 2,
         original_filename: str = None,
         file_size: int = None,
-        ip_address: str = None
+        ip_address: str = None,
+        message: str = None,
+        lease_owner: str = None,
+        lease_seconds: int = None
     ) -> Job:
-        """Create a new job record"""
+        """Create a new job record, leased to `lease_owner` if given (jobs run inline by an API process)"""
         job = Job(
             id=job_id,
             user_id=user_id,
@@ -36,18 +46,45 @@ class JobRepository:
             original_filename=original_filename,
             file_size=file_size,
             ip_address=ip_address,
+            message=message,
             auto_cleanup_at=datetime.utcnow() + timedelta(days=7)
         )
+        if lease_owner:
+            job.lease_owner = lease_owner
+            job.lease_expires_at = datetime.utcnow() + timedelta(seconds=lease_seconds)
+        
+        # Stream properties probed at upload time, so ETA and limits know them before processing
+        blob = self.db.query(UploadBlob).filter(UploadBlob.path == input_path).first()
+        if blob is not None:
+            job.file_size = file_size or blob.file_size
+            job.audio_duration_seconds = blob.audio_duration_seconds
+            job.audio_codec = blob.audio_codec
+            job.audio_sample_rate = blob.audio_sample_rate
+            job.audio_channels = blob.audio_channels
         
         self.db.add(job)
+        # The job keeps its upload alive (no-op for uploads stored before deduplication)
+        self.db.execute(
+            update(UploadBlob)
+            .where(UploadBlob.path == input_path)
+            .values(ref_count=UploadBlob.ref_count + 1)
+            .execution_options(synchronize_session=False)
+        )
         self.db.commit()
         self.db.refresh(job)
+        queue_tracker.observe(job)
         return job
     
     def get_job(self, job_id: str) -> Optional[Job]:
         """Get a job by ID"""
         return self.db.query(Job).filter(Job.id == job_id).first()
     
+    def get_jobs(self, job_ids: List[str]) -> List[Job]:
+        """Get several jobs by ID in a single IN query"""
+        if not job_ids:
+            return []
+        return self.db.query(Job).filter(Job.id.in_(job_ids)).all()
+    
     def update_job(
         self,
         job_id: str,
@@ -56,7 +93,8 @@ class JobRepository:
         message: str = None,
         error: str = None,
         stem_files: Dict[str, str] = None,
-        metadata: Dict[str, Any] = None
+        metadata: Dict[str, Any] = None,
+        audio_duration_seconds: float = None
     ) -> Optional[Job]:
         """Update job status and progress"""
         job = self.get_job(job_id)
@@ -66,6 +104,10 @@ class JobRepository:
         # Update fields if provided
         if status is not None:
             job.status = status
+            if status != "processing":
+                # Only a processing job can be owned by a worker
+                job.lease_owner = None
+                job.lease_expires_at = None
             if status == "processing" and not job.processing_started_at:
                 job.processing_started_at = datetime.utcnow()
             elif status in ["completed", "error"] and job.processing_started_at:
@@ -73,6 +115,9 @@ class JobRepository:
                 job.processing_duration_seconds = (
                     job.processing_completed_at - job.processing_started_at
                 ).total_seconds()
+            if status in ["completed", "error"]:
+                # Finished outputs start their life in the eviction order now
+                job.last_accessed_at = datetime.utcnow()
         
         if progress is not None:
             job.progress = progress
@@ -89,12 +134,337 @@ class JobRepository:
         if metadata is not None:
             job.metadata = metadata
         
+        if audio_duration_seconds is not None:
+            job.audio_duration_seconds = audio_duration_seconds
+        
         job.updated_at = datetime.utcnow()
         
         self.db.commit()
         self.db.refresh(job)
+        if status is not None:
+            queue_tracker.observe(job)
         return job
     
+    def finish_leased_job(
+        self,
+        job_id: str,
+        worker_id: str,
+        status: str,
+        progress: int = None,
+        message: str = None,
+        error: str = None,
+        stem_files: Dict[str, str] = None,
+        audio_duration_seconds: float = None
+    ) -> bool:
+        """
+        Record the outcome of a job a worker holds the lease for.
+
+        The UPDATE is fenced on the lease, so a worker whose lease expired and
+        whose job was re-claimed by another worker cannot overwrite the new
+        run. Returns False if the lease was lost.
+        """
+        job = self.get_job(job_id)
+        if not job:
+            return False
+        
+        now = datetime.utcnow()
+        values = {
+            "status": status,
+            "lease_owner": None,
+            "lease_expires_at": None,
+            "updated_at": now,
+            # Finished outputs start their life in the eviction order now
+            "last_accessed_at": now,
+        }
+        if job.processing_started_at:
+            values["processing_completed_at"] = now
+            values["processing_duration_seconds"] = (now - job.processing_started_at).total_seconds()
+        optional = {
+            "progress": progress,
+            "message": message,
+            "error": error,
+            "stem_files": stem_files,
+            "audio_duration_seconds": audio_duration_seconds,
+        }
+        values.update({name: value for name, value in optional.items() if value is not None})
+        
+        result = self.db.execute(
+            update(Job)
+            .where(
+                Job.id == job_id,
+                Job.lease_owner == worker_id,
+                Job.status == "processing",
+            )
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        if result.rowcount != 1:
+            return False
+        self.db.refresh(job)
+        queue_tracker.observe(job)
+        return True
+    
+    def bulk_update_progress(self, updates: Dict[str, Dict[str, Any]]) -> int:
+        """
+        Write progress and message for several processing jobs in one statement.
+
+        `updates` maps job ID to {"progress": ..., "message": ...}, plus
+        "lease_owner" for jobs run by a standalone worker. Rows that have
+        already left the processing state are not touched, so a late batch can
+        never overwrite a terminal status, and a worker's updates only land
+        while it still holds the job's lease.
+        """
+        if not updates:
+            return 0
+        
+        jobs_table = Job.__table__
+        stmt = (
+            jobs_table.update()
+            .where(jobs_table.c.id == bindparam("b_id"))
+            .where(jobs_table.c.status == "processing")
+            .values(
+                progress=bindparam("b_progress"),
+                message=bindparam("b_message"),
+                updated_at=bindparam("b_updated_at"),
+            )
+        )
+        leased_stmt = stmt.where(jobs_table.c.lease_owner == bindparam("b_lease_owner"))
+        now = datetime.utcnow()
+        params, leased_params = [], []
+        for job_id, fields in updates.items():
+            row = {
+                "b_id": job_id,
+                "b_progress": int(fields.get("progress") or 0),
+                "b_message": fields.get("message"),
+                "b_updated_at": now,
+            }
+            if fields.get("lease_owner"):
+                leased_params.append(dict(row, b_lease_owner=fields["lease_owner"]))
+            else:
+                params.append(row)
+        
+        if params:
+            self.db.execute(stmt, params)
+        if leased_params:
+            self.db.execute(leased_stmt, leased_params)
+        self.db.commit()
+        for job_id, fields in updates.items():
+            queue_tracker.observe_progress(job_id, int(fields.get("progress") or 0))
+        return len(params) + len(leased_params)
+    
+    def claim_next_job(self, worker_id: str, lease_seconds: int) -> Optional[Job]:
+        """
+        Atomically claim the oldest queued job for a worker.
+
+        On PostgreSQL the candidate row is locked with FOR UPDATE SKIP LOCKED so
+        concurrent workers never block on or claim the same job. SQLite has no
+        row locks but serializes writers, so the claim is a guarded UPDATE that
+        only succeeds while the row is still queued.
+        """
+        now = datetime.utcnow()
+        lease_fields = {
+            "status": "processing",
+            "lease_owner": worker_id,
+            "lease_expires_at": now + timedelta(seconds=lease_seconds),
+            "updated_at": now,
+        }
+        
+        if self.db.get_bind().dialect.name == "postgresql":
+            job = (
+                self.db.query(Job)
+                .filter(Job.status == "queued")
+                .order_by(Job.created_at)
+                .with_for_update(skip_locked=True)
+                .first()
+            )
+            if not job:
+                self.db.rollback()
+                return None
+            for field, value in lease_fields.items():
+                setattr(job, field, value)
+            job.attempts = (job.attempts or 0) + 1
+            if not job.processing_started_at:
+                job.processing_started_at = now
+            self.db.commit()
+            self.db.refresh(job)
+            queue_tracker.observe(job)
+            return job
+        
+        # Another worker may win the race for a candidate; try the next one
+        for _ in range(5):
+            candidate = (
+                self.db.query(Job.id)
+                .filter(Job.status == "queued")
+                .order_by(Job.created_at)
+                .first()
+            )
+            if not candidate:
+                self.db.rollback()
+                return None
+            result = self.db.execute(
+                update(Job)
+                .where(Job.id == candidate.id, Job.status == "queued")
+                .values(
+                    attempts=func.coalesce(Job.attempts, 0) + 1,
+                    processing_started_at=func.coalesce(Job.processing_started_at, now),
+                    **lease_fields
+                )
+                .execution_options(synchronize_session=False)
+            )
+            self.db.commit()
+            if result.rowcount == 1:
+                job = self.get_job(candidate.id)
+                queue_tracker.observe(job)
+                return job
+        return None
+    
+    def renew_lease(self, job_id: str, worker_id: str, lease_seconds: int) -> bool:
+        """Extend a worker's lease on a job. Returns False if the lease was lost."""
+        now = datetime.utcnow()
+        result = self.db.execute(
+            update(Job)
+            .where(
+                Job.id == job_id,
+                Job.lease_owner == worker_id,
+                Job.status == "processing",
+            )
+            .values(lease_expires_at=now + timedelta(seconds=lease_seconds))
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        return result.rowcount == 1
+    
+    def renew_owner_leases(self, owner: str, lease_seconds: int) -> List[str]:
+        """
+        Extend the lease on every queued or processing job of an API process.
+
+        Returns the IDs of the jobs it still owns; a job missing from the
+        result was taken over by another process.
+        """
+        now = datetime.utcnow()
+        rows = self.db.execute(
+            update(Job)
+            .where(Job.lease_owner == owner, Job.status.in_(["queued", "processing"]))
+            .values(lease_expires_at=now + timedelta(seconds=lease_seconds))
+            .returning(Job.id)
+            .execution_options(synchronize_session=False)
+        ).all()
+        self.db.commit()
+        return [row.id for row in rows]
+    
+    def take_over_jobs(
+        self,
+        owner: str,
+        lease_seconds: int,
+        expired_only: bool = True,
+        max_attempts: int = None
+    ) -> List[Job]:
+        """
+        Lease queued and processing jobs of API processes that are gone to `owner`.
+
+        With `expired_only` only jobs whose owner stopped renewing its lease
+        are taken (a crashed process); otherwise every queued or processing
+        job is (after a full restart). Each takeover is an UPDATE guarded on
+        the lease seen when reading, so two processes never take the same
+        job. With `max_attempts`, a job already taken over that many times
+        is failed instead. Returns the jobs taken over, reset to queued,
+        oldest first.
+        """
+        now = datetime.utcnow()
+        query = self.db.query(Job).filter(Job.status.in_(["queued", "processing"]))
+        if expired_only:
+            query = query.filter(Job.lease_expires_at.isnot(None), Job.lease_expires_at < now)
+        candidates = query.order_by(Job.created_at).all()
+        
+        taken = []
+        for job in candidates:
+            guard = and_(
+                Job.id == job.id,
+                Job.status == job.status,
+                Job.lease_owner == job.lease_owner if job.lease_owner else Job.lease_owner.is_(None),
+                Job.lease_expires_at == job.lease_expires_at if job.lease_expires_at else Job.lease_expires_at.is_(None),
+            )
+            if max_attempts is not None and (job.attempts or 0) >= max_attempts:
+                self.db.execute(
+                    update(Job)
+                    .where(guard)
+                    .values(
+                        status="error",
+                        error=f"Job abandoned by API processes {max_attempts} times",
+                        lease_owner=None,
+                        lease_expires_at=None,
+                        updated_at=now,
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+                continue
+            result = self.db.execute(
+                update(Job)
+                .where(guard)
+                .values(
+                    status="queued",
+                    message="Resuming after restart...",
+                    lease_owner=owner,
+                    lease_expires_at=now + timedelta(seconds=lease_seconds),
+                    attempts=func.coalesce(Job.attempts, 0) + 1,
+                    updated_at=now,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 1:
+                taken.append(job.id)
+        self.db.commit()
+        
+        jobs = sorted(self.get_jobs(taken), key=lambda job: job.created_at)
+        if candidates:
+            queue_tracker.reconcile(self.db)
+        return jobs
+    
+    def requeue_expired_leases(self, max_attempts: int = 3) -> int:
+        """
+        Return jobs whose worker lease expired to the queue.
+
+        Jobs that have already been claimed `max_attempts` times are failed
+        instead, so a job that keeps killing workers cannot loop forever.
+        Returns the number of jobs requeued or failed.
+        """
+        now = datetime.utcnow()
+        expired = and_(
+            Job.status == "processing",
+            Job.lease_expires_at.isnot(None),
+            Job.lease_expires_at < now,
+        )
+        failed = self.db.execute(
+            update(Job)
+            .where(expired, Job.attempts >= max_attempts)
+            .values(
+                status="error",
+                error=f"Job abandoned by workers {max_attempts} times",
+                lease_owner=None,
+                lease_expires_at=None,
+                updated_at=now,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        requeued = self.db.execute(
+            update(Job)
+            .where(expired)
+            .values(
+                status="queued",
+                message="Re-queued after worker lease expired",
+                lease_owner=None,
+                lease_expires_at=None,
+                updated_at=now,
+            )
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        changed = failed.rowcount + requeued.rowcount
+        if changed:
+            queue_tracker.reconcile(self.db)
+        return changed
+    
     def get_user_jobs(self, user_id: str, limit: int = 50) -> List[Job]:
         """Get all jobs for a specific user"""
         return (
@@ -105,24 +475,40 @@ class JobRepository:
             .all()
         )
     
-    def get_queue_info(self) -> Dict[str, Any]:
-        """Get current queue information"""
-        queued_jobs = self.db.query(Job).filter(Job.status == "queued").count()
-        processing_jobs = self.db.query(Job).filter(Job.status == "processing").count()
+    def get_queue_snapshot(self) -> QueueSnapshot:
+        """
+        Get predicted start times for every queued job.
+
+        Served from the in-memory queue tracker once it has been reconciled,
+        falling back to querying the jobs table otherwise.
+        """
+        eta_estimator.refresh(self.db)
+        if queue_tracker.ready:
+            return queue_tracker.snapshot(eta_estimator)
         
-        return {
-            "jobsAhead": queued_jobs,
-            "currentlyProcessing": processing_jobs,
-            "position": queued_jobs,
-            "estimatedWaitSeconds": queued_jobs * 240 + (60 if processing_jobs > 0 else 0)
-        }
+        processing = (
+            self.db.query(Job.stems, Job.audio_duration_seconds, Job.progress, Job.processing_started_at)
+            .filter(Job.status == "processing")
+            .all()
+        )
+        queued = (
+            self.db.query(Job.id, Job.stems, Job.audio_duration_seconds)
+            .filter(Job.status == "queued")
+            .order_by(Job.created_at)
+            .all()
+        )
+        return eta_estimator.snapshot(processing, queued)
+    
+    def get_queue_info(self, job_id: str = None) -> Dict[str, Any]:
+        """Get queue position and ETA for a queued job, or for a new job when no ID is given"""
+        return self.get_queue_snapshot().info_for(job_id)
     
     def get_old_jobs(self, days: int = 7) -> List[Job]:
         """Get jobs older than specified days"""
         cutoff_date = datetime.utcnow() - timedelta(days=days)
         return (
             self.db.query(Job)
-            .filter(Job.created_at < cutoff_date, Job.files_deleted == False)
+            .filter(Job.created_at < cutoff_date, Job.files_deleted == false())
             .all()
         )
     
@@ -136,18 +522,230 @@ class JobRepository:
             return True
         return False
     
+    def _unselective(self, *clauses):
+        """
+        Filter terms that match most rows, for queries meant to use a partial index.
+
+        Without table statistics SQLite takes any equality term as selective
+        and prefers an index on files_deleted or status over the partial
+        ix_jobs_*_pending indexes; likelihood() tells it otherwise and still
+        lets the literal `files_deleted = 0` match the index's WHERE clause.
+        """
+        if self.db.get_bind().dialect.name != "sqlite":
+            return clauses
+        return tuple(func.likelihood(clause, literal_column("0.9")) for clause in clauses)
+    
+    def get_jobs_due_for_cleanup(self, now: datetime, limit: int = 100) -> List[Job]:
+        """Finished jobs whose files are past auto_cleanup_at, oldest first"""
+        return (
+            self.db.query(Job)
+            .filter(
+                Job.auto_cleanup_at <= now,
+                *self._unselective(Job.files_deleted == false(), Job.status.in_(["completed", "error"])),
+            )
+            .order_by(Job.auto_cleanup_at)
+            .limit(limit)
+            .all()
+        )
+    
+    def get_least_recently_accessed(self, limit: int = 100) -> List[Job]:
+        """Finished jobs whose files still exist, least recently accessed first"""
+        return (
+            self.db.query(Job)
+            .filter(
+                Job.last_accessed_at.isnot(None),
+                *self._unselective(Job.files_deleted == false(), Job.status.in_(["completed", "error"])),
+            )
+            .order_by(Job.last_accessed_at)
+            .limit(limit)
+            .all()
+        )
+    
+    def get_shared_input_paths(self, input_paths: List[str], exclude_ids: List[str]) -> set:
+        """Input paths still used by jobs outside `exclude_ids` whose files are kept"""
+        if not input_paths:
+            return set()
+        rows = (
+            self.db.query(Job.input_path)
+            .filter(
+                Job.input_path.in_(input_paths),
+                Job.id.notin_(exclude_ids),
+                *self._unselective(Job.files_deleted == false()),
+            )
+            .distinct()
+            .all()
+        )
+        return {input_path for (input_path,) in rows}
+    
+    def get_active_input_paths(self) -> List[str]:
+        """Input paths of queued and processing jobs"""
+        rows = (
+            self.db.query(Job.input_path)
+            .filter(Job.status.in_(["queued", "processing"]), Job.input_path.isnot(None))
+            .distinct()
+            .all()
+        )
+        return [input_path for (input_path,) in rows]
+    
+    def mark_files_deleted_bulk(self, job_ids: List[str]) -> int:
+        """Mark the files of several jobs as deleted and release their uploads"""
+        if not job_ids:
+            return 0
+        released = Counter(
+            input_path for (input_path,) in
+            self.db.query(Job.input_path)
+            .filter(Job.id.in_(job_ids), Job.files_deleted == false(), Job.input_path.isnot(None))
+        )
+        result = self.db.execute(
+            update(Job)
+            .where(Job.id.in_(job_ids))
+            .values(files_deleted=True, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        for input_path, count in released.items():
+            self.db.execute(
+                update(UploadBlob)
+                .where(UploadBlob.path == input_path)
+                .values(ref_count=UploadBlob.ref_count - count)
+                .execution_options(synchronize_session=False)
+            )
+        self.db.commit()
+        return result.rowcount
+    
+    def touch_jobs(self, job_ids: List[str], accessed_at: datetime = None) -> int:
+        """Record that the outputs of jobs were fetched"""
+        if not job_ids:
+            return 0
+        result = self.db.execute(
+            update(Job)
+            .where(Job.id.in_(job_ids))
+            .values(last_accessed_at=accessed_at or datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        self.db.commit()
+        return result.rowcount
+    
     def delete_old_jobs(self, days: int = 7) -> int:
         """Delete old job records from database"""
         cutoff_date = datetime.utcnow() - timedelta(days=days)
         deleted = (
             self.db.query(Job)
-            .filter(Job.created_at < cutoff_date, Job.files_deleted == True)
+            .filter(Job.created_at < cutoff_date, Job.files_deleted == true())
             .delete()
         )
         self.db.commit()
         return deleted
 
 
+class UploadBlobRepository:
+    """Repository for content-addressed uploads"""
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    def get_blob(self, sha256: str) -> Optional[UploadBlob]:
+        """Get a stored upload by content hash"""
+        return self.db.get(UploadBlob, sha256)
+    
+    def get_owned_blob(self, sha256: str, user_id: str) -> Optional[UploadBlob]:
+        """Get a stored upload by content hash if the user uploaded it before"""
+        return (
+            self.db.query(UploadBlob)
+            .join(UploadBlobOwner, UploadBlobOwner.sha256 == UploadBlob.sha256)
+            .filter(UploadBlob.sha256 == sha256, UploadBlobOwner.user_id == user_id)
+            .first()
+        )
+    
+    def register_blob(
+        self,
+        sha256: str,
+        path: str,
+        file_size: int,
+        audio_format: str = None,
+        user_id: str = None,
+        **audio_fields
+    ) -> UploadBlob:
+        """
+        Record an upload (or a repeated upload of the same bytes) by `user_id`.
+
+        `audio_fields` are the probed stream properties (audio_duration_seconds,
+        audio_codec, audio_sample_rate, audio_channels) of a new blob.
+        """
+        now = datetime.utcnow()
+        blob = self.get_blob(sha256)
+        if blob is None:
+            blob = UploadBlob(
+                sha256=sha256,
+                path=path,
+                file_size=file_size,
+                audio_format=audio_format,
+                ref_count=0,
+                created_at=now,
+                last_uploaded_at=now,
+                **audio_fields
+            )
+            self.db.add(blob)
+            try:
+                self.db.commit()
+            except IntegrityError:
+                # Registered concurrently by another upload of the same bytes
+                self.db.rollback()
+                blob = self.get_blob(sha256)
+        
+        # Keeps an unused blob out of the storage GC for another grace period
+        blob.last_uploaded_at = now
+        if user_id is not None and self.db.get(UploadBlobOwner, (sha256, user_id)) is None:
+            try:
+                with self.db.begin_nested():
+                    self.db.add(UploadBlobOwner(sha256=sha256, user_id=user_id, created_at=now))
+            except IntegrityError:
+                pass  # recorded concurrently by another upload of this user
+        self.db.commit()
+        return blob
+    
+    def get_blob_paths(self, paths: List[str]) -> set:
+        """The given paths that are stored uploads"""
+        if not paths:
+            return set()
+        rows = self.db.query(UploadBlob.path).filter(UploadBlob.path.in_(paths)).all()
+        return {path for (path,) in rows}
+    
+    def delete_unreferenced(self, uploaded_before: datetime, limit: int = 100) -> List[str]:
+        """
+        Delete rows of blobs no job uses that were last uploaded before the
+        cutoff. Returns their paths; the caller deletes the files.
+        """
+        candidates = [
+            sha256 for (sha256,) in
+            self.db.query(UploadBlob.sha256)
+            .filter(UploadBlob.ref_count <= 0, UploadBlob.last_uploaded_at < uploaded_before)
+            .order_by(UploadBlob.last_uploaded_at)
+            .limit(limit)
+        ]
+        if not candidates:
+            return []
+        # Re-checked on delete: a job created since the select keeps its blob
+        result = self.db.execute(
+            delete(UploadBlob)
+            .where(
+                UploadBlob.sha256.in_(candidates),
+                UploadBlob.ref_count <= 0,
+                UploadBlob.last_uploaded_at < uploaded_before,
+            )
+            .returning(UploadBlob.sha256, UploadBlob.path)
+            .execution_options(synchronize_session=False)
+        )
+        deleted = result.all()
+        if deleted:
+            self.db.execute(
+                delete(UploadBlobOwner)
+                .where(UploadBlobOwner.sha256.in_([sha256 for sha256, _ in deleted]))
+                .execution_options(synchronize_session=False)
+            )
+        self.db.commit()
+        return [path for _, path in deleted]
+
+
 class JobMetricRepository:
     """Repository for job metrics"""
     
@@ -164,12 +762,14 @@ class JobMetricRepository:
         stems_count: int = 2,
         error_type: str = None,
         gpu_used: bool = None,
-        max_memory_mb: int = None
+        max_memory_mb: int = None,
+        audio_duration_seconds: float = None
     ) -> JobMetric:
         """Record job performance metric"""
         metric = JobMetric(
             job_id=job_id,
             file_size_mb=file_size_mb,
+            audio_duration_seconds=audio_duration_seconds,
             processing_time_seconds=processing_time_seconds,
             success=success,
             model_name=model_name,
@@ -184,6 +784,54 @@ class JobMetricRepository:
         self.db.refresh(metric)
         return metric
     
+    def record_job_result(self, job_id: str, input_path: str, stems: int, result: Dict[str, Any], device: str) -> Optional[JobMetric]:
+        """
+        Record a finished separation from the processor's result; feeds the queue ETA estimator.
+
+        A resumed run only separated part of the track, so its metric covers
+        that part (and the file size in proportion). A run that had nothing
+        left to separate records no metric.
+        """
+        success = result.get("status") == "complete"
+        file_size_mb = os.path.getsize(input_path) / 1024 / 1024 if os.path.exists(input_path) else None
+        audio_duration = result.get("audio_duration")
+        separated = result.get("separated_duration")
+        if success and audio_duration and separated is not None and separated < audio_duration:
+            if separated <= 0:
+                return None
+            if file_size_mb is not None:
+                file_size_mb *= separated / audio_duration
+            audio_duration = separated
+        return self.record_metric(
+            job_id=job_id,
+            file_size_mb=file_size_mb,
+            processing_time_seconds=result.get("duration"),
+            success=success,
+            stems_count=stems,
+            error_type=None if success else "PROCESSING_ERROR",
+            gpu_used=device != "cpu",
+            audio_duration_seconds=audio_duration,
+        )
+    
+    def get_first_recorded_at(self) -> Optional[datetime]:
+        """Time of the oldest recorded metric"""
+        return self.db.query(func.min(JobMetric.recorded_at)).scalar()
+    
+    def get_metric_samples(self, start: datetime, end: datetime) -> List[Any]:
+        """Fields needed for rollups of metrics recorded in [start, end)"""
+        return (
+            self.db.query(
+                JobMetric.recorded_at,
+                JobMetric.model_name,
+                JobMetric.stems_count,
+                JobMetric.success,
+                JobMetric.processing_time_seconds,
+                JobMetric.audio_duration_seconds,
+            )
+            .filter(JobMetric.recorded_at >= start, JobMetric.recorded_at < end)
+            .all()
+        )
+    
     def get_metrics(self, days: int = 30) -> List[JobMetric]:
         """Get metrics for the last N days"""
         cutoff_date = datetime.utcnow() - timedelta(days=days)
@@ -195,9 +843,65 @@ class JobMetricRepository:
         )
 
 
+class MetricRollupRepository:
+    """Repository for aggregated job metrics"""
+    
+    def __init__(self, db: Session):
+        self.db = db
+    
+    WATERMARK_ID = 1
+    
+    def get_rolled_through(self) -> Optional[datetime]:
+        """Start of the last day rolled up, or None before the first run"""
+        watermark = self.db.get(JobMetricRollupWatermark, self.WATERMARK_ID)
+        return watermark.rolled_through if watermark else None
+    
+    def advance_rolled_through(self, day: datetime):
+        """Move the watermark forward to `day`; never moves it back"""
+        watermark = self.db.get(JobMetricRollupWatermark, self.WATERMARK_ID)
+        if watermark is None:
+            self.db.add(JobMetricRollupWatermark(id=self.WATERMARK_ID, rolled_through=day))
+        elif watermark.rolled_through < day:
+            watermark.rolled_through = day
+        self.db.commit()
+    
+    def replace_buckets(self, granularity: str, start: datetime, end: datetime, rows: List[Dict[str, Any]]) -> int:
+        """Replace all buckets of a granularity starting in [start, end) with `rows`"""
+        (
+            self.db.query(JobMetricRollup)
+            .filter(
+                JobMetricRollup.granularity == granularity,
+                JobMetricRollup.bucket_start >= start,
+                JobMetricRollup.bucket_start < end,
+            )
+            .delete(synchronize_session=False)
+        )
+        now = datetime.utcnow()
+        self.db.add_all(JobMetricRollup(granularity=granularity, updated_at=now, **row) for row in rows)
+        self.db.commit()
+        return len(rows)
+    
+    def get_rollups(self, granularity: str, since: datetime) -> List[JobMetricRollup]:
+        """Buckets of a granularity starting at or after `since`, oldest first"""
+        return (
+            self.db.query(JobMetricRollup)
+            .filter(JobMetricRollup.granularity == granularity, JobMetricRollup.bucket_start >= since)
+            .order_by(JobMetricRollup.bucket_start, JobMetricRollup.model_name, JobMetricRollup.stems_count)
+            .all()
+        )
+
+
 class UserQuotaRepository:
     """Repository for user quota management"""
     
+    # Column defaults, applied where a row holds NULL limits
+    DEFAULT_JOBS_PER_HOUR = 5
+    DEFAULT_JOBS_PER_DAY = 20
+    DEFAULT_MAX_FILE_SIZE_MB = 25
+    
+    # Conditional UPDATEs tried before a contended submission is refused
+    MAX_CONSUME_ATTEMPTS = 5
+    
     def __init__(self, db: Session):
         self.db = db
     
@@ -208,55 +912,144 @@ class UserQuotaRepository:
         if not quota:
             quota = UserQuota(user_id=user_id)
             self.db.add(quota)
-            self.db.commit()
-            self.db.refresh(quota)
+            try:
+                self.db.commit()
+                self.db.refresh(quota)
+            except IntegrityError:
+                # Created concurrently by another first submission of this user
+                self.db.rollback()
+                quota = self.db.query(UserQuota).filter(UserQuota.user_id == user_id).one()
         
         return quota
     
-    def check_quota(self, user_id: str, file_size_mb: float = 0) -> Dict[str, Any]:
-        """Check if user can create a new job"""
-        quota = self.get_or_create_quota(user_id)
-        
-        # Reset counters if needed (simplified - in production would use more sophisticated time tracking)
+    def get_recent_job_times(self, user_id: str, since: datetime) -> List[datetime]:
+        """Creation times of a user's jobs since `since`"""
+        rows = (
+            self.db.query(Job.created_at)
+            .filter(Job.user_id == user_id, Job.created_at > since)
+            .all()
+        )
+        return [created_at for (created_at,) in rows]
+    
+    def save_usage(self, user_id: str, jobs_last_hour: int, jobs_last_day: int, last_job_at: datetime = None):
+        """Store a user's current window counts"""
         now = datetime.utcnow()
+        values = {"jobs_last_hour": jobs_last_hour, "jobs_last_day": jobs_last_day, "updated_at": now}
+        if last_job_at is not None:
+            values["last_job_at"] = last_job_at
+        self.db.execute(update(UserQuota).where(UserQuota.user_id == user_id).values(**values))
+        self.db.commit()
+    
+    @staticmethod
+    def _window_update(now: datetime, span: timedelta, count, started_at, prev_count, prev_last_job_at):
+        """
+        SQL for one quota window: (jobs counted against the limit, new column values).
+
+        A window runs from its first job for at least `span`; the next job
+        after that starts a new one and the old one becomes the previous
+        window. The previous window's jobs count in full until its newest job
+        is `span` old, so no sliding window ever holds more than the limit.
+        """
+        window_start = now - span
+        # Rows written before a column existed hold NULL counts
+        count_column, prev_count_column = count, prev_count
+        count = func.coalesce(count, 0)
+        prev_count = func.coalesce(prev_count, 0)
+        rolled_over = or_(started_at.is_(None), started_at <= window_start)
+        current_recent = case(
+            (and_(started_at.is_not(None), UserQuota.last_job_at > window_start), count), else_=0
+        )
+        prev_recent = case((prev_last_job_at > window_start, prev_count), else_=0)
+        usage = case((rolled_over, current_recent), else_=count + prev_recent)
+        values = {
+            count_column.key: case((rolled_over, 1), else_=count + 1),
+            started_at.key: case((rolled_over, now), else_=started_at),
+            prev_count_column.key: case((rolled_over, case((started_at.is_(None), 0), else_=count)), else_=prev_count),
+            prev_last_job_at.key: case((rolled_over, UserQuota.last_job_at), else_=prev_last_job_at),
+        }
+        return usage, values
+    
+    @staticmethod
+    def _window_usage(now: datetime, span: timedelta, count, started_at, prev_count, prev_last_job_at, last_job_at) -> int:
+        """Jobs counted against the limit of one window, as `_window_update` computes them."""
+        window_start = now - span
+        if started_at is None or started_at <= window_start:
+            recent = started_at is not None and last_job_at is not None and last_job_at > window_start
+            return (count or 0) if recent else 0
+        prev_recent = prev_last_job_at is not None and prev_last_job_at > window_start
+        return (count or 0) + ((prev_count or 0) if prev_recent else 0)
+    
+    def consume_quota(self, user_id: str, file_size_mb: float = 0) -> Dict[str, Any]:
+        """
+        Check and consume one job of the user's quota in a single statement.
+
+        The conditional UPDATE only matches while both windows have room (see
+        `_window_update`), and RETURNING hands back the new counts.
+        Concurrent submissions are serialized by the row lock, so the limits
+        cannot be exceeded over any sliding hour or day. Extra round trips
+        happen only for a user's first job and for rejected submissions, to
+        report the reason.
+
+        Counting the previous window in full is stricter than the in-memory
+        limiter: after a burst, a job can be refused until the newest job of
+        the previous window is an hour (a day) old, although older jobs of
+        that window have already left the sliding window.
+        """
+        now = datetime.utcnow()
+        hour_usage, hour_values = self._window_update(
+            now, timedelta(hours=1),
+            UserQuota.jobs_last_hour, UserQuota.hour_window_started_at,
+            UserQuota.jobs_prev_hour, UserQuota.prev_hour_last_job_at,
+        )
+        day_usage, day_values = self._window_update(
+            now, timedelta(days=1),
+            UserQuota.jobs_last_day, UserQuota.day_window_started_at,
+            UserQuota.jobs_prev_day, UserQuota.prev_day_last_job_at,
+        )
+        statement = (
+            update(UserQuota)
+            .where(
+                UserQuota.user_id == user_id,
+                func.coalesce(UserQuota.max_file_size_mb, self.DEFAULT_MAX_FILE_SIZE_MB) >= literal(float(file_size_mb)),
+                hour_usage < func.coalesce(UserQuota.jobs_per_hour, self.DEFAULT_JOBS_PER_HOUR),
+                day_usage < func.coalesce(UserQuota.jobs_per_day, self.DEFAULT_JOBS_PER_DAY),
+            )
+            .values(**hour_values, **day_values, last_job_at=now, updated_at=now)
+            .returning(UserQuota.id)
+            .execution_options(synchronize_session=False)
+        )
         
-        # Check file size limit
-        if file_size_mb > quota.max_file_size_mb:
-            return {
-                "allowed": False,
-                "reason": "FILE_TOO_LARGE",
-                "limit": quota.max_file_size_mb,
-                "requested": file_size_mb
-            }
-        
-        # Check hourly limit
-        if quota.jobs_last_hour >= quota.jobs_per_hour:
-            return {
-                "allowed": False,
-                "reason": "HOURLY_LIMIT",
-                "limit": quota.jobs_per_hour,
-                "current": quota.jobs_last_hour
-            }
-        
-        # Check daily limit
-        if quota.jobs_last_day >= quota.jobs_per_day:
-            return {
-                "allowed": False,
-                "reason": "DAILY_LIMIT",
-                "limit": quota.jobs_per_day,
-                "current": quota.jobs_last_day
-            }
-        
-        return {"allowed": True}
-    
-    def increment_usage(self, user_id: str):
-        """Increment job usage counters"""
-        quota = self.get_or_create_quota(user_id)
-        quota.jobs_last_hour += 1
-        quota.jobs_last_day += 1
-        quota.last_job_at = datetime.utcnow()
-        quota.updated_at = datetime.utcnow()
+        # Every lost race means another submission of this user consumed
+        # quota in between, so retries end once the quota is used up; the cap
+        # only bounds the wait under heavy contention
+        for _ in range(self.MAX_CONSUME_ATTEMPTS):
+            consumed = self.db.execute(statement).first()
+            self.db.commit()
+            if consumed is not None:
+                return {"allowed": True}
+            
+            quota = self.db.query(UserQuota).filter(UserQuota.user_id == user_id).first()
+            if quota is None:
+                # First job of this user: create the row, then consume
+                self.get_or_create_quota(user_id)
+                continue
+            
+            decision = check_windows(
+                self._window_usage(
+                    now, timedelta(hours=1), quota.jobs_last_hour, quota.hour_window_started_at,
+                    quota.jobs_prev_hour, quota.prev_hour_last_job_at, quota.last_job_at,
+                ),
+                self._window_usage(
+                    now, timedelta(days=1), quota.jobs_last_day, quota.day_window_started_at,
+                    quota.jobs_prev_day, quota.prev_day_last_job_at, quota.last_job_at,
+                ),
+                quota.jobs_per_hour if quota.jobs_per_hour is not None else self.DEFAULT_JOBS_PER_HOUR,
+                quota.jobs_per_day if quota.jobs_per_day is not None else self.DEFAULT_JOBS_PER_DAY,
+                quota.max_file_size_mb if quota.max_file_size_mb is not None else self.DEFAULT_MAX_FILE_SIZE_MB,
+                file_size_mb
+            )
+            if not decision["allowed"]:
+                return decision
+            # Another submission changed the row between the two statements; try again
         
-        self.db.commit()
-        self.db.refresh(quota)
-        return quota
\ No newline at end of file
+        return {"allowed": False, "reason": "CONTENDED", "attempts": self.MAX_CONSUME_ATTEMPTS}
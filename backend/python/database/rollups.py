@@ -0,0 +1,118 @@
+"""
+Hourly and daily rollups of job metrics
+"""
+
+import math
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional
+from sqlalchemy.orm import Session
+from database.eta import DEFAULT_MODEL
+from database.repositories import JobMetricRepository, MetricRollupRepository
+
+GRANULARITIES = ("hour", "day")
+
+
+def bucket_start(value: datetime, granularity: str) -> datetime:
+    """Start of the hour or day containing `value`."""
+    if granularity == "hour":
+        return value.replace(minute=0, second=0, microsecond=0)
+    return value.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def percentile(sorted_values: List[float], fraction: float) -> Optional[float]:
+    """Linearly interpolated percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    position = (len(sorted_values) - 1) * fraction
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    if lower == upper:
+        return sorted_values[lower]
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def aggregate(samples: Iterable[Any], granularity: str) -> List[Dict[str, Any]]:
+    """
+    Aggregate metric samples into one row per (bucket, model, stems).
+
+    Percentiles cover successful jobs only; the real-time factor also needs
+    a known audio duration.
+    """
+    groups = defaultdict(lambda: {"jobs": 0, "successes": 0, "times": [], "rtfs": []})
+    for recorded_at, model_name, stems_count, success, processing_time, audio_duration in samples:
+        group = groups[(bucket_start(recorded_at, granularity), model_name or DEFAULT_MODEL, stems_count or 2)]
+        group["jobs"] += 1
+        if not success:
+            continue
+        group["successes"] += 1
+        if processing_time and processing_time > 0:
+            group["times"].append(processing_time)
+            if audio_duration and audio_duration > 0:
+                group["rtfs"].append(processing_time / audio_duration)
+
+    rows = []
+    for (start, model_name, stems_count), group in sorted(groups.items()):
+        times = sorted(group["times"])
+        rtfs = sorted(group["rtfs"])
+        rows.append({
+            "bucket_start": start,
+            "model_name": model_name,
+            "stems_count": stems_count,
+            "job_count": group["jobs"],
+            "success_count": group["successes"],
+            "processing_p50": percentile(times, 0.50),
+            "processing_p95": percentile(times, 0.95),
+            "processing_p99": percentile(times, 0.99),
+            "rtf_p50": percentile(rtfs, 0.50),
+            "rtf_p95": percentile(rtfs, 0.95),
+            "rtf_p99": percentile(rtfs, 0.99),
+        })
+    return rows
+
+
+def pending_days(db: Session, now: datetime = None) -> List[datetime]:
+    """
+    Start of every daily bucket whose rollups can have changed since the last run.
+
+    Rolling resumes at the watermark, the last day rolled up (metrics are
+    recorded when a job finishes, so earlier days are final), or, on the
+    first run, at the oldest metric. The watermark advances through days
+    without metrics too, so quiet days are not scanned again.
+    """
+    now = now or datetime.utcnow()
+    start = MetricRollupRepository(db).get_rolled_through() or JobMetricRepository(db).get_first_recorded_at()
+    if start is None:
+        return []
+
+    days = []
+    day = bucket_start(start, "day")
+    while day <= now:
+        days.append(day)
+        day += timedelta(days=1)
+    return days
+
+
+def roll_up_day(db: Session, day: datetime) -> int:
+    """Recompute the hourly and daily rollups of one day. Returns the number of buckets written."""
+    next_day = day + timedelta(days=1)
+    samples = JobMetricRepository(db).get_metric_samples(day, next_day)
+    rollup_repo = MetricRollupRepository(db)
+    written = sum(
+        rollup_repo.replace_buckets(granularity, day, next_day, aggregate(samples, granularity))
+        for granularity in GRANULARITIES
+    )
+    rollup_repo.advance_rolled_through(day)
+    return written
+
+
+def roll_up_metrics(db: Session, now: datetime = None) -> int:
+    """
+    Recompute every rollup bucket that can have changed since the last run.
+
+    History is processed one day at a time so a backfill never loads more
+    than a day of metrics. Callers that share a writer with other work
+    should run `roll_up_day` per day of `pending_days` instead, so a long
+    backfill does not hold it. Returns the number of buckets written.
+    """
+    return sum(roll_up_day(db, day) for day in pending_days(db, now))
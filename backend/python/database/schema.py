@@ -2,7 +2,7 @@
 Database schema for Singscape job management
 """
 
-from sqlalchemy import Column, String, Integer, Float, DateTime, Text, JSON, Boolean
+from sqlalchemy import Column, String, Integer, Float, DateTime, Text, JSON, Boolean, Index, false
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.sql import func
 from datetime import datetime
@@ -28,6 +28,10 @@ class Job(Base):
     stems = Column(Integer, default=2)
     original_filename = Column(String(255))
     file_size = Column(Integer)  # bytes
+    audio_duration_seconds = Column(Float)
+    audio_codec = Column(String(20))  # mp3, flac, vorbis, pcm_s16le, ...
+    audio_sample_rate = Column(Integer)  # Hz
+    audio_channels = Column(Integer)
     
     # Processing metadata
     processing_started_at = Column(DateTime)
@@ -38,6 +42,11 @@ class Job(Base):
     user_id = Column(String(255))  # Clerk user ID or "anonymous"
     ip_address = Column(String(45))  # Support for IPv6
     
+    # Worker lease (set while a standalone worker owns the job)
+    lease_owner = Column(String(255))  # worker ID, e.g. "host-1234"
+    lease_expires_at = Column(DateTime)
+    attempts = Column(Integer, default=0)  # number of times the job was claimed
+    
     # Queue information (cached)
     queue_position = Column(Integer)
     estimated_wait_seconds = Column(Integer)
@@ -53,11 +62,90 @@ class Job(Base):
     # Cleanup tracking
     auto_cleanup_at = Column(DateTime)  # When to automatically delete files
     files_deleted = Column(Boolean, default=False)
+    last_accessed_at = Column(DateTime)  # Finished, or outputs last fetched (eviction order)
+    
+    # Indexes for the hot access paths (see migrations/versions/0003_job_indexes.py)
+    __table_args__ = (
+        # Queue scans: status filter ordered by submission time
+        Index("ix_jobs_status_created_at", "status", "created_at"),
+        # A user's job history, newest first
+        Index("ix_jobs_user_id_created_at", "user_id", "created_at"),
+        # Old-job cleanup by age and deletion state
+        Index("ix_jobs_files_deleted_created_at", "files_deleted", "created_at"),
+        # Storage GC: only rows whose files still exist. The literal false
+        # renders as in the migrations; a bound parameter would not match
+        Index(
+            "ix_jobs_auto_cleanup_at_pending",
+            "auto_cleanup_at",
+            postgresql_where=(files_deleted == false()),
+            sqlite_where=(files_deleted == false()),
+        ),
+        # Disk-pressure eviction: least recently accessed rows whose files still exist
+        Index(
+            "ix_jobs_last_accessed_at_pending",
+            "last_accessed_at",
+            postgresql_where=(files_deleted == false()),
+            sqlite_where=(files_deleted == false()),
+        ),
+        # Other jobs still using an upload before it is deleted
+        Index("ix_jobs_input_path", "input_path"),
+        # Expired worker leases: only processing rows carry a lease
+        Index(
+            "ix_jobs_lease_expires_at_processing",
+            "lease_expires_at",
+            postgresql_where=(status == "processing"),
+            sqlite_where=(status == "processing"),
+        ),
+    )
     
     def __repr__(self):
         return f"<Job(id='{self.id}', status='{self.status}', progress={self.progress}%)>"
 
 
+class UploadBlob(Base):
+    """An uploaded file, stored once under its content hash"""
+    __tablename__ = "upload_blobs"
+    
+    sha256 = Column(String(64), primary_key=True)
+    path = Column(String(500), nullable=False, unique=True)  # what jobs store as input_path
+    file_size = Column(Integer, nullable=False)  # bytes
+    audio_format = Column(String(10))  # wav, mp3, flac, ogg
+    
+    # Probed from the file headers at upload time; copied to jobs using the blob
+    audio_duration_seconds = Column(Float)
+    audio_codec = Column(String(20))
+    audio_sample_rate = Column(Integer)
+    audio_channels = Column(Integer)
+    
+    # Jobs using this blob whose files have not been deleted yet
+    ref_count = Column(Integer, nullable=False, default=0)
+    
+    created_at = Column(DateTime, default=func.now(), nullable=False)
+    last_uploaded_at = Column(DateTime, default=func.now(), nullable=False)
+    
+    __table_args__ = (
+        # Storage GC: blobs no job uses, oldest upload first
+        Index(
+            "ix_upload_blobs_unreferenced",
+            "last_uploaded_at",
+            postgresql_where=(ref_count <= 0),
+            sqlite_where=(ref_count <= 0),
+        ),
+    )
+    
+    def __repr__(self):
+        return f"<UploadBlob(sha256='{self.sha256[:12]}', ref_count={self.ref_count})>"
+
+
+class UploadBlobOwner(Base):
+    """A user who uploaded (or ran a job on) a blob; only they may reuse it by hash"""
+    __tablename__ = "upload_blob_owners"
+    
+    sha256 = Column(String(64), primary_key=True)
+    user_id = Column(String(255), primary_key=True)
+    created_at = Column(DateTime, default=func.now(), nullable=False)
+
+
 class JobMetric(Base):
     """Metrics for monitoring job performance"""
     __tablename__ = "job_metrics"
@@ -67,6 +155,7 @@ class JobMetric(Base):
     
     # Performance metrics
     file_size_mb = Column(Float)
+    audio_duration_seconds = Column(Float)
     processing_time_seconds = Column(Float)
     model_name = Column(String(50))  # htdemucs, etc.
     stems_count = Column(Integer)
@@ -80,7 +169,52 @@ class JobMetric(Base):
     max_memory_mb = Column(Integer)
     
     # Timestamp
-    recorded_at = Column(DateTime, default=func.now(), nullable=False)
+    recorded_at = Column(DateTime, default=func.now(), nullable=False, index=True)
+
+
+class JobMetricRollup(Base):
+    """Job metrics aggregated per hour or day, model and stems count"""
+    __tablename__ = "job_metric_rollups"
+    
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    granularity = Column(String(10), nullable=False)  # hour, day
+    bucket_start = Column(DateTime, nullable=False)
+    model_name = Column(String(50), nullable=False)
+    stems_count = Column(Integer, nullable=False)
+    
+    # Volume
+    job_count = Column(Integer, nullable=False, default=0)
+    success_count = Column(Integer, nullable=False, default=0)
+    
+    # Processing time percentiles (seconds, successful jobs)
+    processing_p50 = Column(Float)
+    processing_p95 = Column(Float)
+    processing_p99 = Column(Float)
+    
+    # Real-time factor percentiles (processing seconds per second of audio)
+    rtf_p50 = Column(Float)
+    rtf_p95 = Column(Float)
+    rtf_p99 = Column(Float)
+    
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), nullable=False)
+    
+    __table_args__ = (
+        # One row per bucket; also serves reads by granularity and time range
+        Index(
+            "ux_job_metric_rollups_bucket",
+            "granularity", "bucket_start", "model_name", "stems_count",
+            unique=True,
+        ),
+    )
+
+
+class JobMetricRollupWatermark(Base):
+    """Start of the last day rolled up, including days without metrics (single row)"""
+    __tablename__ = "job_metric_rollup_watermark"
+    
+    id = Column(Integer, primary_key=True)
+    rolled_through = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), nullable=False)
 
 
 class UserQuota(Base):
@@ -100,6 +234,16 @@ class UserQuota(Base):
     jobs_last_day = Column(Integer, default=0)
     last_job_at = Column(DateTime)
     
+    # Start of the current hourly / daily counting window (database-backed limits)
+    hour_window_started_at = Column(DateTime)
+    day_window_started_at = Column(DateTime)
+    
+    # Job count and newest job of the window before the current one
+    jobs_prev_hour = Column(Integer)
+    prev_hour_last_job_at = Column(DateTime)
+    jobs_prev_day = Column(Integer)
+    prev_day_last_job_at = Column(DateTime)
+    
     # Timestamps
     created_at = Column(DateTime, default=func.now(), nullable=False)
     updated_at = Column(DateTime, default=func.now(), onupdate=func.now(), nullable=False)
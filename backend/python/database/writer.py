@@ -0,0 +1,142 @@
+"""
+Single writer thread that groups database mutations into batched transactions
+"""
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+from database.config import engine
+
+# A mutation receives a session and may call repository methods that commit
+Mutation = Callable[[Session], Any]
+
+
+class DatabaseWriter:
+    """
+    Serializes writes through one thread.
+
+    Mutations submitted from any thread are queued. The writer takes
+    everything queued within one tick and runs it on a single connection in
+    one transaction, so SQLite sees one writer and one commit per tick
+    instead of many threads fighting over the database lock.
+
+    Each mutation runs inside its own savepoint with a session joined to that
+    transaction, so repository commits become savepoint releases and a
+    failing mutation is rolled back without affecting the rest of the batch.
+    `submit` returns a Future that resolves once the batch has committed.
+
+    Until `start` is called mutations run synchronously in the caller's
+    thread, each in its own transaction.
+    """
+
+    def __init__(self, bind: Engine, interval_seconds: float = 0.05, max_batch: int = 500):
+        self.bind = bind
+        self.interval_seconds = interval_seconds
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[Optional[Tuple[Mutation, Future]]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, mutation: Mutation) -> Future:
+        """Queue a mutation; the Future resolves to its return value after commit."""
+        future: Future = Future()
+        with self._lock:
+            running = self._thread is not None
+            if running:
+                self._queue.put((mutation, future))
+
+        if not running:
+            self._run_batch([(mutation, future)])
+        return future
+
+    def run(self, mutation: Mutation) -> Any:
+        """Submit a mutation and wait for its result."""
+        return self.submit(mutation).result()
+
+    def start(self) -> None:
+        """Start the writer thread."""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name="db-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        """Stop accepting queued writes and commit everything already queued."""
+        with self._lock:
+            thread = self._thread
+            self._thread = None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def _loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            # Collect whatever else arrives within this tick
+            batch = [item]
+            stopping = False
+            deadline = time.monotonic() + self.interval_seconds
+            try:
+                while len(batch) < self.max_batch:
+                    item = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                    if item is None:
+                        stopping = True
+                        break
+                    batch.append(item)
+            except queue.Empty:
+                pass
+
+            self._run_batch(batch)
+            if stopping:
+                return
+
+    def _run_batch(self, batch: List[Tuple[Mutation, Future]]) -> None:
+        results = []
+        try:
+            with self.bind.connect() as connection:
+                connection = connection.execution_options(sqlite_begin="IMMEDIATE")
+                transaction = connection.begin()
+                for mutation, future in batch:
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    # Outer savepoint so a failure undoes everything this mutation committed
+                    savepoint = connection.begin_nested()
+                    db = Session(bind=connection, join_transaction_mode="create_savepoint", expire_on_commit=False)
+                    try:
+                        result = mutation(db)
+                        db.close()
+                        savepoint.commit()
+                        results.append((future, result, None))
+                    except Exception as e:
+                        db.close()
+                        savepoint.rollback()
+                        results.append((future, None, e))
+                transaction.commit()
+        except Exception as e:
+            print(f"[Database] Write batch of {len(batch)} failed: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for future, result, error in results:
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+
+# Shared writer; the API process starts it, other processes write synchronously
+db_writer = DatabaseWriter(
+    engine,
+    interval_seconds=float(os.getenv("DB_WRITER_INTERVAL_MS", "50")) / 1000.0,
+)
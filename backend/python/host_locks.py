@@ -0,0 +1,200 @@
+"""
+Coordination between API processes on one host.
+
+Running uvicorn with several workers gives every process its own memory,
+so state that must be shared is kept in the database and the filesystem,
+and mutual exclusion uses `flock` locks on files in a runtime directory:
+
+- `ExecutionSlots` limits how many separations run at once across all
+  processes (one slot per lock file).
+- `LeaderLock` elects one process to run the host-wide background tasks
+  (storage GC, metric rollups, cleanup). When the leader exits or crashes
+  the kernel releases its lock and another process takes over.
+- `HostMembership` tells a process whether it is the first API process to
+  start, i.e. whether jobs left queued or processing were interrupted by
+  a restart rather than being run by a live sibling.
+
+The kernel drops `flock` locks when their holder dies, so a crashed
+process never leaves a slot or the leadership stuck. On platforms without
+`fcntl` the locks degrade to process-local ones, which is correct for a
+single API process.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process deployments only
+    fcntl = None
+
+
+def _try_lock(fd: int) -> bool:
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except BlockingIOError:
+        return False
+
+
+@contextmanager
+def locked_file(path: Path, shared: bool = False) -> Iterator[None]:
+    """Hold an exclusive (or shared) lock on an existing file (blocking). Raises FileNotFoundError if it is gone."""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        yield
+    finally:
+        # Closing the descriptor releases the lock
+        os.close(fd)
+
+
+class ExecutionSlots:
+    """Host-wide counting semaphore: `slots` lock files, one per concurrent separation"""
+
+    def __init__(self, directory: Path, slots: int = 1, poll_seconds: float = 0.5):
+        self.directory = directory
+        self.slots = max(1, slots)
+        self.poll_seconds = poll_seconds
+        self.directory.mkdir(parents=True, exist_ok=True)
+        # Without fcntl, fall back to a semaphore within this process
+        self._local = threading.BoundedSemaphore(self.slots) if fcntl is None else None
+
+    def _slot_path(self, index: int) -> Path:
+        return self.directory / f"slot-{index}.lock"
+
+    def _try_acquire(self) -> Optional[int]:
+        for index in range(self.slots):
+            # A descriptor of our own per attempt, so threads of one process exclude each other too
+            fd = os.open(self._slot_path(index), os.O_RDWR | os.O_CREAT, 0o644)
+            if _try_lock(fd):
+                return fd
+            os.close(fd)
+        return None
+
+    @contextmanager
+    def acquire(self) -> Iterator[None]:
+        """Wait for a free slot and hold it for the duration of the block."""
+        if self._local is not None:
+            with self._local:
+                yield
+            return
+        fd = self._try_acquire()
+        while fd is None:
+            time.sleep(self.poll_seconds)
+            fd = self._try_acquire()
+        try:
+            yield
+        finally:
+            os.close(fd)
+
+    def busy(self) -> int:
+        """Number of slots currently held by any process."""
+        if fcntl is None:
+            return 0
+        busy = 0
+        for index in range(self.slots):
+            fd = os.open(self._slot_path(index), os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if not _try_lock(fd):
+                    busy += 1
+            finally:
+                os.close(fd)
+        return busy
+
+
+class LeaderLock:
+    """Elects one process per host to run singleton background tasks"""
+
+    def __init__(self, path: Path, poll_seconds: float = 5.0):
+        self.path = path
+        self.poll_seconds = poll_seconds
+        self._fd: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    @property
+    def is_leader(self) -> bool:
+        return self._fd is not None
+
+    def try_acquire(self) -> bool:
+        """Become the leader if nobody else is. Leadership lasts until `release` or exit."""
+        if self._fd is not None:
+            return True
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        if not _try_lock(fd):
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode("ascii"))
+        self._fd = fd
+        return True
+
+    def start(self, on_elected: Callable[[], None]) -> None:
+        """Call `on_elected` once this process becomes the leader, now or after the current one exits."""
+        if self.try_acquire():
+            on_elected()
+            return
+
+        def _campaign():
+            while not self._stopped.wait(self.poll_seconds):
+                if self.try_acquire():
+                    on_elected()
+                    return
+
+        self._stopped.clear()
+        self._thread = threading.Thread(target=_campaign, name="leader-election", daemon=True)
+        self._thread.start()
+
+    def release(self) -> None:
+        self._stopped.set()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class HostMembership:
+    """Shared lock held by every API process for its lifetime"""
+
+    def __init__(self, directory: Path):
+        self.members_path = directory / "members.lock"
+        self.startup_path = directory / "startup.lock"
+        self._fd: Optional[int] = None
+
+    @contextmanager
+    def join(self) -> Iterator[bool]:
+        """
+        Register this process; yields True if no other API process is running.
+
+        Processes join one at a time, and the block runs before the next one
+        may join, so start-up work of the first process (e.g. recovering
+        interrupted jobs) finishes before any sibling starts.
+        """
+        startup_fd = os.open(self.startup_path, os.O_RDWR | os.O_CREAT, 0o644)
+        fd = os.open(self.members_path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if fcntl is not None:
+                fcntl.flock(startup_fd, fcntl.LOCK_EX)
+            # Every running process holds a shared lock, so an exclusive one means we are alone
+            first = _try_lock(fd)
+            yield first
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_SH)
+            self._fd = fd
+        except BaseException:
+            os.close(fd)
+            raise
+        finally:
+            os.close(startup_fd)
+
+    def leave(self) -> None:
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
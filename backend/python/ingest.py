@@ -0,0 +1,131 @@
+"""
+Opportunistic pre-decoding of uploads.
+
+Demucs first decodes its input and resamples it to the model's sample rate
+and channel layout, which for a compressed upload is a noticeable part of a
+job's run time. Between an upload and the user starting a separation the
+machine is usually idle, so uploads are decoded ahead of time by a single
+low-priority background thread into a float WAV next to the upload (see
+`prepared_path`). A job that starts later separates the prepared file
+instead; a job that starts first simply uses the original. Nothing is
+decoded while disk space is low, and the storage GC deletes prepared files
+first when it runs short.
+"""
+
+import os
+import queue
+import shutil
+import subprocess
+import threading
+from pathlib import Path
+from typing import Callable, Optional, Set
+
+# htdemucs works on 44.1 kHz stereo
+MODEL_SAMPLE_RATE = 44100
+MODEL_CHANNELS = 2
+
+# Codecs Demucs reads directly without going through ffmpeg
+_DIRECT_CODECS = ("pcm_s16le", "pcm_s24le", "pcm_s32le", "pcm_f32le")
+
+
+# Suffix of the decoded copy, which replaces the upload's extension
+PREPARED_SUFFIX = ".prepared.wav"
+
+
+def prepared_path(input_path: Path) -> Path:
+    """Where the decoded, resampled copy of an upload is stored."""
+    return input_path.with_name(f"{input_path.stem}{PREPARED_SUFFIX}")
+
+
+def needs_preparation(codec: Optional[str], sample_rate: Optional[int], channels: Optional[int]) -> bool:
+    """Whether decoding ahead of time saves work (unknown properties count as yes)."""
+    return not (codec in _DIRECT_CODECS and sample_rate == MODEL_SAMPLE_RATE and channels == MODEL_CHANNELS)
+
+
+class AudioPreparer:
+    """Background decoder that converts uploads to the model's input format, one at a time"""
+
+    def __init__(self, timeout_seconds: float = 300.0, niceness: int = 10, has_space: Callable[[], bool] = None):
+        self.timeout_seconds = timeout_seconds
+        self.niceness = niceness
+        # Checked before each decode; a prepared file is about 10 MB per minute of audio
+        self.has_space = has_space
+        self._queue: "queue.Queue[Path]" = queue.Queue()
+        self._pending: Set[Path] = set()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, input_path: Path) -> None:
+        """Queue an upload for decoding; duplicates and already prepared files are skipped."""
+        input_path = Path(input_path)
+        with self._lock:
+            if input_path in self._pending or prepared_path(input_path).exists():
+                return
+            self._pending.add(input_path)
+        self._queue.put(input_path)
+
+    def prepare(self, input_path: Path) -> bool:
+        """Decode one upload now (blocking). Returns True if a prepared file exists afterwards."""
+        target = prepared_path(input_path)
+        if target.exists():
+            return True
+        if not input_path.exists():
+            return False
+        if self.has_space is not None and not self.has_space():
+            print(f"[Ingest] Low on disk space, not pre-decoding {input_path.name}")
+            return False
+
+        # Per process, since API processes sharing the upload folder may decode the same upload
+        tmp_path = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+        # Yield the CPU to separations and request handling
+        nice = ["nice", "-n", str(self.niceness)] if shutil.which("nice") else []
+        try:
+            subprocess.run(
+                nice + [
+                    "ffmpeg", "-y", "-v", "error",
+                    "-i", str(input_path),
+                    "-ar", str(MODEL_SAMPLE_RATE),
+                    "-ac", str(MODEL_CHANNELS),
+                    "-c:a", "pcm_f32le",
+                    "-f", "wav",
+                    str(tmp_path)
+                ],
+                check=True,
+                capture_output=True,
+                timeout=self.timeout_seconds,
+            )
+            # A job never picks up a partially written file
+            os.replace(tmp_path, target)
+            return True
+        except (OSError, subprocess.SubprocessError) as e:
+            print(f"[Ingest] Failed to pre-decode {input_path.name}: {e}")
+            tmp_path.unlink(missing_ok=True)
+            return False
+
+    def start(self) -> None:
+        """Start the background decode thread."""
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="audio-preparer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop after the current file; queued files are dropped."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                input_path = self._queue.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            try:
+                self.prepare(input_path)
+            finally:
+                with self._lock:
+                    self._pending.discard(input_path)
@@ -0,0 +1,293 @@
+"""
+Write-coalescing persistence for in-memory job state.
+
+Job state lives in memory and is marked dirty on every change. A background
+writer flushes each dirty job once per interval, so a burst of progress
+callbacks costs a single file write. Terminal states are flushed straight
+away. Every write goes to a temp file that is atomically renamed into place,
+so a crash never leaves a truncated JSON file behind.
+
+The in-memory state itself is a `JobCache` of compact `JobRecord`s. Jobs
+this process is running are pinned; finished jobs and jobs loaded from disk
+are evicted once the cache is full or they have not been read for a while,
+and are loaded again from their file when needed. A record with changes not
+yet written is dirty and is never evicted.
+"""
+
+import json
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+# Job states that must reach disk immediately
+TERMINAL_STATUSES = ("completed", "error")
+
+
+def write_json_atomic(path: Path, data: dict) -> None:
+    """Write JSON to a temp file next to `path` and atomically rename it into place."""
+    # A unique temp file per write, so concurrent writers never share one
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=f"{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_name, path)
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+class JobRecord:
+    """In-memory state of one job (serialized with the keys of the status API)"""
+    __slots__ = (
+        "id", "status", "progress", "message", "error", "user_id", "stems", "queue",
+        "created_at", "updated_at", "pinned", "dirty", "accessed_at",
+    )
+
+    # Attribute -> key in the persisted and returned dict
+    _KEYS = (
+        ("id", "id"), ("status", "status"), ("progress", "progress"), ("message", "message"),
+        ("error", "error"), ("user_id", "user_id"), ("stems", "stems"), ("queue", "queue"),
+        ("created_at", "createdAt"), ("updated_at", "updatedAt"),
+    )
+
+    def __init__(self, job_id: str, status: str = "queued", progress: int = 0, message: str = None,
+                 error: str = None, user_id: str = None, stems: Dict[str, str] = None,
+                 queue: Dict[str, Any] = None, created_at: float = None, updated_at: float = None):
+        now = time.time()
+        self.id = job_id
+        self.status = status
+        self.progress = progress
+        self.message = message
+        self.error = error
+        self.user_id = user_id
+        self.stems = stems
+        self.queue = queue
+        self.created_at = created_at if created_at is not None else now
+        self.updated_at = updated_at if updated_at is not None else now
+        self.pinned = False
+        # Changed since it was last written to disk
+        self.dirty = False
+        self.accessed_at = 0.0
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "JobRecord":
+        fields = {attr: data.get(key) for attr, key in cls._KEYS if key != "id"}
+        fields["progress"] = fields["progress"] or 0
+        fields["status"] = fields["status"] or "queued"
+        return cls(data["id"], **fields)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """A new dict of the set fields, safe for callers to modify."""
+        return {key: getattr(self, attr) for attr, key in self._KEYS if getattr(self, attr) is not None}
+
+
+class JobCache:
+    """
+    Bounded LRU cache of job records with a TTL.
+
+    Pinned records (jobs this process is running) are never evicted; a record
+    stays pinned until it is updated to a terminal status. Dirty records are
+    kept until the writer has persisted them. Other records are dropped when they have not been read for `ttl_seconds`, and the least
+    recently used ones are evicted when there are more than `max_entries`.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._records: "OrderedDict[str, JobRecord]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def get(self, job_id: str) -> Optional[JobRecord]:
+        """The record of a job, or None if it is not cached (or has expired)."""
+        now = time.monotonic()
+        with self._lock:
+            record = self._records.get(job_id)
+            if record is not None and not (record.pinned or record.dirty) and now - record.accessed_at > self.ttl_seconds:
+                del self._records[job_id]
+                self.expirations += 1
+                record = None
+            if record is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touch(record, now)
+            return record
+
+    def peek(self, job_id: str) -> Optional[JobRecord]:
+        """The cached record without counting a lookup or refreshing it (for persistence)."""
+        return self._records.get(job_id)
+
+    def put(self, record: JobRecord, pinned: bool = False, dirty: bool = False) -> JobRecord:
+        """
+        Cache a record; `pinned` keeps it until it reaches a terminal status,
+        `dirty` until it has been written to disk.
+        """
+        record.pinned = pinned and record.status not in TERMINAL_STATUSES
+        record.dirty = dirty
+        with self._lock:
+            self._records[record.id] = record
+            self._touch(record, time.monotonic())
+            self._evict()
+        return record
+
+    def update(self, job_id: str, **fields) -> Optional[JobRecord]:
+        """Set fields of a cached record, stamp `updated_at` and mark it dirty. Returns None if it is not cached."""
+        with self._lock:
+            record = self._records.get(job_id)
+            if record is None:
+                return None
+            for name, value in fields.items():
+                setattr(record, name, value)
+            record.updated_at = time.time()
+            record.dirty = True
+            if record.status in TERMINAL_STATUSES:
+                record.pinned = False
+            self._touch(record, time.monotonic())
+            return record
+
+    def discard(self, job_id: str) -> None:
+        """Drop a record, e.g. of a job another process has taken over."""
+        with self._lock:
+            self._records.pop(job_id, None)
+
+    def _touch(self, record: JobRecord, now: float) -> None:
+        record.accessed_at = now
+        self._records.move_to_end(record.id)
+
+    def _evict(self) -> None:
+        # Least recently used first, so expired records are at the front
+        now = time.monotonic()
+        excess = len(self._records) - self.max_entries
+        victims = []
+        for job_id, record in self._records.items():
+            expired = now - record.accessed_at > self.ttl_seconds
+            if excess <= 0 and not expired:
+                break
+            if record.pinned or record.dirty:
+                continue
+            victims.append(job_id)
+            excess -= 1
+            if expired:
+                self.expirations += 1
+            else:
+                self.evictions += 1
+        for job_id in victims:
+            del self._records[job_id]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._records),
+                "pinned": sum(1 for record in self._records.values() if record.pinned),
+                "dirty": sum(1 for record in self._records.values() if record.dirty),
+                "maxEntries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": round(self.hits / lookups, 4) if lookups else None,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+            }
+
+
+class JobStateWriter:
+    """Background writer that coalesces job state changes into one write per dirty job"""
+
+    def __init__(self, store_dir: Path, jobs: JobCache, interval_seconds: float = 2.0):
+        self.store_dir = store_dir
+        self.jobs = jobs
+        self.interval_seconds = interval_seconds
+        self._dirty = set()
+        self._lock = threading.Lock()
+        # Serializes snapshot + write, so an older snapshot never lands after a newer one
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def path_for(self, job_id: str) -> Path:
+        """Return the filesystem path for a job's persisted metadata."""
+        return self.store_dir / f"{job_id}.json"
+
+    def mark_dirty(self, job_id: str, flush: bool = False) -> None:
+        """Record that a job changed; write it now if `flush` is set or no writer is running."""
+        job = self.jobs.peek(job_id)
+        if job is not None:
+            # Keeps the record cached until it is written
+            job.dirty = True
+        if flush or self._thread is None:
+            with self._lock:
+                self._dirty.discard(job_id)
+            self._write(job_id)
+            return
+
+        with self._lock:
+            self._dirty.add(job_id)
+
+    def flush(self, job_ids: Iterable[str] = None) -> int:
+        """Write the given (or all) dirty jobs to disk. Returns the number written."""
+        with self._lock:
+            if job_ids is None:
+                pending = self._dirty
+                self._dirty = set()
+            else:
+                pending = self._dirty.intersection(job_ids)
+                self._dirty.difference_update(pending)
+
+        for job_id in pending:
+            self._write(job_id)
+        return len(pending)
+
+    def start(self) -> None:
+        """Start the background flush thread."""
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="job-state-writer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread and flush everything still pending."""
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval_seconds + 5)
+            self._thread = None
+        self.flush()
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            self._wake.wait(self.interval_seconds)
+            self._wake.clear()
+            self.flush()
+
+    def _write(self, job_id: str) -> None:
+        try:
+            with self._write_lock:
+                job = self.jobs.peek(job_id)
+                if job is None:
+                    return
+                # Cleared before the snapshot, so a change made meanwhile marks it dirty again
+                job.dirty = False
+                # Snapshot so the dump is not mutated by a job thread mid-write
+                write_json_atomic(self.path_for(job_id), job.to_dict())
+        except Exception as e:
+            # Persistence failures should not crash the API, but should be visible in logs.
+            print(f"[Jobs] Failed to persist job {job_id}: {e}")
+            # Keep the record and retry with the next flush
+            job.dirty = True
+            with self._lock:
+                self._dirty.add(job_id)
@@ -1,29 +1,54 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends, Request, UploadFile, File
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends, Request, Response, UploadFile, File
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import FileResponse, StreamingResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List, Optional
 from jose import jwt
 import httpx
 import os
 import uuid
 import time
 import json
+import hashlib
+import math
+import socket
+import tempfile
 import threading
 from pathlib import Path
 from processor import AudioProcessor
+from audio_probe import SNIFF_BYTES, AudioInfo, probe_file, sniff_format
+from resumable_uploads import ResumableUploadStore, UploadConflict, contiguous_offset
+from stem_archive import stream_zip
+from stem_mixer import MixCache, StemMix, effective_gains, mix_key
+from token_cache import TokenCache
 import shutil
 import base64
-from datetime import datetime
+from datetime import datetime, timedelta
+from urllib.parse import quote
 from dotenv import load_dotenv
 
-# Database imports
-from database.config import init_database, get_db_session
-from database.repositories import JobRepository, JobMetricRepository, UserQuotaRepository
-
-# Load environment variables
-from dotenv import load_dotenv
+# Load environment variables before the database config reads DATABASE_URL
 load_dotenv()
 
+# Database imports
+from database.config import init_database, async_engine, get_async_db, get_db_session
+from database.repositories import JobRepository, JobMetricRepository
+from database.async_repositories import (
+    AsyncJobRepository, AsyncUploadBlobRepository, AsyncUserQuotaRepository, AsyncMetricRollupRepository
+)
+from database.progress import ProgressBatcher
+from database.writer import db_writer
+from database.queue_tracker import queue_tracker
+from database.rate_limiter import RATE_LIMIT_BACKEND
+from database.rollups import pending_days, roll_up_day
+from job_store import JobCache, JobRecord, JobStateWriter, TERMINAL_STATUSES
+from storage_gc import StorageCollector, job_stem_paths
+from ingest import AudioPreparer, needs_preparation
+from host_locks import ExecutionSlots, HostMembership, LeaderLock
+
 # Environment & configuration
 DEBUG = os.getenv("DEBUG", "false").lower() == "true"
 
@@ -34,26 +59,157 @@ ALLOWED_ORIGINS = [origin.strip() for origin in allowed_origins_env.split(",") i
 JOB_STORE_DIR = Path(os.getenv("JOB_STORE_DIR", "./job_state")).resolve()
 JOB_STORE_DIR.mkdir(parents=True, exist_ok=True)
 
+# How often dirty job state is flushed to JOB_STORE_DIR and buffered progress
+# to the database (status transitions and terminal states are written immediately)
+JOB_FLUSH_INTERVAL_SECONDS = float(os.getenv("JOB_FLUSH_INTERVAL_SECONDS", "2"))
+
+# Directory for segment checkpoints of long-running separations
+CHECKPOINT_DIR = Path(os.getenv("CHECKPOINT_DIR", "./checkpoints")).resolve()
+CHECKPOINT_DIR.mkdir(parents=True, exist_ok=True)
+
+# Segment length for checkpointed separation (0 disables checkpointing)
+CHECKPOINT_SEGMENT_SECONDS = int(os.getenv("CHECKPOINT_SEGMENT_SECONDS", "60"))
+
 # Directory for audio uploads
 UPLOAD_DIR = Path(os.getenv("UPLOAD_DIR", "./uploads")).resolve()
 UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
 
+# Separated stems; the processor writes them next to the upload folder
+SEPARATED_DIR = UPLOAD_DIR.parent / "separated"
+
+# Storage GC: files of finished jobs are deleted after auto_cleanup_at, and
+# least recently accessed outputs are evicted early while free disk space is
+# below STORAGE_MIN_FREE_PERCENT
+STORAGE_GC_INTERVAL_SECONDS = float(os.getenv("STORAGE_GC_INTERVAL_SECONDS", "600"))
+STORAGE_GC_BATCH_SIZE = int(os.getenv("STORAGE_GC_BATCH_SIZE", "100"))
+STORAGE_MIN_FREE_PERCENT = float(os.getenv("STORAGE_MIN_FREE_PERCENT", "10"))
+
+# Uploads no job uses are deleted once nobody uploaded them for this long
+UNUSED_UPLOAD_TTL_HOURS = float(os.getenv("UNUSED_UPLOAD_TTL_HOURS", "24"))
+
+# Fetching a finished job's outputs refreshes its last access time at most this often
+ACCESS_TOUCH_INTERVAL_SECONDS = 600
+
 # Maximum file size configuration
 MAX_FILE_SIZE_MB = int(os.getenv("MAX_FILE_SIZE_MB", "25"))
 MAX_FILE_SIZE_BYTES = MAX_FILE_SIZE_MB * 1024 * 1024
 
+# Longest accepted track (0 disables the check). The length is read from the
+# file headers at upload time, with ffprobe as a fallback bounded by
+# AUDIO_PROBE_TIMEOUT_SECONDS.
+MAX_AUDIO_DURATION_SECONDS = float(os.getenv("MAX_AUDIO_DURATION_SECONDS", "1800"))
+AUDIO_PROBE_TIMEOUT_SECONDS = float(os.getenv("AUDIO_PROBE_TIMEOUT_SECONDS", "5"))
+
+# Decode and resample uploads to the model's input format in the background
+# while the machine is idle, so separations skip that step
+PREDECODE_UPLOADS = os.getenv("PREDECODE_UPLOADS", "true").lower() == "true"
+
+# Uploads are read and written in chunks of this size
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+
+# Resumable uploads: chunk size for numbered chunks, and how long an
+# unfinished upload is kept before it is deleted
+RESUMABLE_CHUNK_BYTES = int(os.getenv("RESUMABLE_CHUNK_BYTES", str(5 * 1024 * 1024)))
+RESUMABLE_UPLOAD_TTL_HOURS = float(os.getenv("RESUMABLE_UPLOAD_TTL_HOURS", "24"))
+
+# Server-side mixes (/jobs/{id}/mix): gains are limited to this range in dB,
+# and mixes requested at least MIX_CACHE_MIN_REQUESTS times are cached on
+# disk up to MIX_CACHE_MAX_MB (0 disables the cache)
+MIX_MIN_GAIN_DB = -96.0
+MIX_MAX_GAIN_DB = 24.0
+MIX_CACHE_MAX_MB = int(os.getenv("MIX_CACHE_MAX_MB", "2048"))
+MIX_CACHE_MIN_REQUESTS = int(os.getenv("MIX_CACHE_MIN_REQUESTS", "2"))
+
+# Several API processes on one host (WEB_CONCURRENCY uvicorn workers) share
+# job state through the database and coordinate through lock files in
+# RUNTIME_DIR (must be a local filesystem): at most EXECUTION_SLOTS inline
+# separations run at once across all of them
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "1"))
+if WEB_CONCURRENCY > 1 and RATE_LIMIT_BACKEND != "database":
+    # In-memory windows are per process, so every user would get WEB_CONCURRENCY times their quota
+    raise RuntimeError("WEB_CONCURRENCY > 1 requires RATE_LIMIT_BACKEND=database")
+RUNTIME_DIR = Path(os.getenv("RUNTIME_DIR", "./run")).resolve()
+RUNTIME_DIR.mkdir(parents=True, exist_ok=True)
+EXECUTION_SLOTS = int(os.getenv("EXECUTION_SLOTS", "1"))
+
+# Inline jobs are leased to the API process that runs them and renewed by its
+# heartbeat. When a process dies, the leader takes over its jobs once the lease
+# has expired; a job taken over MAX_JOB_ATTEMPTS times is failed instead
+PROCESS_ID = f"api-{socket.gethostname()}-{os.getpid()}"
+INLINE_LEASE_SECONDS = int(os.getenv("INLINE_LEASE_SECONDS", "60"))
+MAX_JOB_ATTEMPTS = int(os.getenv("MAX_JOB_ATTEMPTS", "3"))
+
+# "inline" runs separations inside the API process; "queue" only enqueues
+# them for standalone workers (`python worker.py --daemon`)
+EXECUTION_MODE = os.getenv("EXECUTION_MODE", "inline").lower()
+
+# How often the in-memory queue counters are reconciled against the jobs table
+# (picks up transitions made by standalone workers in queue mode)
+QUEUE_RECONCILE_SECONDS = float(os.getenv("QUEUE_RECONCILE_SECONDS", "30"))
+
+# Maximum number of job IDs accepted by /status:batch
+MAX_BATCH_STATUS_IDS = int(os.getenv("MAX_BATCH_STATUS_IDS", "500"))
+
+# How often job metrics are aggregated into hourly/daily rollups
+METRICS_ROLLUP_INTERVAL_SECONDS = float(os.getenv("METRICS_ROLLUP_INTERVAL_SECONDS", "300"))
+
+# In-memory job state: jobs this process runs are always kept; others are
+# evicted beyond JOB_CACHE_MAX_ENTRIES or when unread for JOB_CACHE_TTL_SECONDS
+# (and reloaded from JOB_STORE_DIR on demand)
+JOB_CACHE_MAX_ENTRIES = int(os.getenv("JOB_CACHE_MAX_ENTRIES", "10000"))
+JOB_CACHE_TTL_SECONDS = float(os.getenv("JOB_CACHE_TTL_SECONDS", "3600"))
+
+# Verified tokens are cached until their `exp`, or for TOKEN_CACHE_TTL_SECONDS
+# if they have none (0 entries disables the cache)
+TOKEN_CACHE_MAX_ENTRIES = int(os.getenv("TOKEN_CACHE_MAX_ENTRIES", "10000"))
+TOKEN_CACHE_TTL_SECONDS = float(os.getenv("TOKEN_CACHE_TTL_SECONDS", "60"))
+
+# User IDs (token "sub") allowed to call /admin endpoints
+ADMIN_USER_IDS = {user_id.strip() for user_id in os.getenv("ADMIN_USER_IDS", "").split(",") if user_id.strip()}
+
 app = FastAPI(title="Singscape AI Engine", version="1.0.0")
 
 # Initialize database on startup
 @app.on_event("startup")
 async def startup_event():
     """Initialize database and perform startup tasks"""
-    try:
-        init_database()
-        print("[Backend] Database initialized successfully")
-    except Exception as e:
-        print(f"[Backend] Database initialization failed: {e}")
-        raise
+    # API processes start one at a time, so migrations never run concurrently
+    # and the first process finishes recovery before its siblings serve requests
+    with host_membership.join() as first_process:
+        try:
+            init_database()
+            print("[Backend] Database initialized successfully")
+        except Exception as e:
+            print(f"[Backend] Database initialization failed: {e}")
+            raise
+
+        # Pick up jobs interrupted by the previous shutdown or crash. Only the
+        # first API process does this; while a sibling is running, its queued
+        # and processing jobs are live (jobs of a sibling that crashes are taken
+        # over once their lease expires). In queue mode workers own execution
+        # and re-queue expired leases themselves.
+        if first_process and EXECUTION_MODE == "inline":
+            try:
+                recovered = recover_interrupted_jobs(expired_only=False)
+                if recovered:
+                    print(f"[Jobs] Re-enqueued {recovered} interrupted jobs")
+            except Exception as e:
+                print(f"[Jobs] Recovery of interrupted jobs failed: {e}")
+
+    # Serve queue counts from memory, reconciled against the database on a timer
+    def _reconcile_queue():
+        while True:
+            db = get_db_session()
+            try:
+                queue_tracker.reconcile(db)
+            except Exception as e:
+                print(f"[Queue] Reconciliation failed: {e}")
+            finally:
+                db.close()
+            time.sleep(QUEUE_RECONCILE_SECONDS)
+
+    # Every process keeps its own counters, so each one reconciles
+    threading.Thread(target=_reconcile_queue, name="queue-reconciler", daemon=True).start()
 
 # Enable CORS for Next.js frontend
 cors_origins = ALLOWED_ORIGINS or (["*"] if DEBUG else [])
@@ -62,16 +218,22 @@ app.add_middleware(
     allow_origins=cors_origins,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Resumable upload progress is reported in response headers
+    expose_headers=["Upload-Offset", "Upload-Length", "Upload-Chunk-Size"],
 )
 
-# Global lock for GPU protection (RTX 3050 safe)
-gpu_lock = threading.Lock()
+# Host-wide limit on concurrent separations (RTX 3050 safe), shared by all API processes
+execution_slots = ExecutionSlots(RUNTIME_DIR / "slots", EXECUTION_SLOTS)
+host_membership = HostMembership(RUNTIME_DIR)
+# The leader process runs the background tasks that must run once per host
+leader_lock = LeaderLock(RUNTIME_DIR / "leader.lock")
 
 # NextAuth Configuration
 NEXTAUTH_SECRET = os.getenv("NEXTAUTH_SECRET")
 NEXTAUTH_URL = os.getenv("NEXTAUTH_URL", "http://localhost:3000")
 
 security = HTTPBearer()
+token_cache = TokenCache(TOKEN_CACHE_MAX_ENTRIES, TOKEN_CACHE_TTL_SECONDS)
 
 async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(security)):
     """Verifies a NextAuth token.
@@ -87,6 +249,10 @@ async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(secur
     if not NEXTAUTH_SECRET:
         raise HTTPException(status_code=401, detail="NEXTAUTH_SECRET not configured")
 
+    cached = token_cache.get(token)
+    if cached is not None:
+        return cached
+
     # Helper to decode a base64url-encoded JSON payload
     def _decode_base64url_payload(tkn: str) -> dict:
         # Pad to a multiple of 4
@@ -106,6 +272,7 @@ async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(secur
             raise HTTPException(status_code=401, detail=f"Invalid token: {e}")
         if not payload.get("sub"):
             raise HTTPException(status_code=401, detail="Invalid token: missing user ID")
+        token_cache.put(token, payload)
         return payload
 
     # Base64 URL-encoded payload path
@@ -113,6 +280,7 @@ async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(secur
         payload = _decode_base64url_payload(token)
         if not payload.get("sub"):
             raise HTTPException(status_code=401, detail="Invalid token: missing user ID")
+        token_cache.put(token, payload)
         return payload
     except HTTPException:
         raise
@@ -120,56 +288,85 @@ async def verify_token(credentials: HTTPAuthorizationCredentials = Depends(secur
         raise HTTPException(status_code=401, detail=f"Invalid token format: {e}")
 
 
-# In-memory job repository (for demo purposes) + simple persistent store
-jobs = {}
+async def verify_admin(auth: dict = Depends(verify_token)):
+    """Allows only users listed in ADMIN_USER_IDS."""
+    if auth.get("sub") not in ADMIN_USER_IDS:
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return auth
+
+
+# In-memory job state (bounded cache) + simple persistent store
+job_cache = JobCache(JOB_CACHE_MAX_ENTRIES, JOB_CACHE_TTL_SECONDS)
+job_writer = JobStateWriter(JOB_STORE_DIR, job_cache, JOB_FLUSH_INTERVAL_SECONDS)
+progress_batcher = ProgressBatcher(db_writer, JOB_FLUSH_INTERVAL_SECONDS)
+mix_cache = MixCache(SEPARATED_DIR / ".mixes", MIX_CACHE_MAX_MB * 1024 * 1024, MIX_CACHE_MIN_REQUESTS)
+storage_collector = StorageCollector(
+    [UPLOAD_DIR, SEPARATED_DIR],
+    get_db_session,
+    db_writer,
+    min_free_percent=STORAGE_MIN_FREE_PERCENT,
+    batch_size=STORAGE_GC_BATCH_SIZE,
+    interval_seconds=STORAGE_GC_INTERVAL_SECONDS,
+    unused_upload_seconds=UNUSED_UPLOAD_TTL_HOURS * 3600,
+    mix_cache=mix_cache,
+)
+# Pre-decoding pauses while the storage GC is short of space
+audio_preparer = AudioPreparer(has_space=lambda: not storage_collector.under_pressure())
+# Kept inside UPLOAD_DIR so finished uploads are moved into place with a rename
+resumable_uploads = ResumableUploadStore(
+    UPLOAD_DIR / ".resumable",
+    RESUMABLE_CHUNK_BYTES,
+    RESUMABLE_UPLOAD_TTL_HOURS * 3600,
+)
 
 
 def _job_path(job_id: str) -> Path:
     """Return the filesystem path for a job's persisted metadata."""
-    return JOB_STORE_DIR / f"{job_id}.json"
+    return job_writer.path_for(job_id)
 
 
 def save_job(job_id: str) -> None:
-    """Persist a job's metadata to disk."""
-    try:
-        path = _job_path(job_id)
-        with path.open("w", encoding="utf-8") as f:
-            json.dump(jobs[job_id], f)
-    except Exception as e:
-        # Persistence failures should not crash the API, but should be visible in logs.
-        print(f"[Jobs] Failed to persist job {job_id}: {e}")
+    """
+    Mark a job's metadata for persistence.
 
+    Writes are coalesced by the background writer; terminal states are
+    flushed to disk immediately.
+    """
+    job = job_cache.peek(job_id)
+    flush = job is not None and job.status in TERMINAL_STATUSES
+    job_writer.mark_dirty(job_id, flush=flush)
 
-def load_job(job_id: str):
-    """Load a job from memory or disk, or return None if not found."""
-    if job_id in jobs:
-        return jobs[job_id]
 
-    path = _job_path(job_id)
-    if path.exists():
+def load_job(job_id: str):
+    """Load a job from memory or disk as a dict, or return None if not found."""
+    record = job_cache.get(job_id)
+    if record is None:
+        path = _job_path(job_id)
+        if not path.exists():
+            return None
         try:
             with path.open("r", encoding="utf-8") as f:
-                job_data = json.load(f)
-            jobs[job_id] = job_data
-            return job_data
+                record = job_cache.put(JobRecord.from_dict(json.load(f)))
         except Exception as e:
             print(f"[Jobs] Failed to load job {job_id}: {e}")
             return None
 
-    return None
+    return record.to_dict()
 
 
 def cleanup_old_jobs(max_age_seconds: int = 7 * 24 * 60 * 60) -> None:
     """
     Remove old job metadata files from disk to prevent unbounded growth.
 
-    This does not delete audio files; it only cleans JSON state in JOB_STORE_DIR.
+    This does not delete audio files (see StorageCollector); it only cleans
+    JSON state in JOB_STORE_DIR.
+    Temp files left behind by an interrupted atomic write are swept as well.
     """
     now = time.time()
     cutoff = now - max_age_seconds
 
     try:
-        for path in JOB_STORE_DIR.glob("*.json"):
+        for path in [*JOB_STORE_DIR.glob("*.json"), *JOB_STORE_DIR.glob("*.json.*.tmp")]:
             try:
                 stat = path.stat()
                 if stat.st_mtime < cutoff:
@@ -195,6 +392,63 @@ class SeparationRequest(BaseModel):
     stems: int = 2
 
 
+class BatchStatusRequest(BaseModel):
+    job_ids: List[str]
+
+
+class CreateUploadRequest(BaseModel):
+    file_name: str
+    file_size: int
+
+
+class CompleteUploadRequest(BaseModel):
+    sha256: Optional[str] = None
+
+
+class DedupeUploadRequest(BaseModel):
+    sha256: str
+    file_name: str = None
+
+
+class MixRequest(BaseModel):
+    gains: Dict[str, float] = {}  # stem -> gain in dB
+    mute: List[str] = []
+    solo: List[str] = []
+
+
+def job_to_dict(job) -> dict:
+    """Convert a database job to the dict format returned by the status endpoints."""
+    job_dict = {
+        "id": job.id,
+        "status": job.status,
+        "progress": job.progress,
+        "message": job.message,
+        "error": job.error,
+        "user_id": job.user_id,
+        "createdAt": job.created_at.timestamp(),
+        "updatedAt": job.updated_at.timestamp(),
+    }
+
+    # Add stem files if completed
+    if job.status == "completed" and job.stem_files:
+        job_dict["stems"] = job.stem_files
+
+    return job_dict
+
+
+def touch_jobs(finished_jobs) -> None:
+    """Move finished jobs whose outputs were fetched to the back of the eviction order."""
+    now = datetime.utcnow()
+    stale_ids = [
+        job.id for job in finished_jobs
+        if not job.last_accessed_at
+        or (now - job.last_accessed_at).total_seconds() >= ACCESS_TOUCH_INTERVAL_SECONDS
+    ]
+    if stale_ids:
+        # Not awaited; a lost touch only makes the jobs earlier eviction candidates
+        db_writer.submit(lambda db: JobRepository(db).touch_jobs(stale_ids, now))
+
+
 @app.get("/upload/constraints")
 async def get_upload_constraints():
     """
@@ -203,19 +457,112 @@ async def get_upload_constraints():
     return {
         "maxFileSize": MAX_FILE_SIZE_BYTES,
         "maxFileSizeMB": MAX_FILE_SIZE_MB,
-        "acceptedTypes": ["audio/mpeg", "audio/wav", "audio/mp3"],
-        "acceptedExtensions": [".mp3", ".wav"],
+        "maxDurationSeconds": MAX_AUDIO_DURATION_SECONDS or None,
+        "acceptedTypes": ["audio/mpeg", "audio/wav", "audio/mp3", "audio/flac", "audio/ogg"],
+        "acceptedExtensions": [".mp3", ".wav", ".flac", ".ogg"],
     }
 
+
+def _write_upload_chunk(buffer, hasher, chunk: bytes) -> None:
+    # Runs in the threadpool; hashlib releases the GIL for large buffers
+    buffer.write(chunk)
+    hasher.update(chunk)
+
+
+def _blob_path(sha256: str, audio_format: str) -> Path:
+    """Where an upload with this content is stored."""
+    return UPLOAD_DIR / f"{sha256}.{audio_format}"
+
+
+def _upload_response(raw_name: str, blob) -> dict:
+    return {
+        "fileName": raw_name.replace(" ", "_"),
+        "inputPath": blob.path,
+        "fileSize": blob.file_size,
+        "sha256": blob.sha256,
+        "format": blob.audio_format,
+        **AudioInfo(
+            blob.audio_format,
+            codec=blob.audio_codec,
+            duration_seconds=blob.audio_duration_seconds,
+            sample_rate=blob.audio_sample_rate,
+            channels=blob.audio_channels,
+        ).to_dict(),
+    }
+
+
+def _check_audio_duration(duration_seconds: Optional[float]) -> None:
+    if MAX_AUDIO_DURATION_SECONDS and duration_seconds and duration_seconds > MAX_AUDIO_DURATION_SECONDS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Track length {duration_seconds / 60:.1f} min exceeds maximum allowed length of "
+                   f"{MAX_AUDIO_DURATION_SECONDS / 60:.1f} min"
+        )
+
+
+async def _store_upload(
+    db: AsyncSession, tmp_path: Path, raw_name: str, file_size: int, sha256: str, audio_format: str, user_id: str
+) -> dict:
+    """
+    Move a fully received upload to its content-addressed path and build the upload response.
+
+    The user is recorded as an owner of the blob, so /uploads/dedupe lets
+    them reuse it later.
+
+    The stream properties are read from the file headers (see audio_probe)
+    unless the same bytes were probed before, and tracks longer than
+    MAX_AUDIO_DURATION_SECONDS are rejected. The blob is registered before
+    the file is moved so the storage GC cannot collect an existing copy
+    while it is being replaced. Identical bytes map to the same path, so
+    replacing an existing copy changes nothing.
+    """
+    blob_repo = AsyncUploadBlobRepository(db)
+    blob = await blob_repo.get_blob(sha256)
+    if blob is not None and blob.audio_codec is not None:
+        audio_fields = {}
+        duration_seconds = blob.audio_duration_seconds
+    else:
+        info = await run_in_threadpool(probe_file, tmp_path, AUDIO_PROBE_TIMEOUT_SECONDS)
+        audio_fields = {
+            "audio_duration_seconds": info.duration_seconds if info else None,
+            "audio_codec": info.codec if info else None,
+            "audio_sample_rate": info.sample_rate if info else None,
+            "audio_channels": info.channels if info else None,
+        }
+        duration_seconds = audio_fields["audio_duration_seconds"]
+    _check_audio_duration(duration_seconds)
+
+    blob = await blob_repo.register_blob(
+        sha256, str(_blob_path(sha256, audio_format)), file_size, audio_format, user_id=user_id, **audio_fields
+    )
+    # Readers never see a partially written file
+    await run_in_threadpool(os.replace, tmp_path, blob.path)
+    _prepare_upload(blob)
+    return _upload_response(raw_name, blob)
+
+
+def _prepare_upload(blob) -> None:
+    if PREDECODE_UPLOADS and needs_preparation(blob.audio_codec, blob.audio_sample_rate, blob.audio_channels):
+        audio_preparer.submit(Path(blob.path))
+
+
 @app.post("/upload")
 async def upload_file(
     file: UploadFile = File(...),
     auth: dict = Depends(verify_token),
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Accept an audio file upload and save it on the backend.
 
-    Returns a fileName and inputPath that can be used by /separate.
+    The upload is read in large chunks without blocking the event loop,
+    hashed and checked for an audio header in the same pass, written to a
+    temporary file and renamed into place once complete. Uploads are stored
+    once per content hash; clients that know the hash up front can skip the
+    transfer entirely with /uploads/dedupe.
+
+    Returns a fileName and inputPath that can be used by /separate, and the
+    track's duration, codec, sample rate and channels.
     """
     try:
         # Validate file size
@@ -226,148 +573,483 @@ async def upload_file(
             )
         
         raw_name = file.filename or "audio"
-        safe_name = raw_name.replace(" ", "_")
-        dest_path = UPLOAD_DIR / safe_name
-
-        # Write file with size tracking
-        bytes_written = 0
-        with dest_path.open("wb") as buffer:
-            while chunk := file.file.read(8192):
-                bytes_written += len(chunk)
-                if bytes_written > MAX_FILE_SIZE_BYTES:
-                    dest_path.unlink(missing_ok=True)  # Clean up oversized file
-                    raise HTTPException(
-                        status_code=413,
-                        detail=f"File size {bytes_written / 1024 / 1024:.1f}MB exceeds maximum allowed size of {MAX_FILE_SIZE_MB}MB"
-                    )
-                buffer.write(chunk)
+        fd, tmp_name = tempfile.mkstemp(dir=UPLOAD_DIR, prefix=".upload-", suffix=".part")
+        tmp_path = Path(tmp_name)
+        try:
+            hasher = hashlib.sha256()
+            audio_format = None
+            bytes_written = 0
+            with os.fdopen(fd, "wb") as buffer:
+                while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+                    if bytes_written == 0:
+                        audio_format = sniff_format(chunk[:SNIFF_BYTES])
+                        if audio_format is None:
+                            raise HTTPException(status_code=415, detail="File is not a supported audio format")
+                    bytes_written += len(chunk)
+                    if bytes_written > MAX_FILE_SIZE_BYTES:
+                        raise HTTPException(
+                            status_code=413,
+                            detail=f"File size {bytes_written / 1024 / 1024:.1f}MB exceeds maximum allowed size of {MAX_FILE_SIZE_MB}MB"
+                        )
+                    await run_in_threadpool(_write_upload_chunk, buffer, hasher, chunk)
 
-        return {
-            "fileName": safe_name,
-            "inputPath": str(dest_path),
-        }
+            if bytes_written == 0:
+                raise HTTPException(status_code=400, detail="Uploaded file is empty")
+
+            return await _store_upload(
+                db, tmp_path, raw_name, bytes_written, hasher.hexdigest(), audio_format, auth.get("sub") or "anonymous"
+            )
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)  # Clean up rejected or interrupted uploads
+            raise
     except HTTPException:
         raise  # Re-raise HTTP exceptions as-is
     except Exception as e:
         print(f"[Upload] Error saving file: {e}")
         raise HTTPException(status_code=500, detail="Failed to upload file")
 
+async def _get_resumable_upload(upload_id: str, auth: dict) -> dict:
+    session = await run_in_threadpool(resumable_uploads.get, upload_id)
+    if session is None or session["user_id"] != (auth.get("sub") or "anonymous"):
+        raise HTTPException(status_code=404, detail="Upload not found")
+    return session
+
+
+async def _receive_upload_bytes(request: Request, session: dict, start: int, end: int, record_partial: bool) -> dict:
+    """
+    Write the request body to [start, end) of an upload's file.
+
+    The body is buffered up to UPLOAD_CHUNK_BYTES and written in place. With
+    `record_partial` every write is checked against and recorded at the
+    current offset, so a PATCH cut off midway resumes after the last durable
+    write and concurrent PATCHes cannot interleave; numbered chunks are only
+    recorded once complete. Returns the session state after the last record.
+    """
+    upload_id = session["id"]
+    buffer = bytearray()
+    position = start
+
+    async def flush() -> dict:
+        nonlocal position, session
+        data = bytes(buffer)
+        buffer.clear()
+        if position == 0 and len(data) >= SNIFF_BYTES and sniff_format(data[:SNIFF_BYTES]) is None:
+            await run_in_threadpool(resumable_uploads.discard, upload_id)
+            raise HTTPException(status_code=415, detail="File is not a supported audio format")
+        if record_partial:
+            session = await run_in_threadpool(resumable_uploads.append, upload_id, position, data)
+        else:
+            await run_in_threadpool(resumable_uploads.write, upload_id, position, data)
+        position += len(data)
+        return session
+
+    try:
+        async for data in request.stream():
+            if position + len(buffer) + len(data) > end:
+                raise HTTPException(status_code=413, detail="Request body extends past the end of the upload or chunk")
+            buffer += data
+            if len(buffer) >= UPLOAD_CHUNK_BYTES:
+                session = await flush()
+        if buffer:
+            session = await flush()
+        if not record_partial and position != end:
+            raise HTTPException(status_code=400, detail=f"Chunk must be {end - start} bytes, got {position - start}")
+        if not record_partial:
+            session = await run_in_threadpool(resumable_uploads.record, upload_id, start, end)
+    except UploadConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except FileNotFoundError:
+        raise HTTPException(status_code=409, detail="Upload was completed or discarded")
+    except BaseException:
+        if not record_partial and position > start:
+            try:
+                # A failed retry may have overwritten part of a chunk received earlier
+                await run_in_threadpool(resumable_uploads.forget, upload_id, start, end)
+            except FileNotFoundError:
+                pass  # completed or discarded meanwhile
+        raise
+    return session
+
+
+def _resumable_headers(session: dict) -> dict:
+    return {
+        "Upload-Offset": str(contiguous_offset(session)),
+        "Upload-Length": str(session["size"]),
+        "Upload-Chunk-Size": str(session["chunk_size"]),
+    }
+
+
+@app.post("/uploads/dedupe")
+async def dedupe_upload(
+    request: DedupeUploadRequest,
+    auth: dict = Depends(verify_token),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Finish an upload without sending it when the caller already uploaded the same bytes.
+
+    Returns the same fields as /upload, or 404 if the content is unknown
+    and the file has to be uploaded. Only the caller's own uploads are
+    considered, so the answer says nothing about other users' files.
+    """
+    user_id = auth.get("sub") or "anonymous"
+    blob_repo = AsyncUploadBlobRepository(db)
+    blob = await blob_repo.get_owned_blob(request.sha256.lower(), user_id)
+    if blob is None or not await run_in_threadpool(os.path.exists, blob.path):
+        raise HTTPException(status_code=404, detail="No upload with this content; upload the file")
+    _check_audio_duration(blob.audio_duration_seconds)
+
+    # Refreshes the upload time so the blob outlives the storage GC grace period
+    blob = await blob_repo.register_blob(blob.sha256, blob.path, blob.file_size, blob.audio_format, user_id=user_id)
+    _prepare_upload(blob)
+    return _upload_response(request.file_name or "audio", blob)
+
+
+@app.post("/uploads", status_code=201)
+async def create_resumable_upload(request: CreateUploadRequest, auth: dict = Depends(verify_token)):
+    """
+    Start a resumable upload of `file_size` bytes.
+
+    Send the bytes with PATCH /uploads/{id} (sequential, `Upload-Offset`
+    header) or PUT /uploads/{id}/chunks/{index} (`chunkSize` byte chunks, in
+    any order and in parallel), check progress with HEAD /uploads/{id},
+    then call POST /uploads/{id}/complete.
+    """
+    if request.file_size <= 0:
+        raise HTTPException(status_code=400, detail="Uploaded file is empty")
+    if request.file_size > MAX_FILE_SIZE_BYTES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"File size {request.file_size / 1024 / 1024:.1f}MB exceeds maximum allowed size of {MAX_FILE_SIZE_MB}MB"
+        )
+    try:
+        session = await run_in_threadpool(
+            resumable_uploads.create, auth.get("sub") or "anonymous", request.file_name or "audio", request.file_size
+        )
+    except OSError as e:
+        print(f"[Upload] Failed to reserve space for upload: {e}")
+        raise HTTPException(status_code=507, detail="Not enough storage for this upload")
+
+    return {
+        "uploadId": session["id"],
+        "offset": 0,
+        "fileSize": session["size"],
+        "chunkSize": session["chunk_size"],
+        "chunkCount": math.ceil(session["size"] / session["chunk_size"]),
+    }
+
+
+@app.head("/uploads/{upload_id}")
+async def get_resumable_upload_offset(upload_id: str, auth: dict = Depends(verify_token)):
+    """Report how many bytes from the start of the file have been received."""
+    session = await _get_resumable_upload(upload_id, auth)
+    return Response(status_code=200, headers=_resumable_headers(session))
+
+
+@app.patch("/uploads/{upload_id}")
+async def append_resumable_upload(upload_id: str, request: Request, auth: dict = Depends(verify_token)):
+    """Append the request body at `Upload-Offset`, which must equal the current offset."""
+    session = await _get_resumable_upload(upload_id, auth)
+    offset = contiguous_offset(session)
+    try:
+        requested_offset = int(request.headers.get("Upload-Offset", ""))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Missing or invalid Upload-Offset header")
+    if requested_offset != offset:
+        raise HTTPException(status_code=409, detail=f"Upload-Offset {requested_offset} does not match current offset {offset}")
+
+    session = await _receive_upload_bytes(request, session, offset, session["size"], record_partial=True)
+    return Response(status_code=204, headers=_resumable_headers(session))
+
+
+@app.put("/uploads/{upload_id}/chunks/{index}")
+async def put_resumable_upload_chunk(upload_id: str, index: int, request: Request, auth: dict = Depends(verify_token)):
+    """Write chunk `index` (bytes index * chunkSize up to the next chunk or the end of the file)."""
+    session = await _get_resumable_upload(upload_id, auth)
+    start = index * session["chunk_size"]
+    if index < 0 or start >= session["size"]:
+        raise HTTPException(status_code=404, detail="Chunk index out of range")
+    end = min(start + session["chunk_size"], session["size"])
+
+    session = await _receive_upload_bytes(request, session, start, end, record_partial=False)
+    return Response(status_code=204, headers=_resumable_headers(session))
+
+
+def _hash_and_sniff(path: Path):
+    hasher = hashlib.sha256()
+    with path.open("rb") as f:
+        header = f.read(SNIFF_BYTES)
+        hasher.update(header)
+        while chunk := f.read(UPLOAD_CHUNK_BYTES):
+            hasher.update(chunk)
+    return hasher.hexdigest(), sniff_format(header)
+
+
+@app.post("/uploads/{upload_id}/complete")
+async def complete_resumable_upload(
+    upload_id: str,
+    request: CompleteUploadRequest = None,
+    auth: dict = Depends(verify_token),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Finish a fully received upload.
+
+    The file is already assembled in place; it is hashed (and compared with
+    `sha256` when given), checked for an audio header and moved into the
+    upload directory. Returns the same fields as /upload, again for repeated
+    calls; 409 while the upload is incomplete or another call completes it.
+    """
+    session = await _get_resumable_upload(upload_id, auth)
+    try:
+        session = await run_in_threadpool(resumable_uploads.claim_completion, upload_id)
+    except UploadConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except FileNotFoundError:
+        # Completed by a concurrent call since the first read, or discarded
+        session = await run_in_threadpool(resumable_uploads.get, upload_id)
+        if session is None or "result" not in session:
+            raise HTTPException(status_code=404, detail="Upload not found")
+    if "result" in session:
+        return session["result"]
+
+    part_path = resumable_uploads.part_path(upload_id)
+    try:
+        sha256, audio_format = await run_in_threadpool(_hash_and_sniff, part_path)
+        if audio_format is None:
+            raise HTTPException(status_code=415, detail="File is not a supported audio format")
+        if request and request.sha256 and request.sha256.lower() != sha256:
+            # There is no telling which bytes are wrong, so the upload starts over
+            raise HTTPException(status_code=422, detail="Checksum mismatch; start the upload again")
+        result = await _store_upload(
+            db, part_path, session["file_name"], session["size"], sha256, audio_format, session["user_id"]
+        )
+    except HTTPException:
+        # The bytes are unusable
+        await run_in_threadpool(resumable_uploads.discard, upload_id)
+        raise
+    except Exception as e:
+        print(f"[Upload] Error finishing upload {upload_id}: {e}")
+        # The client may retry the completion
+        await run_in_threadpool(resumable_uploads.release_completion, upload_id)
+        raise HTTPException(status_code=500, detail="Failed to upload file")
+    await run_in_threadpool(resumable_uploads.finish, upload_id, result)
+    return result
+
+def update_db_job(job_id: str, **fields) -> None:
+    """
+    Write a job status transition to the database immediately.
+
+    Any buffered progress for the job is dropped first so a later batch
+    cannot overwrite the new state. Failures are logged, not raised, so a
+    database hiccup never aborts a running separation.
+    """
+    progress_batcher.discard(job_id)
+    try:
+        db_writer.run(lambda db: JobRepository(db).update_job(job_id=job_id, **fields))
+    except Exception as e:
+        print(f"[Jobs] Failed to update job {job_id} in database: {e}")
+
+
+def record_job_metric(job_id: str, input_path: str, stems: int, result: dict, device: str) -> None:
+    """Record a finished job's performance; feeds the queue ETA estimator."""
+    try:
+        db_writer.run(lambda db: JobMetricRepository(db).record_job_result(job_id, input_path, stems, result, device))
+    except Exception as e:
+        print(f"[Jobs] Failed to record metrics for job {job_id}: {e}")
+
+
+# Cancel events of the inline jobs this process runs, set by the lease
+# heartbeat when another process has taken a job over
+inline_runs: Dict[str, threading.Event] = {}
+
+
 def run_separation_task(job_id: str, input_path: str, output_dir: str, stems: int):
     """Background task to run Demucs with concurrency protection."""
+    lease_lost = inline_runs.setdefault(job_id, threading.Event())
     try:
-        jobs[job_id]["status"] = "waiting"
-        jobs[job_id]["message"] = "Waiting for GPU access..."
-        jobs[job_id]["updatedAt"] = time.time()
+        job_cache.update(job_id, status="waiting", message="Waiting for GPU access...")
         save_job(job_id)
+        # The row stays "queued" while waiting so it still counts towards the queue
+        update_db_job(job_id, message="Waiting for GPU access...")
         
-        with gpu_lock:
-            jobs[job_id]["status"] = "processing"
-            jobs[job_id]["message"] = "Separating stems with CUDA..."
-            jobs[job_id]["updatedAt"] = time.time()
+        with execution_slots.acquire():
+            if lease_lost.is_set():
+                job_cache.discard(job_id)
+                print(f"[Jobs] Job {job_id} was taken over by another process; not running it")
+                return
+            job_cache.update(job_id, status="processing", message="Separating stems with CUDA...")
             save_job(job_id)
+            update_db_job(job_id, status="processing", progress=0, message="Separating stems with CUDA...")
             
             processor = AudioProcessor(
                 output_dir=output_dir,
-                stems=stems
+                stems=stems,
+                checkpoint_segment_seconds=CHECKPOINT_SEGMENT_SECONDS
             )
             
             def progress_callback(progress_data):
-                jobs[job_id]["progress"] = progress_data.get("progress", 0)
-                jobs[job_id]["message"] = progress_data.get("raw", "Processing...")
-                jobs[job_id]["updatedAt"] = time.time()
+                progress = progress_data.get("progress", 0)
+                message = progress_data.get("raw", "Processing...")
+                job_cache.update(job_id, progress=progress, message=message)
                 save_job(job_id)
+                progress_batcher.record(job_id, progress, message)
             
-            result = processor.process(input_path, callback=progress_callback)
+            result = processor.process(
+                input_path,
+                callback=progress_callback,
+                checkpoint_dir=CHECKPOINT_DIR / job_id,
+                output_name=job_id,
+                cancel_event=lease_lost
+            )
+            if lease_lost.is_set():
+                # The process that took the job over records its outcome
+                progress_batcher.discard(job_id)
+                job_cache.discard(job_id)
+                print(f"[Jobs] Stopped job {job_id} after another process took it over")
+                return
+            record_job_metric(job_id, input_path, stems, result, processor.device)
             
             if result.get("status") == "complete":
-                jobs[job_id]["status"] = "completed"
-                jobs[job_id]["progress"] = 100
-                jobs[job_id]["message"] = "Separation successful."
-                jobs[job_id]["stems"] = result.get("stems")
-                jobs[job_id]["updatedAt"] = time.time()
+                job_cache.update(
+                    job_id,
+                    status="completed",
+                    progress=100,
+                    message="Separation successful.",
+                    stems=result.get("stems"),
+                )
                 save_job(job_id)
+                update_db_job(
+                    job_id,
+                    status="completed",
+                    progress=100,
+                    message="Separation successful.",
+                    stem_files=result.get("stems"),
+                    audio_duration_seconds=result.get("audio_duration"),
+                )
             else:
-                jobs[job_id]["status"] = "error"
-                jobs[job_id]["error"] = result.get("message", "Unknown error")
-                jobs[job_id]["updatedAt"] = time.time()
+                error = result.get("message", "Unknown error")
+                job_cache.update(job_id, status="error", error=error)
                 save_job(job_id)
+                update_db_job(job_id, status="error", error=error)
                 
     except Exception as e:
-        jobs[job_id]["status"] = "error"
-        jobs[job_id]["error"] = str(e)
-        jobs[job_id]["updatedAt"] = time.time()
-        save_job(job_id)
+        if not lease_lost.is_set():
+            job_cache.update(job_id, status="error", error=str(e))
+            save_job(job_id)
+            update_db_job(job_id, status="error", error=str(e))
+    finally:
+        inline_runs.pop(job_id, None)
+
+def recover_interrupted_jobs(expired_only: bool = True) -> int:
+    """
+    Take over and re-enqueue jobs of API processes that are gone.
+
+    At start-up of the first process (`expired_only=False`) that is every
+    queued or processing job; later, the jobs of a crashed sibling whose
+    lease has expired. Jobs are reset to queued, leased to this process and
+    run one after another in submission order on a background thread. Long
+    jobs resume from their last checkpointed segment. Returns the number of
+    recovered jobs.
+    """
+    jobs = db_writer.run(lambda db: JobRepository(db).take_over_jobs(
+        PROCESS_ID,
+        INLINE_LEASE_SECONDS,
+        expired_only=expired_only,
+        # A full restart is not the job's fault; repeated crashes may be
+        max_attempts=MAX_JOB_ATTEMPTS if expired_only else None,
+    ))
+    pending = []
+    for job in jobs:
+        job_cache.put(JobRecord(
+            job.id,
+            status="queued",
+            progress=job.progress or 0,
+            message="Resuming after restart...",
+            user_id=job.user_id,
+            created_at=job.created_at.timestamp(),
+        ), pinned=True, dirty=True)
+        save_job(job.id)
+        inline_runs.setdefault(job.id, threading.Event())
+        pending.append((job.id, job.input_path, job.output_dir, job.stems or 2))
+
+    if pending:
+        def _run_recovered():
+            for args in pending:
+                run_separation_task(*args)
+
+        threading.Thread(target=_run_recovered, name="job-recovery", daemon=True).start()
+
+    return len(pending)
 
 @app.post("/separate")
 async def start_separation(
     request: SeparationRequest, 
     background_tasks: BackgroundTasks,
-    auth: dict = Depends(verify_token)
+    auth: dict = Depends(verify_token),
+    db: AsyncSession = Depends(get_async_db)
 ):
     job_id = str(uuid.uuid4())
-    db = get_db_session()
     
-    try:
-        # Get repositories
-        job_repo = JobRepository(db)
-        quota_repo = UserQuotaRepository(db)
-        
-        # Extract file info for quota check
-        user_id = auth.get("sub") or "anonymous"
-        
-        # Check user quota
-        quota_check = quota_repo.check_quota(user_id)
-        if not quota_check["allowed"]:
-            if quota_check["reason"] == "HOURLY_LIMIT":
-                raise HTTPException(
-                    status_code=429,
-                    detail=f"Hourly limit exceeded. Maximum {quota_check['limit']} jobs per hour."
-                )
-            elif quota_check["reason"] == "DAILY_LIMIT":
-                raise HTTPException(
-                    status_code=429,
-                    detail=f"Daily limit exceeded. Maximum {quota_check['limit']} jobs per day."
-                )
-            elif quota_check["reason"] == "FILE_TOO_LARGE":
-                raise HTTPException(
-                    status_code=413,
-                    detail=f"File too large. Maximum size is {quota_check['limit']}MB."
-                )
-        
-        # Get queue info
-        queue_info = job_repo.get_queue_info()
-        
-        # Create job in database
-        job = job_repo.create_job(
-            job_id=job_id,
-            user_id=user_id,
-            input_path=request.input_path,
-            output_dir=request.output_dir,
-            stems=request.stems
-        )
-        
-        # Update initial status with queue info
-        job_repo.update_job(
-            job_id=job_id,
-            status="queued",
-            message=f"Job added to queue • {queue_info['jobsAhead']} jobs ahead"
-        )
-        
-        # Increment quota usage
-        quota_repo.increment_usage(user_id)
-        
-        # Keep backward compatibility - also store in memory
-        jobs[job_id] = {
-            "id": job_id,
-            "status": "queued",
-            "progress": 0,
-            "message": f"Job added to queue • {queue_info['jobsAhead']} jobs ahead",
-            "user_id": user_id,
-            "createdAt": time.time(),
-            "updatedAt": time.time(),
-            "queue": queue_info
-        }
-        
+    # Get repositories
+    job_repo = AsyncJobRepository(db)
+    quota_repo = AsyncUserQuotaRepository(db)
+    
+    # Extract file info for quota check
+    user_id = auth.get("sub") or "anonymous"
+    
+    # Check user quota and count this job against it
+    quota_check = await quota_repo.try_consume(user_id)
+    if not quota_check["allowed"]:
+        if quota_check["reason"] == "HOURLY_LIMIT":
+            raise HTTPException(
+                status_code=429,
+                detail=f"Hourly limit exceeded. Maximum {quota_check['limit']} jobs per hour."
+            )
+        elif quota_check["reason"] == "DAILY_LIMIT":
+            raise HTTPException(
+                status_code=429,
+                detail=f"Daily limit exceeded. Maximum {quota_check['limit']} jobs per day."
+            )
+        elif quota_check["reason"] == "FILE_TOO_LARGE":
+            raise HTTPException(
+                status_code=413,
+                detail=f"File too large. Maximum size is {quota_check['limit']}MB."
+            )
+        else:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many simultaneous submissions. Please try again."
+            )
+    
+    # Get queue info
+    queue_info = await job_repo.get_queue_info()
+    
+    # Create job in database, with its initial message in the same write: in
+    # queue mode a worker may claim the row as soon as it is committed
+    job = await job_repo.create_job(
+        job_id=job_id,
+        user_id=user_id,
+        input_path=request.input_path,
+        output_dir=request.output_dir,
+        stems=request.stems,
+        message=f"Job added to queue • {queue_info['jobsAhead']} jobs ahead",
+        # Inline jobs belong to this process; queue-mode jobs wait for a worker's claim
+        lease_owner=PROCESS_ID if EXECUTION_MODE == "inline" else None,
+        lease_seconds=INLINE_LEASE_SECONDS
+    )
+    
+    # Keep backward compatibility - also store in memory (kept while this process runs it)
+    job_cache.put(JobRecord(
+        job_id,
+        status="queued",
+        message=f"Job added to queue • {queue_info['jobsAhead']} jobs ahead",
+        user_id=user_id,
+        queue=queue_info,
+    ), pinned=EXECUTION_MODE == "inline")
+    
+    # In queue mode a standalone worker claims the job from the database
+    if EXECUTION_MODE == "inline":
         background_tasks.add_task(
             run_separation_task, 
             job_id, 
@@ -375,58 +1057,233 @@ async def start_separation(
             request.output_dir, 
             request.stems
         )
-        
-        return {"job_id": job_id}
-        
-    finally:
-        db.close()
+    
+    return {"job_id": job_id}
 
 @app.get("/status/{job_id}")
-async def get_status(job_id: str, auth: dict = Depends(verify_token)):
-    db = get_db_session()
+async def get_status(job_id: str, auth: dict = Depends(verify_token), db: AsyncSession = Depends(get_async_db)):
+    job_repo = AsyncJobRepository(db)
     
-    try:
-        job_repo = JobRepository(db)
+    # Try to get from database first
+    job = await job_repo.get_job(job_id)
+    
+    if not job:
+        # Fallback to in-memory store for backward compatibility
+        job_memory = load_job(job_id)
+        if not job_memory:
+            raise HTTPException(status_code=404, detail="Job not found")
         
-        # Try to get from database first
-        job = job_repo.get_job(job_id)
+        # Include current queue info for queued jobs
+        if job_memory.get("status") == "queued":
+            job_memory["queue"] = await job_repo.get_queue_info()
         
-        if not job:
+        return job_memory
+    
+    # Convert database job to dict format
+    job_dict = job_to_dict(job)
+    
+    # Add queue position and ETA for queued jobs
+    if job.status == "queued":
+        job_dict["queue"] = await job_repo.get_queue_info(job.id)
+    elif job.status == "completed":
+        touch_jobs([job])
+    
+    return job_dict
+
+@app.post("/status:batch")
+async def get_status_batch(
+    request: BatchStatusRequest,
+    auth: dict = Depends(verify_token),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Return the status of many jobs at once.
+
+    Jobs are fetched with a single IN query and the queue snapshot is computed
+    once for the whole batch. IDs that do not exist or belong to another user are
+    reported as not found rather than failing the request.
+    """
+    # De-duplicate while preserving request order
+    job_ids = list(dict.fromkeys(request.job_ids))
+    if len(job_ids) > MAX_BATCH_STATUS_IDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many job IDs. Maximum {MAX_BATCH_STATUS_IDS} per request."
+        )
+
+    user_id = auth.get("sub") or "anonymous"
+    job_repo = AsyncJobRepository(db)
+    found = {job.id: job for job in await job_repo.get_jobs(job_ids)}
+
+    results = {}
+    queue_snapshot = None
+    completed = []
+    for job_id in job_ids:
+        job = found.get(job_id)
+        if job is not None:
+            job_dict = job_to_dict(job)
+        else:
             # Fallback to in-memory store for backward compatibility
-            job_memory = load_job(job_id)
-            if not job_memory:
-                raise HTTPException(status_code=404, detail="Job not found")
-            
-            # Include current queue info for queued jobs
-            if job_memory.get("status") == "queued":
-                job_memory["queue"] = job_repo.get_queue_info()
-            
-            return job_memory
-        
-        # Convert database job to dict format
-        job_dict = {
-            "id": job.id,
-            "status": job.status,
-            "progress": job.progress,
-            "message": job.message,
-            "error": job.error,
-            "user_id": job.user_id,
-            "createdAt": job.created_at.timestamp(),
-            "updatedAt": job.updated_at.timestamp(),
-        }
-        
-        # Add queue info for queued jobs
-        if job.status == "queued":
-            job_dict["queue"] = job_repo.get_queue_info()
-        
-        # Add stem files if completed
-        if job.status == "completed" and job.stem_files:
-            job_dict["stems"] = job.stem_files
-        
-        return job_dict
-        
-    finally:
-        db.close()
+            job_dict = load_job(job_id)
+
+        if not job_dict or job_dict.get("user_id") != user_id:
+            results[job_id] = {"id": job_id, "error": "Job not found"}
+            continue
+
+        if job_dict["status"] == "queued":
+            if queue_snapshot is None:
+                queue_snapshot = await job_repo.get_queue_snapshot()
+            job_dict["queue"] = queue_snapshot.info_for(job_id)
+        elif job is not None and job.status == "completed":
+            completed.append(job)
+
+        results[job_id] = job_dict
+
+    touch_jobs(completed)
+    return {"jobs": results}
+
+async def _get_finished_stems(job_id: str, auth: dict, db: AsyncSession):
+    """A completed job of the caller and its stem files, or the matching HTTP error."""
+    job = await AsyncJobRepository(db).get_job(job_id)
+    if not job or job.user_id != (auth.get("sub") or "anonymous"):
+        raise HTTPException(status_code=404, detail="Job not found")
+    if job.files_deleted:
+        raise HTTPException(status_code=410, detail="Job files have been deleted")
+    if job.status != "completed" or not job.stem_files:
+        raise HTTPException(status_code=409, detail="Job has no stems yet")
+
+    stem_paths = job_stem_paths(job)
+    if not all(path.is_file() for path in stem_paths.values()):
+        raise HTTPException(status_code=410, detail="Job files have been deleted")
+    touch_jobs([job])
+    return job, stem_paths
+
+def _attachment_headers(job, suffix: str) -> dict:
+    """Content-Disposition naming a download after the original upload."""
+    base = Path(job.original_filename or job.id).stem or job.id
+    return {"Content-Disposition": f"attachment; filename*=UTF-8''{quote(base + suffix)}"}
+
+@app.get("/jobs/{job_id}/stems.zip")
+async def download_stems_zip(
+    job_id: str,
+    deflate: bool = False,
+    auth: dict = Depends(verify_token),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    All stems of a finished job as one ZIP archive.
+
+    The archive is generated while the stems are read and streamed as it is
+    written, so it needs no temp file and little memory however large the
+    stems are. Stems are stored as they are (whatever their format); pass
+    `deflate=true` for fast compression, which mostly helps WAV stems.
+    """
+    job, stem_paths = await _get_finished_stems(job_id, auth, db)
+    members = [(f"{stem}{path.suffix}", path) for stem, path in stem_paths.items()]
+    return StreamingResponse(
+        stream_zip(members, compresslevel=1 if deflate else None),
+        media_type="application/zip",
+        headers=_attachment_headers(job, "-stems.zip"),
+    )
+
+@app.post("/jobs/{job_id}/mix")
+async def mix_stems(
+    job_id: str,
+    request: MixRequest,
+    auth: dict = Depends(verify_token),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    A remix of a finished job's stems as a 32-bit float WAV.
+
+    `gains` sets a level in dB per stem (default 0), `mute` silences stems
+    and `solo` silences every stem that is not soloed; e.g. a karaoke mix is
+    `{"mute": ["vocals"]}`. The mix is computed block by block from the
+    memory-mapped stems and streamed while it is computed. Popular parameter
+    sets are served from the mix cache.
+    """
+    job, stem_paths = await _get_finished_stems(job_id, auth, db)
+    unknown = (set(request.gains) | set(request.mute) | set(request.solo)) - set(stem_paths)
+    if unknown:
+        raise HTTPException(status_code=422, detail=f"Unknown stems: {', '.join(sorted(unknown))}. Available: {', '.join(sorted(stem_paths))}")
+    if any(not MIX_MIN_GAIN_DB <= gain <= MIX_MAX_GAIN_DB for gain in request.gains.values()):
+        raise HTTPException(status_code=422, detail=f"Gains must be between {MIX_MIN_GAIN_DB:g} and {MIX_MAX_GAIN_DB:g} dB")
+
+    gains_db = effective_gains(stem_paths, request.gains, request.mute, request.solo)
+    key = mix_key(job.id, gains_db)
+    headers = _attachment_headers(job, "-mix.wav")
+    cached = mix_cache.lookup(key)
+    if cached is not None:
+        return FileResponse(cached, media_type="audio/wav", headers=headers)
+
+    try:
+        # Reads only the WAV headers; the audio is mapped, not loaded
+        mix = await run_in_threadpool(StemMix, stem_paths, gains_db)
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=422, detail=f"Stems cannot be mixed: {e}")
+
+    chunks = mix.chunks()
+    if mix_cache.record_request(key):
+        chunks = mix_cache.store_while_streaming(key, chunks)
+    headers["Content-Length"] = str(mix.content_length)
+    return StreamingResponse(chunks, media_type="audio/wav", headers=headers)
+
+@app.get("/admin/perf")
+async def get_performance_report(
+    granularity: str = "hour",
+    days: int = None,
+    auth: dict = Depends(verify_admin),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Job performance per model and stems count, read from the metric rollups.
+
+    Returns hourly (default: last day) or daily (default: last 30 days)
+    buckets with job counts, success rate and p50/p95/p99 processing time
+    and real-time factor, plus totals over the whole window.
+    """
+    if granularity not in ("hour", "day"):
+        raise HTTPException(status_code=400, detail="granularity must be 'hour' or 'day'")
+    days = days or (1 if granularity == "hour" else 30)
+    since = datetime.utcnow() - timedelta(days=days)
+
+    rollups = await AsyncMetricRollupRepository(db).get_rollups(granularity, since)
+
+    buckets = []
+    totals = {}
+    for rollup in rollups:
+        buckets.append({
+            "bucketStart": rollup.bucket_start.isoformat(),
+            "model": rollup.model_name,
+            "stems": rollup.stems_count,
+            "jobs": rollup.job_count,
+            "successRate": rollup.success_count / rollup.job_count if rollup.job_count else None,
+            "processingSeconds": {"p50": rollup.processing_p50, "p95": rollup.processing_p95, "p99": rollup.processing_p99},
+            "realTimeFactor": {"p50": rollup.rtf_p50, "p95": rollup.rtf_p95, "p99": rollup.rtf_p99},
+        })
+        total = totals.setdefault((rollup.model_name, rollup.stems_count), {"jobs": 0, "successes": 0})
+        total["jobs"] += rollup.job_count
+        total["successes"] += rollup.success_count
+
+    return {
+        "granularity": granularity,
+        "since": since.isoformat(),
+        "buckets": buckets,
+        "totals": [
+            {
+                "model": model_name,
+                "stems": stems_count,
+                "jobs": total["jobs"],
+                "successRate": total["successes"] / total["jobs"] if total["jobs"] else None,
+            }
+            for (model_name, stems_count), total in sorted(totals.items())
+        ],
+    }
+
+@app.get("/admin/caches")
+async def get_cache_stats(auth: dict = Depends(verify_admin)):
+    """Size and hit rate of the in-process caches (per API process)."""
+    return {"jobs": job_cache.stats(), "tokens": token_cache.stats()}
 
 @app.get("/health")
 async def health_check():
@@ -438,7 +1295,12 @@ async def health_check():
         return {
             "status": "healthy",
             "device": device,
-            "version": "1.0.0"
+            "version": "1.0.0",
+            # Inline separations running on this host, across all API processes
+            "executionSlots": {
+                "busy": await run_in_threadpool(execution_slots.busy),
+                "total": execution_slots.slots,
+            },
         }
     except Exception as e:
         # Surface any engine/torch issues clearly
@@ -461,20 +1323,96 @@ async def startup_warmup():
         # Do not block startup, but log for debugging
         print(f"[Startup] Audio engine warmup failed: {e}")
 
+    # Keep the /admin/perf rollups current
+    def _roll_up_metrics():
+        while True:
+            try:
+                # One writer task per day, so a long backfill never blocks other writes for long
+                for day in db_writer.run(pending_days):
+                    db_writer.run(lambda db, day=day: roll_up_day(db, day))
+            except Exception as e:
+                print(f"[Metrics] Rollup failed: {e}")
+            time.sleep(METRICS_ROLLUP_INTERVAL_SECONDS)
+
     # Schedule periodic cleanup of old job metadata (once per day)
     def _schedule_cleanup():
         while True:
             print("[Jobs] Running periodic cleanup sweep...")
             cleanup_old_jobs()
+            purged = resumable_uploads.purge_expired()
+            if purged:
+                print(f"[Upload] Deleted {purged} abandoned resumable uploads")
             # Sleep for 24 hours between sweeps
             time.sleep(24 * 60 * 60)
 
-    cleanup_thread = threading.Thread(target=_schedule_cleanup, daemon=True)
-    cleanup_thread.start()
+    # Keep this process's inline jobs leased and stop any another process took over
+    def _renew_inline_leases():
+        while True:
+            time.sleep(INLINE_LEASE_SECONDS / 3)
+            # Only jobs registered before the renewal can be judged by its result
+            running = list(inline_runs.items())
+            try:
+                owned = set(db_writer.run(
+                    lambda db: JobRepository(db).renew_owner_leases(PROCESS_ID, INLINE_LEASE_SECONDS)
+                ))
+            except Exception as e:
+                print(f"[Jobs] Lease renewal failed: {e}")
+                continue
+            for job_id, lease_lost in running:
+                if job_id not in owned:
+                    lease_lost.set()
+
+    # Take over the jobs of API processes that crashed while siblings kept running
+    def _recover_orphaned_jobs():
+        while True:
+            time.sleep(INLINE_LEASE_SECONDS)
+            try:
+                recovered = recover_interrupted_jobs(expired_only=True)
+                if recovered:
+                    print(f"[Jobs] Took over {recovered} jobs of an API process that exited")
+            except Exception as e:
+                print(f"[Jobs] Recovery of orphaned jobs failed: {e}")
+
+    # Coalesce job state and progress writes in the background
+    db_writer.start()
+    job_writer.start()
+    progress_batcher.start()
+
+    def _start_host_tasks():
+        print(f"[Startup] Process {os.getpid()} runs the host-wide background tasks")
+        threading.Thread(target=_roll_up_metrics, name="metrics-rollup", daemon=True).start()
+        threading.Thread(target=_schedule_cleanup, name="job-cleanup", daemon=True).start()
+        # Delete expired uploads and stems in the background
+        storage_collector.start()
+        if EXECUTION_MODE == "inline":
+            threading.Thread(target=_recover_orphaned_jobs, name="job-takeover", daemon=True).start()
+
+    # Started by one process per host; another takes over if it exits
+    leader_lock.start(_start_host_tasks)
+    if EXECUTION_MODE == "inline":
+        threading.Thread(target=_renew_inline_leases, name="inline-leases", daemon=True).start()
+
+    # Pre-decode new uploads at low priority
+    if PREDECODE_UPLOADS:
+        audio_preparer.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Flush any job state and progress that has not been written yet."""
+    leader_lock.release()
+    storage_collector.stop()
+    audio_preparer.stop()
+    job_writer.stop()
+    progress_batcher.stop()
+    db_writer.stop()
+    await async_engine.dispose()
+    host_membership.leave()
 
 if __name__ == "__main__":
     import uvicorn
     host = os.getenv("HOST", "0.0.0.0")
     port = int(os.getenv("PORT", 8000))
-    print(f"[Backend] Starting server on {host}:{port}")
-    uvicorn.run(app, host=host, port=port)
+    print(f"[Backend] Starting server on {host}:{port} with {WEB_CONCURRENCY} worker process(es)")
+    # An import string lets uvicorn start each worker process with its own app
+    uvicorn.run("main:app", host=host, port=port, workers=WEB_CONCURRENCY)
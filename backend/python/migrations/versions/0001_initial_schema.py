@@ -0,0 +1,81 @@
+"""Initial schema: jobs, job_metrics and user_quotas
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+
+Matches the tables that init_database() created with create_all() before
+migrations existed. Existing databases should be stamped at this revision
+(`alembic stamp 0001`) and then upgraded.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "jobs",
+        sa.Column("id", sa.String(), primary_key=True),
+        sa.Column("status", sa.String(20), nullable=False),
+        sa.Column("progress", sa.Integer()),
+        sa.Column("message", sa.Text()),
+        sa.Column("error", sa.Text()),
+        sa.Column("input_path", sa.String(500)),
+        sa.Column("output_dir", sa.String(500)),
+        sa.Column("stems", sa.Integer()),
+        sa.Column("original_filename", sa.String(255)),
+        sa.Column("file_size", sa.Integer()),
+        sa.Column("processing_started_at", sa.DateTime()),
+        sa.Column("processing_completed_at", sa.DateTime()),
+        sa.Column("processing_duration_seconds", sa.Float()),
+        sa.Column("user_id", sa.String(255)),
+        sa.Column("ip_address", sa.String(45)),
+        sa.Column("queue_position", sa.Integer()),
+        sa.Column("estimated_wait_seconds", sa.Integer()),
+        sa.Column("stem_files", sa.JSON()),
+        sa.Column("metadata", sa.JSON()),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.Column("auto_cleanup_at", sa.DateTime()),
+        sa.Column("files_deleted", sa.Boolean()),
+    )
+    op.create_table(
+        "job_metrics",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("job_id", sa.String(), nullable=False),
+        sa.Column("file_size_mb", sa.Float()),
+        sa.Column("processing_time_seconds", sa.Float()),
+        sa.Column("model_name", sa.String(50)),
+        sa.Column("stems_count", sa.Integer()),
+        sa.Column("success", sa.Boolean()),
+        sa.Column("error_type", sa.String(100)),
+        sa.Column("gpu_used", sa.Boolean()),
+        sa.Column("max_memory_mb", sa.Integer()),
+        sa.Column("recorded_at", sa.DateTime(), nullable=False),
+    )
+    op.create_table(
+        "user_quotas",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("user_id", sa.String(255), nullable=False, unique=True),
+        sa.Column("jobs_per_hour", sa.Integer()),
+        sa.Column("jobs_per_day", sa.Integer()),
+        sa.Column("max_file_size_mb", sa.Integer()),
+        sa.Column("jobs_last_hour", sa.Integer()),
+        sa.Column("jobs_last_day", sa.Integer()),
+        sa.Column("last_job_at", sa.DateTime()),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+    )
+
+
+def downgrade():
+    op.drop_table("user_quotas")
+    op.drop_table("job_metrics")
+    op.drop_table("jobs")
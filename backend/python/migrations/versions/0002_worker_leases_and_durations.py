@@ -0,0 +1,37 @@
+"""Worker lease columns and audio durations
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("jobs") as batch_op:
+        batch_op.add_column(sa.Column("audio_duration_seconds", sa.Float()))
+        batch_op.add_column(sa.Column("lease_owner", sa.String(255)))
+        batch_op.add_column(sa.Column("lease_expires_at", sa.DateTime()))
+        batch_op.add_column(sa.Column("attempts", sa.Integer()))
+
+    with op.batch_alter_table("job_metrics") as batch_op:
+        batch_op.add_column(sa.Column("audio_duration_seconds", sa.Float()))
+
+
+def downgrade():
+    with op.batch_alter_table("job_metrics") as batch_op:
+        batch_op.drop_column("audio_duration_seconds")
+
+    with op.batch_alter_table("jobs") as batch_op:
+        batch_op.drop_column("attempts")
+        batch_op.drop_column("lease_expires_at")
+        batch_op.drop_column("lease_owner")
+        batch_op.drop_column("audio_duration_seconds")
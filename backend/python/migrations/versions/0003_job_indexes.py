@@ -0,0 +1,52 @@
+"""Indexes for the hot jobs and job_metrics access paths
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+
+- jobs by status ordered by created_at (queue scans, recovery, reconciliation)
+- jobs by user_id ordered by created_at (job history)
+- jobs by files_deleted and created_at (old-job cleanup)
+- pending storage cleanup by auto_cleanup_at (partial: files not yet deleted)
+- expired worker leases (partial: processing rows only)
+- job_metrics by recorded_at (metrics windows, ETA history)
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index("ix_jobs_status_created_at", "jobs", ["status", "created_at"])
+    op.create_index("ix_jobs_user_id_created_at", "jobs", ["user_id", "created_at"])
+    op.create_index("ix_jobs_files_deleted_created_at", "jobs", ["files_deleted", "created_at"])
+    op.create_index(
+        "ix_jobs_auto_cleanup_at_pending",
+        "jobs",
+        ["auto_cleanup_at"],
+        postgresql_where=sa.text("files_deleted = false"),
+        sqlite_where=sa.text("files_deleted = 0"),
+    )
+    op.create_index(
+        "ix_jobs_lease_expires_at_processing",
+        "jobs",
+        ["lease_expires_at"],
+        postgresql_where=sa.text("status = 'processing'"),
+        sqlite_where=sa.text("status = 'processing'"),
+    )
+    op.create_index("ix_job_metrics_recorded_at", "job_metrics", ["recorded_at"])
+
+
+def downgrade():
+    op.drop_index("ix_job_metrics_recorded_at", table_name="job_metrics")
+    op.drop_index("ix_jobs_lease_expires_at_processing", table_name="jobs")
+    op.drop_index("ix_jobs_auto_cleanup_at_pending", table_name="jobs")
+    op.drop_index("ix_jobs_files_deleted_created_at", table_name="jobs")
+    op.drop_index("ix_jobs_user_id_created_at", table_name="jobs")
+    op.drop_index("ix_jobs_status_created_at", table_name="jobs")
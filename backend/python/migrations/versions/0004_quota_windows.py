@@ -0,0 +1,27 @@
+"""Quota window start columns
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("user_quotas") as batch_op:
+        batch_op.add_column(sa.Column("hour_window_started_at", sa.DateTime()))
+        batch_op.add_column(sa.Column("day_window_started_at", sa.DateTime()))
+
+
+def downgrade():
+    with op.batch_alter_table("user_quotas") as batch_op:
+        batch_op.drop_column("day_window_started_at")
+        batch_op.drop_column("hour_window_started_at")
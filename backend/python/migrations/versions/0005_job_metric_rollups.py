@@ -0,0 +1,46 @@
+"""Hourly and daily job metric rollups
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "job_metric_rollups",
+        sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column("granularity", sa.String(10), nullable=False),
+        sa.Column("bucket_start", sa.DateTime(), nullable=False),
+        sa.Column("model_name", sa.String(50), nullable=False),
+        sa.Column("stems_count", sa.Integer(), nullable=False),
+        sa.Column("job_count", sa.Integer(), nullable=False),
+        sa.Column("success_count", sa.Integer(), nullable=False),
+        sa.Column("processing_p50", sa.Float()),
+        sa.Column("processing_p95", sa.Float()),
+        sa.Column("processing_p99", sa.Float()),
+        sa.Column("rtf_p50", sa.Float()),
+        sa.Column("rtf_p95", sa.Float()),
+        sa.Column("rtf_p99", sa.Float()),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index(
+        "ux_job_metric_rollups_bucket",
+        "job_metric_rollups",
+        ["granularity", "bucket_start", "model_name", "stems_count"],
+        unique=True,
+    )
+
+
+def downgrade():
+    op.drop_index("ux_job_metric_rollups_bucket", table_name="job_metric_rollups")
+    op.drop_table("job_metric_rollups")
@@ -0,0 +1,47 @@
+"""Job access times for storage eviction
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+
+- jobs.last_accessed_at, backfilled from the completion (or creation) time
+  of finished jobs
+- pending files by last access (partial: files not yet deleted)
+- jobs by input_path (uploads shared by several jobs)
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("jobs") as batch_op:
+        batch_op.add_column(sa.Column("last_accessed_at", sa.DateTime()))
+
+    op.execute(
+        "UPDATE jobs SET last_accessed_at = COALESCE(processing_completed_at, created_at) "
+        "WHERE status IN ('completed', 'error')"
+    )
+
+    op.create_index(
+        "ix_jobs_last_accessed_at_pending",
+        "jobs",
+        ["last_accessed_at"],
+        postgresql_where=sa.text("files_deleted = false"),
+        sqlite_where=sa.text("files_deleted = 0"),
+    )
+    op.create_index("ix_jobs_input_path", "jobs", ["input_path"])
+
+
+def downgrade():
+    op.drop_index("ix_jobs_input_path", table_name="jobs")
+    op.drop_index("ix_jobs_last_accessed_at_pending", table_name="jobs")
+
+    with op.batch_alter_table("jobs") as batch_op:
+        batch_op.drop_column("last_accessed_at")
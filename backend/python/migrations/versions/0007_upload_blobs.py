@@ -0,0 +1,44 @@
+"""Content-addressed upload blobs
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19
+
+- upload_blobs: one row per stored upload, keyed by SHA-256, with the number
+  of jobs whose files still use it
+- unreferenced blobs by last upload (partial: ref_count <= 0)
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "upload_blobs",
+        sa.Column("sha256", sa.String(64), primary_key=True),
+        sa.Column("path", sa.String(500), nullable=False, unique=True),
+        sa.Column("file_size", sa.Integer(), nullable=False),
+        sa.Column("audio_format", sa.String(10)),
+        sa.Column("ref_count", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("last_uploaded_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index(
+        "ix_upload_blobs_unreferenced",
+        "upload_blobs",
+        ["last_uploaded_at"],
+        postgresql_where=sa.text("ref_count <= 0"),
+        sqlite_where=sa.text("ref_count <= 0"),
+    )
+
+
+def downgrade():
+    op.drop_index("ix_upload_blobs_unreferenced", table_name="upload_blobs")
+    op.drop_table("upload_blobs")
@@ -0,0 +1,45 @@
+"""Audio stream properties probed at upload time
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19
+
+- upload_blobs: duration, codec, sample rate and channels from the headers
+- jobs: codec, sample rate and channels (audio_duration_seconds already
+  exists and is now known before processing)
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("upload_blobs") as batch_op:
+        batch_op.add_column(sa.Column("audio_duration_seconds", sa.Float()))
+        batch_op.add_column(sa.Column("audio_codec", sa.String(20)))
+        batch_op.add_column(sa.Column("audio_sample_rate", sa.Integer()))
+        batch_op.add_column(sa.Column("audio_channels", sa.Integer()))
+
+    with op.batch_alter_table("jobs") as batch_op:
+        batch_op.add_column(sa.Column("audio_codec", sa.String(20)))
+        batch_op.add_column(sa.Column("audio_sample_rate", sa.Integer()))
+        batch_op.add_column(sa.Column("audio_channels", sa.Integer()))
+
+
+def downgrade():
+    with op.batch_alter_table("jobs") as batch_op:
+        batch_op.drop_column("audio_channels")
+        batch_op.drop_column("audio_sample_rate")
+        batch_op.drop_column("audio_codec")
+
+    with op.batch_alter_table("upload_blobs") as batch_op:
+        batch_op.drop_column("audio_channels")
+        batch_op.drop_column("audio_sample_rate")
+        batch_op.drop_column("audio_codec")
+        batch_op.drop_column("audio_duration_seconds")
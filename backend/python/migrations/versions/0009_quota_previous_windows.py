@@ -0,0 +1,34 @@
+"""Previous quota window per limit
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-19
+
+user_quotas keeps the job count and newest job time of the window before
+the current one, so database-backed limits hold over any sliding hour/day.
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("user_quotas") as batch_op:
+        batch_op.add_column(sa.Column("jobs_prev_hour", sa.Integer()))
+        batch_op.add_column(sa.Column("prev_hour_last_job_at", sa.DateTime()))
+        batch_op.add_column(sa.Column("jobs_prev_day", sa.Integer()))
+        batch_op.add_column(sa.Column("prev_day_last_job_at", sa.DateTime()))
+
+
+def downgrade():
+    with op.batch_alter_table("user_quotas") as batch_op:
+        batch_op.drop_column("prev_day_last_job_at")
+        batch_op.drop_column("jobs_prev_day")
+        batch_op.drop_column("prev_hour_last_job_at")
+        batch_op.drop_column("jobs_prev_hour")
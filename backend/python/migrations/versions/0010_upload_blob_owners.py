@@ -0,0 +1,38 @@
+"""Owners of upload blobs
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-19
+
+- upload_blob_owners: the users who uploaded each blob, so /uploads/dedupe
+  only matches a user's own uploads
+- backfilled from the jobs that use a blob
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0010"
+down_revision = "0009"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "upload_blob_owners",
+        sa.Column("sha256", sa.String(64), primary_key=True),
+        sa.Column("user_id", sa.String(255), primary_key=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    op.execute(
+        "INSERT INTO upload_blob_owners (sha256, user_id, created_at) "
+        "SELECT DISTINCT upload_blobs.sha256, jobs.user_id, CURRENT_TIMESTAMP "
+        "FROM jobs JOIN upload_blobs ON upload_blobs.path = jobs.input_path "
+        "WHERE jobs.user_id IS NOT NULL"
+    )
+
+
+def downgrade():
+    op.drop_table("upload_blob_owners")
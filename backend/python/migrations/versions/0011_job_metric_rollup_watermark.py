@@ -0,0 +1,37 @@
+"""Job metric rollup watermark
+
+Revision ID: 0011
+Revises: 0010
+Create Date: 2026-10-19
+
+- job_metric_rollup_watermark: the last day rolled up, so days without
+  metrics are not rolled up again on every run
+- seeded from the latest daily rollup bucket
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = "0011"
+down_revision = "0010"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "job_metric_rollup_watermark",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("rolled_through", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+    )
+    op.execute(
+        "INSERT INTO job_metric_rollup_watermark (id, rolled_through, updated_at) "
+        "SELECT 1, MAX(bucket_start), CURRENT_TIMESTAMP FROM job_metric_rollups "
+        "WHERE granularity = 'day' HAVING MAX(bucket_start) IS NOT NULL"
+    )
+
+
+def downgrade():
+    op.drop_table("job_metric_rollup_watermark")
@@ -1,17 +1,36 @@
 import sys
 import os
 import json
+import math
+import shutil
 import subprocess
 import time
 import torch
 from pathlib import Path
+from ingest import prepared_path
+
+
+class SeparationCancelled(Exception):
+    """Raised inside a run once its cancel event is set (e.g. a worker lost its job lease)"""
+
+
+def _check_cancelled(cancel_event):
+    if cancel_event is not None and cancel_event.is_set():
+        raise SeparationCancelled()
+
 
 class AudioProcessor:
-    def __init__(self, output_dir, stems=2):
+    def __init__(self, output_dir, stems=2, checkpoint_segment_seconds=0, segment_overlap_seconds=2.0):
         self.output_dir = output_dir
         self.stems = stems
         self.device = self._detect_device()
         self.model = "htdemucs" # High quality transformer
+        # Tracks longer than two segments are separated segment by segment so
+        # finished segments survive a restart (0 disables checkpointing)
+        self.checkpoint_segment_seconds = checkpoint_segment_seconds
+        # Each segment runs this far into the next one, and the two are
+        # crossfaded there so the model's edge effects leave no audible seam
+        self.segment_overlap_seconds = min(segment_overlap_seconds, checkpoint_segment_seconds / 2)
 
     def _detect_device(self):
         """Detect the best available hardware acceleration."""
@@ -24,9 +43,212 @@ class AudioProcessor:
         print("[Engine] No GPU found. Falling back to CPU (Slow).")
         return "cpu"
 
-    def process(self, input_file, callback=None):
+    def probe_duration(self, input_path):
+        """Return the track duration in seconds using ffprobe, or None if unknown."""
+        try:
+            result = subprocess.run(
+                [
+                    "ffprobe", "-v", "error",
+                    "-show_entries", "format=duration",
+                    "-of", "default=noprint_wrappers=1:nokey=1",
+                    str(input_path)
+                ],
+                capture_output=True,
+                text=True,
+                timeout=30
+            )
+            return float(result.stdout.strip())
+        except Exception:
+            return None
+
+    def probe_codec(self, input_path):
+        """Return the codec name of the first audio stream using ffprobe, or None if unknown."""
+        try:
+            result = subprocess.run(
+                [
+                    "ffprobe", "-v", "error",
+                    "-select_streams", "a:0",
+                    "-show_entries", "stream=codec_name",
+                    "-of", "default=noprint_wrappers=1:nokey=1",
+                    str(input_path)
+                ],
+                capture_output=True,
+                text=True,
+                timeout=30
+            )
+            return result.stdout.strip() or None
+        except Exception:
+            return None
+
+    def _run_demucs(self, input_path, out_dir, callback=None, progress_offset=0.0, progress_scale=1.0, output_name=None, cancel_event=None):
+        """
+        Run the Demucs CLI on one file and stream its progress to `callback`.
+
+        Progress is mapped onto `progress_offset + percent * progress_scale` so
+        segmented runs report a single overall percentage. Stems are written to
+        `out_dir/<model>/<output_name or track name>/`. Demucs is killed and
+        SeparationCancelled raised once `cancel_event` is set.
+        Returns (return_code, stderr_output).
+        """
+        # Professional CLI params
+        # --segment: controls memory usage (lower is better for 4GB-8GB VRAM)
+        # --overlap: controls quality (0.25 is default, higher is better but slower)
+        # --shifts: number of random shifts (1 is fast, higher is better)
+        cmd = [
+            sys.executable, "-m", "demucs",
+            "--out", str(out_dir),
+            "-n", self.model,
+            "--device", self.device,
+            "--segment", "10", # Slightly tighter for 4GB RTX 3050 stability
+            "--shifts", "1", # Fast for demonstration purposes
+            str(input_path)
+        ]
+
+        if self.stems == 2:
+            cmd.extend(["--two-stems", "vocals"])
+
+        if output_name:
+            cmd.extend(["--filename", f"{output_name}/{{stem}}.{{ext}}"])
+
+        # Start process
+        process = subprocess.Popen(
+            cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            bufsize=1,
+            universal_newlines=True,
+            creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
+        )
+
+        # Monitor progress
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                process.kill()
+                process.wait()
+                raise SeparationCancelled()
+            output = process.stderr.readline()
+            if output == '' and process.poll() is not None:
+                break
+            if output:
+                # Demucs prints progress like: 0%|          | 0/100 [00:00<?, ?it/s]
+                if "%" in output:
+                    try:
+                        # Simplified percent extraction
+                        percent_str = output.split('%')[0].split()[-1]
+                        percent = round(progress_offset + float(percent_str) * progress_scale, 1)
+                        progress_data = {
+                            "status": "processing", 
+                            "progress": percent,
+                            "raw": f"Separating Stems: {percent}%"
+                        }
+                        if callback:
+                            callback(progress_data)
+                    except:
+                        pass
+
+        return process.poll(), process.stderr.read()
+
+    def _process_segmented(self, input_path, model_output_dir, checkpoint_dir, duration, callback=None, cancel_event=None):
+        """
+        Separate a long track segment by segment, checkpointing each finished segment.
+
+        Every segment is cut to WAV with `segment_overlap_seconds` of the next
+        one, separated, and marked done with a marker file. A resumed run
+        skips segments whose marker exists, then the per-segment stems are
+        crossfaded over the overlaps into `model_output_dir`.
+        Returns (error result dict or None, seconds of the track separated by this run).
+        """
+        segment_seconds = self.checkpoint_segment_seconds
+        overlap = self.segment_overlap_seconds
+        # The last segment is longer than the overlap, so every crossfade fits
+        segment_count = math.ceil((duration - overlap) / segment_seconds)
+        segments_dir = checkpoint_dir / "segments"
+        separated_dir = checkpoint_dir / "separated"
+        segments_dir.mkdir(parents=True, exist_ok=True)
+
+        separated_seconds = 0.0
+        for index in range(segment_count):
+            name = f"segment_{index:04d}"
+            done_marker = segments_dir / f"{name}.done"
+            progress_offset = index * 100.0 / segment_count
+            start = index * segment_seconds
+            last = index == segment_count - 1
+
+            _check_cancelled(cancel_event)
+            if done_marker.exists():
+                print(f"[Engine] Resuming: {name} already separated, skipping")
+                continue
+
+            segment_path = segments_dir / f"{name}.wav"
+            subprocess.run(
+                [
+                    "ffmpeg", "-y", "-v", "error",
+                    "-ss", str(start),
+                    # The last segment runs to the end of the track
+                    *([] if last else ["-t", str(segment_seconds + overlap)]),
+                    "-i", str(input_path),
+                    "-c:a", "pcm_f32le",
+                    str(segment_path)
+                ],
+                check=True,
+                capture_output=True
+            )
+
+            return_code, stderr_out = self._run_demucs(
+                segment_path,
+                separated_dir,
+                callback=callback,
+                progress_offset=progress_offset,
+                progress_scale=1.0 / segment_count,
+                cancel_event=cancel_event
+            )
+            if return_code != 0:
+                return {"status": "error", "message": f"Demucs failed with code {return_code} on {name}", "details": stderr_out}, separated_seconds
+
+            done_marker.touch()
+            segment_path.unlink(missing_ok=True)
+            separated_seconds += (duration - start) if last else segment_seconds
+
+        # Stitch the per-segment stems back together, crossfading each overlap
+        model_output_dir.mkdir(parents=True, exist_ok=True)
+        segment_dirs = [separated_dir / self.model / f"segment_{index:04d}" for index in range(segment_count)]
+        for stem_file in segment_dirs[0].glob("*.wav"):
+            inputs = []
+            for segment_dir in segment_dirs:
+                inputs += ["-i", str(segment_dir / stem_file.name)]
+            chain = []
+            previous = "[0:a]"
+            for index in range(1, segment_count):
+                label = f"[x{index}]"
+                chain.append(f"{previous}[{index}:a]acrossfade=d={overlap}:c1=tri:c2=tri{label}")
+                previous = label
+            subprocess.run(
+                [
+                    "ffmpeg", "-y", "-v", "error",
+                    *inputs,
+                    "-filter_complex", ";".join(chain),
+                    "-map", previous,
+                    # Keep the sample format Demucs wrote
+                    "-c:a", self.probe_codec(stem_file) or "pcm_s16le",
+                    str(model_output_dir / stem_file.name)
+                ],
+                check=True,
+                capture_output=True
+            )
+
+        return None, separated_seconds
+
+    def process(self, input_file, callback=None, checkpoint_dir=None, output_name=None, cancel_event=None):
         """
         Run Demucs with professional-grade settings for the RTX 3050.
+
+        When `checkpoint_dir` is given and the track is long enough, the track
+        is separated in checkpointed segments so an interrupted job can resume
+        from the last finished segment. `output_name` (the job ID) names the
+        stems folder, so jobs that share an upload never overwrite each other.
+        Setting `cancel_event` stops the run with status "cancelled" and leaves
+        its checkpoints in place.
         """
         try:
             # Handle Windows path normalization explicitly
@@ -46,64 +268,48 @@ class AudioProcessor:
             # Create output directory
             Path(self.output_dir).mkdir(parents=True, exist_ok=True)
             
-            # Professional CLI params
-            # --segment: controls memory usage (lower is better for 4GB-8GB VRAM)
-            # --overlap: controls quality (0.25 is default, higher is better but slower)
-            # --shifts: number of random shifts (1 is fast, higher is better)
-            cmd = [
-                sys.executable, "-m", "demucs",
-                "--out", str(input_path.parent.parent / "separated"), # Relative to uploads
-                "-n", self.model,
-                "--device", self.device,
-                "--segment", "10", # Slightly tighter for 4GB RTX 3050 stability
-                "--shifts", "1", # Fast for demonstration purposes
-                str(input_path)
-            ]
-
-            if self.stems == 2:
-                cmd.extend(["--two-stems", "vocals"])
-
-            # Start process
+            separated_dir = input_path.parent.parent / "separated" # Relative to uploads
+            track_name = output_name or input_path.stem
+            # Demucs creates: separated/htdemucs/track_name/vocals.wav
+            model_output_dir = separated_dir / self.model / track_name
+
+            # Decoded and resampled ahead of time when the upload came in (see ingest.py)
+            source_path = prepared_path(input_path)
+            if source_path.exists():
+                print(f"[Engine] Using pre-decoded input: {source_path.name}")
+            else:
+                source_path = input_path
+
             start_time = time.time()
-            process = subprocess.Popen(
-                cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                bufsize=1,
-                universal_newlines=True,
-                creationflags=subprocess.CREATE_NO_WINDOW if os.name == 'nt' else 0
-            )
+            duration = self.probe_duration(source_path)
 
-            # Monitor progress
-            while True:
-                output = process.stderr.readline()
-                if output == '' and process.poll() is not None:
-                    break
-                if output:
-                    # Demucs prints progress like: 0%|          | 0/100 [00:00<?, ?it/s]
-                    if "%" in output:
-                        try:
-                            # Simplified percent extraction
-                            percent_str = output.split('%')[0].split()[-1]
-                            percent = float(percent_str)
-                            progress_data = {
-                                "status": "processing", 
-                                "progress": percent,
-                                "raw": f"Separating Stems: {percent}%"
-                            }
-                            if callback:
-                                callback(progress_data)
-                        except:
-                            pass
-            
-            return_code = process.poll()
+            if checkpoint_dir and self.checkpoint_segment_seconds > 0 and duration and duration > 2 * self.checkpoint_segment_seconds:
+                checkpoint_dir = Path(checkpoint_dir).resolve()
+                cancelled = False
+                try:
+                    error_result, separated_duration = self._process_segmented(
+                        source_path, model_output_dir, checkpoint_dir, duration,
+                        callback=callback, cancel_event=cancel_event
+                    )
+                except SeparationCancelled:
+                    # The run that took over resumes from these checkpoints
+                    cancelled = True
+                    raise
+                finally:
+                    # Checkpoints are only useful for resuming an interrupted run
+                    if not cancelled:
+                        shutil.rmtree(checkpoint_dir, ignore_errors=True)
+                if error_result:
+                    return error_result
+                return_code = 0
+            else:
+                separated_duration = duration
+                return_code, stderr_out = self._run_demucs(
+                    source_path, separated_dir, callback=callback, output_name=track_name,
+                    cancel_event=cancel_event
+                )
             
             if return_code == 0:
-                track_name = input_path.stem
-                # Demucs creates: separated/htdemucs/track_name/vocals.wav
-                model_output_dir = input_path.parent.parent / "separated" / self.model / track_name
-                
                 stems = {}
                 if model_output_dir.exists():
                     # We need to return paths relative to the 'public' folder for Next.js
@@ -116,11 +322,15 @@ class AudioProcessor:
                 return {
                     "status": "complete",
                     "duration": time.time() - start_time,
+                    "audio_duration": duration,
+                    # Less than audio_duration when a resumed run skipped finished segments
+                    "separated_duration": separated_duration,
                     "stems": stems
                 }
             else:
-                stderr_out = process.stderr.read()
                 return {"status": "error", "message": f"Demucs failed with code {return_code}", "details": stderr_out}
 
+        except SeparationCancelled:
+            return {"status": "cancelled", "message": "Separation cancelled"}
         except Exception as e:
             return {"status": "error", "message": f"Processor error: {str(e)}"}
@@ -0,0 +1,249 @@
+"""
+Resumable uploads assembled in place.
+
+An upload session reserves a file of the announced size up front. Clients
+then send the bytes either sequentially by offset (PATCH) or as numbered
+fixed-size chunks in any order and in parallel (PUT). Every piece is
+written straight to its final position with `pwrite`, so the file never
+has to be copied or concatenated at the end. Received byte ranges are
+kept in a JSON sidecar next to the file, so an interrupted upload resumes
+where it stopped, even across restarts. The sidecar is the only copy of the
+state and is updated under a lock on the `.part` file, so the pieces of one
+upload may arrive at different API processes.
+
+Completing an upload first claims it under that lock; from then on no
+piece is accepted. A finished upload's response is kept in the sidecar
+until the session expires, so repeating the completion returns it again.
+"""
+
+import json
+import os
+import re
+import time
+import uuid
+from pathlib import Path
+from typing import Callable, List, Optional
+from job_store import write_json_atomic
+from host_locks import locked_file
+
+_UPLOAD_ID = re.compile(r"[0-9a-f]{32}")
+
+
+def merge_range(ranges: List[List[int]], start: int, end: int) -> List[List[int]]:
+    """Add [start, end) to sorted, non-overlapping ranges, merging neighbours."""
+    merged = []
+    for range_start, range_end in sorted(ranges + [[start, end]]):
+        if merged and range_start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], range_end)
+        else:
+            merged.append([range_start, range_end])
+    return merged
+
+
+def remove_range(ranges: List[List[int]], start: int, end: int) -> List[List[int]]:
+    """Remove [start, end) from sorted, non-overlapping ranges."""
+    remaining = []
+    for range_start, range_end in ranges:
+        if range_start < start:
+            remaining.append([range_start, min(range_end, start)])
+        if range_end > end:
+            remaining.append([max(range_start, end), range_end])
+    return remaining
+
+
+def contiguous_offset(session: dict) -> int:
+    """Number of bytes received without gaps from the start of the file."""
+    ranges = session["ranges"]
+    return ranges[0][1] if ranges and ranges[0][0] == 0 else 0
+
+
+def is_complete(session: dict) -> bool:
+    return contiguous_offset(session) == session["size"]
+
+
+class UploadConflict(Exception):
+    """The upload's state does not allow the request (offset moved on, incomplete, or being completed)"""
+
+
+class ResumableUploadStore:
+    """Upload sessions kept as a preallocated `.part` file plus a JSON sidecar"""
+
+    def __init__(self, directory: Path, chunk_size: int, ttl_seconds: float):
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.ttl_seconds = ttl_seconds
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def part_path(self, upload_id: str) -> Path:
+        return self.directory / f"{upload_id}.part"
+
+    def state_path(self, upload_id: str) -> Path:
+        return self.directory / f"{upload_id}.json"
+
+    def create(self, user_id: str, file_name: str, size: int) -> dict:
+        """Start a session and reserve `size` bytes on disk."""
+        upload_id = uuid.uuid4().hex
+        session = {
+            "id": upload_id,
+            "user_id": user_id,
+            "file_name": file_name,
+            "size": size,
+            "chunk_size": self.chunk_size,
+            "ranges": [],
+            "created_at": time.time(),
+        }
+        fd = os.open(self.part_path(upload_id), os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        try:
+            if size and hasattr(os, "posix_fallocate"):
+                # Fail now, not halfway through the upload, if the disk is full
+                os.posix_fallocate(fd, 0, size)
+            else:
+                os.ftruncate(fd, size)
+        except OSError:
+            os.close(fd)
+            self.part_path(upload_id).unlink(missing_ok=True)
+            raise
+        os.close(fd)
+
+        write_json_atomic(self.state_path(upload_id), session)
+        return session
+
+    def _load(self, upload_id: str) -> Optional[dict]:
+        try:
+            with self.state_path(upload_id).open("r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get(self, upload_id: str) -> Optional[dict]:
+        """A session's current state, read from its sidecar."""
+        if not _UPLOAD_ID.fullmatch(upload_id):
+            return None
+        return self._load(upload_id)
+
+    def _writable(self, upload_id: str) -> dict:
+        # Call under the lock. Raises FileNotFoundError once the upload is
+        # being completed, was completed or discarded
+        session = self._load(upload_id)
+        if session is None or session.get("completing") or "result" in session:
+            raise FileNotFoundError(self.state_path(upload_id))
+        return session
+
+    def _pwrite(self, upload_id: str, offset: int, data: bytes) -> None:
+        fd = os.open(self.part_path(upload_id), os.O_WRONLY)
+        try:
+            view = memoryview(data)
+            while view:
+                written = os.pwrite(fd, view, offset)
+                view = view[written:]
+                offset += written
+            os.fsync(fd)
+        finally:
+            os.close(fd)
+
+    def write(self, upload_id: str, offset: int, data: bytes) -> None:
+        """
+        Write bytes at their final position and make them durable (blocking).
+
+        Writes of other chunks proceed in parallel under a shared lock; a
+        completion waits for them. Raises FileNotFoundError once the upload
+        is being completed, was completed or discarded.
+        """
+        with locked_file(self.part_path(upload_id), shared=True):
+            self._writable(upload_id)
+            self._pwrite(upload_id, offset, data)
+
+    def append(self, upload_id: str, offset: int, data: bytes) -> dict:
+        """
+        Write and record bytes at `offset` if that is still the current offset (blocking).
+
+        Check, write and record happen under the lock, so of two sequential
+        writers sending the same offset only the first succeeds; the other
+        gets UploadConflict. Returns the new state.
+        """
+        with locked_file(self.part_path(upload_id)):
+            session = self._writable(upload_id)
+            current = contiguous_offset(session)
+            if current != offset:
+                raise UploadConflict(f"Upload-Offset {offset} does not match current offset {current}")
+            self._pwrite(upload_id, offset, data)
+            session["ranges"] = merge_range(session["ranges"], offset, offset + len(data))
+            write_json_atomic(self.state_path(upload_id), session)
+            return session
+
+    def _update_ranges(self, upload_id: str, update: Callable[[List[List[int]]], List[List[int]]]) -> dict:
+        with locked_file(self.part_path(upload_id)):
+            session = self._writable(upload_id)
+            session["ranges"] = update(session["ranges"])
+            write_json_atomic(self.state_path(upload_id), session)
+            return session
+
+    def record(self, upload_id: str, start: int, end: int) -> dict:
+        """Mark [start, end) as received and persist the sidecar. Returns the new state."""
+        return self._update_ranges(upload_id, lambda ranges: merge_range(ranges, start, end))
+
+    def forget(self, upload_id: str, start: int, end: int) -> dict:
+        """Mark [start, end) as missing again, e.g. after a chunk was only partly rewritten."""
+        return self._update_ranges(upload_id, lambda ranges: remove_range(ranges, start, end))
+
+    def claim_completion(self, upload_id: str) -> dict:
+        """
+        Stop accepting pieces of a fully received upload so it can be completed.
+
+        Returns the session, which holds the response under "result" if the
+        upload was already completed. Raises UploadConflict if it is
+        incomplete or another request is completing it, and FileNotFoundError
+        if it is gone (the part file is moved away by a completion).
+        """
+        with locked_file(self.part_path(upload_id)):
+            session = self._load(upload_id)
+            if session is None:
+                raise FileNotFoundError(self.state_path(upload_id))
+            if "result" in session:
+                return session
+            if session.get("completing"):
+                raise UploadConflict("Upload is already being completed")
+            if not is_complete(session):
+                raise UploadConflict(
+                    f"Upload incomplete: {contiguous_offset(session)} of {session['size']} bytes received"
+                )
+            session["completing"] = True
+            write_json_atomic(self.state_path(upload_id), session)
+            return session
+
+    def release_completion(self, upload_id: str) -> None:
+        """Accept pieces again after a completion failed for reasons other than the bytes."""
+        try:
+            with locked_file(self.part_path(upload_id)):
+                session = self._load(upload_id)
+                if session is not None:
+                    session.pop("completing", None)
+                    write_json_atomic(self.state_path(upload_id), session)
+        except FileNotFoundError:
+            pass  # moved away or discarded; nothing left to retry
+
+    def finish(self, upload_id: str, result: dict) -> None:
+        """Keep a completed upload's response and drop its part file (if not moved away)."""
+        # Only the claiming request writes the sidecar from here on
+        session = self._load(upload_id)
+        if session is not None:
+            session.pop("completing", None)
+            session["result"] = result
+            write_json_atomic(self.state_path(upload_id), session)
+        self.part_path(upload_id).unlink(missing_ok=True)
+
+    def discard(self, upload_id: str) -> None:
+        """Delete a session's files (the `.part` file may already be moved away)."""
+        self.part_path(upload_id).unlink(missing_ok=True)
+        self.state_path(upload_id).unlink(missing_ok=True)
+
+    def purge_expired(self, now: float = None) -> int:
+        """Delete sessions older than the TTL. Returns the number deleted."""
+        cutoff = (now or time.time()) - self.ttl_seconds
+        purged = 0
+        for state_path in self.directory.glob("*.json"):
+            session = self.get(state_path.stem)
+            if session is not None and session["created_at"] < cutoff:
+                self.discard(session["id"])
+                purged += 1
+        return purged
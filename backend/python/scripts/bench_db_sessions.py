@@ -0,0 +1,121 @@
+"""
+Connection-churn benchmark for request-scoped pooled sessions.
+
+Simulates concurrent status polls, each opening a session, reading a few
+jobs and closing it, against two engines built for the same database:
+
+- unpooled: a fresh connection per session (NullPool), i.e. the cost of
+  reconnecting for every request
+- pooled:   the tuned pool from database/config.py (DB_POOL_* settings)
+
+Reports throughput, latency percentiles and how many physical connections
+each engine opened.
+
+Usage (from backend/python):
+    python scripts/bench_db_sessions.py --database-url postgresql://... [--threads 16] [--requests 200]
+    python scripts/bench_db_sessions.py   # scratch SQLite file
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Database to benchmark (default: a temporary SQLite file)")
+    parser.add_argument("--threads", type=int, default=16, help="Concurrent simulated clients")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per client")
+    return parser.parse_args()
+
+
+# The engine is configured from DATABASE_URL at import time, so set it up first
+args = _parse_args()
+if args.database_url:
+    os.environ["DATABASE_URL"] = args.database_url
+else:
+    os.chdir(tempfile.mkdtemp(prefix="singscape-bench-"))  # the SQLite default is ./singscape.db
+    os.environ.pop("DATABASE_URL", None)
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+from database.config import POOL_SETTINGS, engine, run_migrations, get_db_session
+from database.repositories import JobRepository
+
+JOB_IDS = [f"bench-{i}" for i in range(20)]
+
+
+def _seed():
+    db = get_db_session()
+    try:
+        job_repo = JobRepository(db)
+        for job_id in JOB_IDS:
+            if not job_repo.get_job(job_id):
+                job_repo.create_job(job_id, "bench-user", "/tmp/in.wav", "/tmp/out")
+    finally:
+        db.close()
+
+
+def _run(label, bench_engine):
+    """Hammer `bench_engine` with short-lived sessions and print the results."""
+    connects = []
+    event.listen(bench_engine, "connect", lambda *_: connects.append(1))
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=bench_engine)
+    latencies = []
+    lock = threading.Lock()
+
+    def _client(offset):
+        local = []
+        for i in range(args.requests):
+            started = time.perf_counter()
+            db = session_factory()
+            try:
+                job_repo = JobRepository(db)
+                job_repo.get_job(JOB_IDS[(offset + i) % len(JOB_IDS)])
+                job_repo.get_jobs(JOB_IDS[:5])
+            finally:
+                db.close()
+            local.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=_client, args=(n,)) for n in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    bench_engine.dispose()
+
+    quantiles = statistics.quantiles(latencies, n=100)
+    print(
+        f"{label:<9} {len(latencies) / elapsed:>9.0f} req/s   "
+        f"p50 {quantiles[49] * 1000:>7.2f} ms   p95 {quantiles[94] * 1000:>7.2f} ms   "
+        f"p99 {quantiles[98] * 1000:>7.2f} ms   connections opened: {len(connects)}"
+    )
+
+
+def main():
+    run_migrations()
+    _seed()
+    engine.dispose()
+
+    url = engine.url
+    connect_args = {"check_same_thread": False} if url.get_backend_name() == "sqlite" else {}
+    print(f"{args.threads} clients x {args.requests} requests against {url.render_as_string(hide_password=True)}")
+    print(f"pool settings: {POOL_SETTINGS}\n")
+    _run("unpooled", create_engine(url, poolclass=NullPool, connect_args=connect_args))
+    _run("pooled", create_engine(url, connect_args=connect_args, **POOL_SETTINGS))
+
+
+if __name__ == "__main__":
+    main()
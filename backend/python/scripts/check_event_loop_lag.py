@@ -0,0 +1,157 @@
+"""
+Check that concurrent status polls do not stall the event loop.
+
+A ticker coroutine sleeps for a short interval in a loop and records how
+late it wakes up while simulated clients poll job status concurrently, each
+yielding to the loop between polls. Two runs are compared against the same
+database:
+
+- blocking: polls issued through the synchronous JobRepository from inside
+  coroutines, which is how the endpoints used to talk to the database
+- endpoint: real GET /status/{job_id} requests served by the app through
+  the async repository layer
+
+With blocking calls every poll runs to completion before the loop can do
+anything else, so polls serialize and the ticker's worst-case lag grows
+with the database round trip. The check fails if the endpoint run's
+worst-case lag exceeds --max-lag-ms.
+
+Usage (from backend/python):
+    python scripts/check_event_loop_lag.py                  # scratch SQLite DB
+    python scripts/check_event_loop_lag.py --database-url postgresql://... --clients 50
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Database to use (default: a temporary SQLite file)")
+    parser.add_argument("--clients", type=int, default=20, help="Concurrent polling clients")
+    parser.add_argument("--polls", type=int, default=20, help="Status polls per client")
+    parser.add_argument("--tick-ms", type=float, default=5.0, help="Ticker sleep interval")
+    parser.add_argument("--max-lag-ms", type=float, default=50.0, help="Allowed worst-case lag for the endpoint run")
+    return parser.parse_args()
+
+
+# The engine and upload directories are configured at import time, so set up first
+args = _parse_args()
+os.chdir(tempfile.mkdtemp(prefix="singscape-lag-"))
+if args.database_url:
+    os.environ["DATABASE_URL"] = args.database_url
+else:
+    os.environ.pop("DATABASE_URL", None)  # the SQLite default is ./singscape.db
+os.environ.setdefault("NEXTAUTH_SECRET", "event-loop-lag-check")
+
+import httpx
+from database.config import init_database, get_db_session
+from database.repositories import JobRepository
+import main as api
+
+USER_ID = "lag-check-user"
+JOB_IDS = [f"lag-check-{i}" for i in range(20)]
+
+
+def _seed():
+    db = get_db_session()
+    try:
+        job_repo = JobRepository(db)
+        for job_id in JOB_IDS:
+            if not job_repo.get_job(job_id):
+                job_repo.create_job(job_id, USER_ID, "/tmp/in.wav", "/tmp/out")
+    finally:
+        db.close()
+
+
+async def _measure(poll):
+    """Run the polling clients next to a ticker; return the ticker's lag samples in ms."""
+    lags = []
+    done = asyncio.Event()
+    interval = args.tick_ms / 1000.0
+
+    async def _ticker():
+        while not done.is_set():
+            started = time.perf_counter()
+            await asyncio.sleep(interval)
+            lags.append((time.perf_counter() - started - interval) * 1000.0)
+
+    async def _client(offset):
+        for i in range(args.polls):
+            await poll(JOB_IDS[(offset + i) % len(JOB_IDS)])
+            await asyncio.sleep(0)
+
+    ticker = asyncio.create_task(_ticker())
+    await asyncio.sleep(interval * 2)
+    started = time.perf_counter()
+    await asyncio.gather(*[_client(n) for n in range(args.clients)])
+    elapsed = time.perf_counter() - started
+    done.set()
+    await ticker
+    return lags, elapsed
+
+
+async def _blocking_poll(job_id):
+    db = get_db_session()
+    try:
+        job_repo = JobRepository(db)
+        job = job_repo.get_job(job_id)
+        if job.status == "queued":
+            job_repo.get_queue_info(job.id)
+    finally:
+        db.close()
+
+
+def _report(label, lags, elapsed):
+    worst = max(lags) if lags else 0.0
+    p95 = statistics.quantiles(lags, n=20, method="inclusive")[18] if len(lags) >= 2 else worst
+    print(f"{label:<9} {args.clients * args.polls} polls in {elapsed * 1000:>8.1f} ms   "
+          f"ticker lag p95 {p95:>7.2f} ms   max {worst:>7.2f} ms   ({len(lags)} ticks)")
+    return worst
+
+
+async def _run():
+    token = base64.urlsafe_b64encode(json.dumps({"sub": USER_ID}).encode()).decode().rstrip("=")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    lags, elapsed = await _measure(_blocking_poll)
+    _report("blocking", lags, elapsed)
+
+    transport = httpx.ASGITransport(app=api.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://lag-check") as client:
+        # Warm up the connection pool and estimator caches outside the measurement
+        (await client.get(f"/status/{JOB_IDS[0]}", headers=headers)).raise_for_status()
+
+        async def _endpoint_poll(job_id):
+            (await client.get(f"/status/{job_id}", headers=headers)).raise_for_status()
+
+        lags, elapsed = await _measure(_endpoint_poll)
+    worst = _report("endpoint", lags, elapsed)
+
+    await api.async_engine.dispose()
+    return worst
+
+
+def main():
+    init_database()
+    _seed()
+
+    worst = asyncio.run(_run())
+    if worst > args.max_lag_ms:
+        print(f"\nEvent loop stalled for {worst:.1f} ms (limit {args.max_lag_ms:.0f} ms)")
+        sys.exit(1)
+    print("\nStatus polls no longer block the event loop")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+"""
+Assert that every hot repository query is served by an index.
+
+Each repository method is run against a scratch database while the SQL it
+emits is captured. Every captured SELECT/UPDATE/DELETE is then explained and
+the check fails if the plan contains a full table scan, or if a method listed
+in EXPECTED_INDEXES is not served by its index.
+
+Usage (from backend/python):
+    python scripts/check_query_plans.py                  # scratch SQLite DB
+    python scripts/check_query_plans.py --database-url postgresql://...
+
+The PostgreSQL database must already be migrated. All work happens inside a
+transaction that is rolled back, and sequential scans are disabled so the
+planner reports whether an index *can* serve the query even on a near-empty
+table.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+
+def _parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", help="Database to check (default: a temporary SQLite file)")
+    return parser.parse_args()
+
+
+# The engine is configured from DATABASE_URL at import time, so set it up first
+args = _parse_args()
+if args.database_url:
+    os.environ["DATABASE_URL"] = args.database_url
+else:
+    os.chdir(tempfile.mkdtemp(prefix="singscape-plans-"))  # the SQLite default is ./singscape.db
+    os.environ.pop("DATABASE_URL", None)
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from database.config import engine, run_migrations
+from database.repositories import (
+    JobRepository, JobMetricRepository, MetricRollupRepository, UploadBlobRepository, UserQuotaRepository
+)
+from database.rollups import roll_up_metrics
+from database.eta import eta_estimator
+
+# Repository methods on the hot paths, each run once against the scratch data
+CHECKS = [
+    ("JobRepository.get_job", lambda db: JobRepository(db).get_job("job-1")),
+    ("JobRepository.get_jobs", lambda db: JobRepository(db).get_jobs(["job-1", "job-2"])),
+    ("JobRepository.get_user_jobs", lambda db: JobRepository(db).get_user_jobs("user-1")),
+    ("JobRepository.get_queue_snapshot", lambda db: JobRepository(db).get_queue_snapshot()),
+    ("JobRepository.take_over_jobs", lambda db: JobRepository(db).take_over_jobs("plan-check", 60, max_attempts=3)),
+    ("JobRepository.get_old_jobs", lambda db: JobRepository(db).get_old_jobs()),
+    ("JobRepository.delete_old_jobs", lambda db: JobRepository(db).delete_old_jobs()),
+    ("JobRepository.bulk_update_progress",
+     lambda db: JobRepository(db).bulk_update_progress({"job-1": {"progress": 10, "message": "x"}})),
+    ("JobRepository.claim_next_job", lambda db: JobRepository(db).claim_next_job("plan-check", 60)),
+    ("JobRepository.renew_lease", lambda db: JobRepository(db).renew_lease("job-1", "plan-check", 60)),
+    ("JobRepository.renew_owner_leases", lambda db: JobRepository(db).renew_owner_leases("plan-check", 60)),
+    ("JobRepository.requeue_expired_leases", lambda db: JobRepository(db).requeue_expired_leases()),
+    ("JobRepository.get_jobs_due_for_cleanup",
+     lambda db: JobRepository(db).get_jobs_due_for_cleanup(datetime.utcnow())),
+    ("JobRepository.get_least_recently_accessed", lambda db: JobRepository(db).get_least_recently_accessed()),
+    ("JobRepository.get_shared_input_paths",
+     lambda db: JobRepository(db).get_shared_input_paths(["/tmp/in.wav"], ["job-1"])),
+    ("JobRepository.get_active_input_paths", lambda db: JobRepository(db).get_active_input_paths()),
+    ("JobRepository.mark_files_deleted_bulk", lambda db: JobRepository(db).mark_files_deleted_bulk(["job-2"])),
+    ("JobRepository.touch_jobs", lambda db: JobRepository(db).touch_jobs(["job-1"])),
+    ("UploadBlobRepository.get_blob_paths", lambda db: UploadBlobRepository(db).get_blob_paths(["/tmp/in.wav"])),
+    ("UploadBlobRepository.get_owned_blob", lambda db: UploadBlobRepository(db).get_owned_blob("f" * 64, "user-1")),
+    ("UploadBlobRepository.register_blob",
+     lambda db: UploadBlobRepository(db).register_blob("0" * 64, "/tmp/0.wav", 100, "wav", user_id="user-1")),
+    ("UploadBlobRepository.delete_unreferenced",
+     lambda db: UploadBlobRepository(db).delete_unreferenced(datetime.utcnow() - timedelta(days=1))),
+    ("JobMetricRepository.get_metrics", lambda db: JobMetricRepository(db).get_metrics()),
+    ("roll_up_metrics", lambda db: roll_up_metrics(db)),
+    ("MetricRollupRepository.get_rollups",
+     lambda db: MetricRollupRepository(db).get_rollups("hour", datetime.utcnow() - timedelta(days=1))),
+    ("QueueEtaEstimator.refresh", lambda db: eta_estimator.refresh(db, force=True)),
+    ("UserQuotaRepository.get_or_create_quota", lambda db: UserQuotaRepository(db).get_or_create_quota("user-1")),
+    ("UserQuotaRepository.get_recent_job_times",
+     lambda db: UserQuotaRepository(db).get_recent_job_times("user-1", datetime.utcnow() - timedelta(days=1))),
+    ("UserQuotaRepository.save_usage", lambda db: UserQuotaRepository(db).save_usage("user-1", 1, 1)),
+    ("UserQuotaRepository.consume_quota", lambda db: UserQuotaRepository(db).consume_quota("user-1")),
+]
+
+# Methods that must use a particular index, e.g. a partial index the planner
+# only picks when the query matches its WHERE clause
+EXPECTED_INDEXES = {
+    "JobRepository.get_jobs_due_for_cleanup": "ix_jobs_auto_cleanup_at_pending",
+    "JobRepository.get_least_recently_accessed": "ix_jobs_last_accessed_at_pending",
+    "JobRepository.get_shared_input_paths": "ix_jobs_input_path",
+}
+
+
+def _seed(db):
+    """Insert a few rows so every method has something to look at."""
+    UploadBlobRepository(db).register_blob("f" * 64, "/tmp/in.wav", 100, "wav")
+    job_repo = JobRepository(db)
+    for i in range(3):
+        job_repo.create_job(f"job-{i}", "user-1", "/tmp/in.wav", "/tmp/out")
+    JobMetricRepository(db).record_metric("job-0", 1.0, 10.0, True, audio_duration_seconds=20.0)
+
+
+def _explain(connection, statement, parameters):
+    """Return the plan lines for a statement."""
+    if isinstance(parameters, list):
+        parameters = parameters[0] if parameters else {}
+    cursor = connection.connection.cursor()
+    try:
+        if connection.dialect.name == "postgresql":
+            cursor.execute(f"EXPLAIN (FORMAT JSON) {statement}", parameters)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return list(_postgres_nodes(plan[0]["Plan"]))
+        cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+        return [row[-1] for row in cursor.fetchall()]
+    finally:
+        cursor.close()
+
+
+def _postgres_nodes(node):
+    relation = f" on {node['Relation Name']}" if "Relation Name" in node else ""
+    index = f" using {node['Index Name']}" if "Index Name" in node else ""
+    yield f"{node['Node Type']}{relation}{index}"
+    for child in node.get("Plans", []):
+        yield from _postgres_nodes(child)
+
+
+def _is_full_scan(line, dialect):
+    if dialect == "postgresql":
+        return line.startswith("Seq Scan")
+    # SQLite: "SCAN jobs" is a table scan; "SCAN jobs USING INDEX ..." walks an index
+    return line.startswith("SCAN ") and " USING " not in line
+
+
+def main():
+    if not args.database_url:
+        run_migrations()
+
+    connection = engine.connect()
+    outer = connection.begin()
+    if connection.dialect.name == "postgresql":
+        connection.exec_driver_sql("SET LOCAL enable_seqscan = off")
+
+    # Repository commits become savepoint releases inside the outer transaction
+    db = Session(bind=connection, join_transaction_mode="create_savepoint")
+    _seed(db)
+
+    captured = []
+
+    def _capture(conn, cursor, statement, parameters, context, executemany):
+        verb = statement.lstrip().split(None, 1)[0].upper()
+        if verb in ("SELECT", "UPDATE", "DELETE"):
+            captured.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", _capture)
+    failures = 0
+    try:
+        for name, check in CHECKS:
+            captured.clear()
+            check(db)
+            statements = list(captured)
+            plans = []
+            for statement, parameters in statements:
+                plan = _explain(connection, statement, parameters)
+                plans.extend(plan)
+                scans = [line for line in plan if _is_full_scan(line, connection.dialect.name)]
+                status = "FAIL" if scans else "ok"
+                failures += bool(scans)
+                print(f"[{status}] {name}: {' | '.join(plan)}")
+            if not statements:
+                print(f"[skip] {name}: no query issued")
+            expected = EXPECTED_INDEXES.get(name)
+            if expected and not any(expected in line for line in plans):
+                failures += 1
+                print(f"[FAIL] {name}: does not use {expected}")
+    finally:
+        event.remove(engine, "before_cursor_execute", _capture)
+        db.close()
+        outer.rollback()
+        connection.close()
+
+    if failures:
+        print(f"\n{failures} queries are not served by an index (or not by the expected one)")
+        sys.exit(1)
+    print("\nAll repository queries use an index")
+
+
+if __name__ == "__main__":
+    main()
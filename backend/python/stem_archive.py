@@ -0,0 +1,66 @@
+"""
+ZIP archives streamed straight from the stem files.
+
+`zipfile` writes to any object with a `write` method; when the target
+cannot seek it records sizes and CRCs in data descriptors after each
+member instead of patching the local headers. The archive is therefore
+produced front to back while each stem is read, block by block, and
+handed to the client as it is generated: no temp file, no second copy on
+disk, and memory bounded by the block size.
+"""
+
+import io
+import time
+import zipfile
+from pathlib import Path
+from typing import Iterable, Iterator, Tuple
+
+# Bytes read from a stem per block
+BLOCK_BYTES = 1024 * 1024
+
+# Larger members need ZIP64 headers, which must be chosen before writing
+_ZIP64_MEMBER_BYTES = 0x7FFFFFFF
+
+
+class _ChunkSink(io.RawIOBase):
+    """Unseekable write target that collects the bytes zipfile produces"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def stream_zip(members: Iterable[Tuple[str, Path]], compresslevel: int = None) -> Iterator[bytes]:
+    """
+    Yield a ZIP archive of `(name in archive, file path)` members.
+
+    Members are stored uncompressed by default, since audio barely
+    compresses and WAV stems are large; pass a `compresslevel` (1 is
+    fastest) to deflate them instead.
+    """
+    sink = _ChunkSink()
+    compression = zipfile.ZIP_STORED if compresslevel is None else zipfile.ZIP_DEFLATED
+    with zipfile.ZipFile(sink, "w", compression=compression, compresslevel=compresslevel) as archive:
+        for name, path in members:
+            stat = path.stat()
+            info = zipfile.ZipInfo(name, date_time=time.localtime(stat.st_mtime)[:6])
+            info.compress_type = compression
+            info.file_size = stat.st_size
+            with path.open("rb") as source, archive.open(info, "w", force_zip64=stat.st_size > _ZIP64_MEMBER_BYTES) as target:
+                while block := source.read(BLOCK_BYTES):
+                    target.write(block)
+                    yield sink.drain()
+            yield sink.drain()
+    # Central directory
+    yield sink.drain()
@@ -0,0 +1,242 @@
+"""
+Server-side remixing of separated stems.
+
+A mix is a weighted sum of a job's stems. The stem WAVs are memory-mapped
+and summed block by block with NumPy, and the result is streamed as a
+32-bit float WAV while it is computed, so a mix never has to fit in memory
+and the client does not download every stem to mix them itself. Float
+output keeps the headroom of boosted stems instead of clipping them.
+
+Parameter sets that are requested repeatedly (a karaoke mix, a drums-only
+mix) are written to a bounded on-disk cache while they stream, and served
+from there afterwards (see `MixCache`).
+"""
+
+import glob
+import hashlib
+import os
+import struct
+import threading
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+from audio_probe import read_wav_layout
+
+# Frames mixed per block (64k frames of stereo float32 is 512 KiB)
+MIX_BLOCK_FRAMES = 65536
+
+# Gains are rounded to this many decimals of a dB before mixing, so that
+# requests that sound the same share a cache entry
+GAIN_DB_DECIMALS = 1
+
+_WAVE_FORMAT_PCM = 0x0001
+_WAVE_FORMAT_IEEE_FLOAT = 0x0003
+
+
+def effective_gains(
+    stems: Iterable[str],
+    gains_db: Dict[str, float],
+    mute: Iterable[str] = (),
+    solo: Iterable[str] = (),
+) -> Dict[str, float]:
+    """
+    Gain in dB of every audible stem after applying mute and solo.
+
+    Soloing any stem silences all stems that are not soloed; a muted stem is
+    silent even when soloed. Stems left out of the result are not read.
+    """
+    mute, solo = set(mute), set(solo)
+    audible = {}
+    for stem in stems:
+        if stem in mute or (solo and stem not in solo):
+            continue
+        audible[stem] = round(float(gains_db.get(stem, 0.0)), GAIN_DB_DECIMALS)
+    return audible
+
+
+def mix_key(job_id: str, gains_db: Dict[str, float]) -> str:
+    """Cache key of a job's mix with the given effective gains (prefixed with the job ID)."""
+    canonical = ";".join(f"{stem}={gain:.{GAIN_DB_DECIMALS}f}" for stem, gain in sorted(gains_db.items()))
+    return f"{job_id}.{hashlib.sha256(canonical.encode('utf-8')).hexdigest()}"
+
+
+def _open_stem(path: Path) -> Tuple[np.ndarray, float, int]:
+    """Memory-map a WAV stem as (frames, channels) samples. Returns (samples, full scale, sample rate)."""
+    with path.open("rb") as f:
+        layout = read_wav_layout(f, path.stat().st_size)
+    if layout is None or layout.data_offset is None:
+        raise ValueError(f"{path.name} is not a WAV file")
+
+    bits, channels = layout.bits_per_sample, layout.channels
+    if layout.format_tag == _WAVE_FORMAT_IEEE_FLOAT and bits in (32, 64):
+        dtype, scale = np.dtype(f"<f{bits // 8}"), 1.0
+    elif layout.format_tag == _WAVE_FORMAT_PCM and bits in (16, 24, 32):
+        # 24-bit samples are mapped as raw bytes and widened per block
+        dtype = np.dtype("u1") if bits == 24 else np.dtype(f"<i{bits // 8}")
+        scale = float(2 ** (bits - 1))
+    else:
+        raise ValueError(f"{path.name}: unsupported WAV sample format {layout.format_tag}/{bits} bit")
+
+    frame_bytes = channels * bits // 8
+    frames = layout.data_size // frame_bytes
+    if frames == 0:
+        return np.zeros((0, channels), dtype=np.float32), 1.0, layout.sample_rate
+    shape = (frames, channels, 3) if bits == 24 else (frames, channels)
+    samples = np.memmap(path, dtype=dtype, mode="r", offset=layout.data_offset, shape=shape)
+    return samples, scale, layout.sample_rate
+
+
+def _to_float(block: np.ndarray) -> np.ndarray:
+    if block.ndim == 3:
+        # Little-endian 24-bit: place the bytes in the top of an int32, then shift back down
+        widened = (
+            block[..., 0].astype(np.int32) << 8
+            | block[..., 1].astype(np.int32) << 16
+            | block[..., 2].astype(np.int32) << 24
+        ) >> 8
+        return widened.astype(np.float32)
+    return block.astype(np.float32)
+
+
+def wav_header(frames: int, channels: int, sample_rate: int) -> bytes:
+    """Header of a 32-bit float WAV with `frames` frames of audio."""
+    block_align = channels * 4
+    data_size = frames * block_align
+    fmt = struct.pack("<HHIIHHH", _WAVE_FORMAT_IEEE_FLOAT, channels, sample_rate, sample_rate * block_align, block_align, 32, 0)
+    fact = struct.pack("<I", frames)
+    riff_size = 4 + (8 + len(fmt)) + (8 + len(fact)) + (8 + data_size)
+    return (
+        b"RIFF" + struct.pack("<I", riff_size) + b"WAVE"
+        + b"fmt " + struct.pack("<I", len(fmt)) + fmt
+        + b"fact" + struct.pack("<I", len(fact)) + fact
+        + b"data" + struct.pack("<I", data_size)
+    )
+
+
+class StemMix:
+    """A mix of WAV stems, validated up front so the response size is known before streaming"""
+
+    def __init__(self, stem_paths: Dict[str, Path], gains_db: Dict[str, float], block_frames: int = MIX_BLOCK_FRAMES):
+        self.block_frames = block_frames
+        self._sources: List[Tuple[np.ndarray, np.float32]] = []
+        sample_rates, channel_counts, frame_counts = set(), set(), []
+        for stem, path in stem_paths.items():
+            samples, scale, sample_rate = _open_stem(path)
+            sample_rates.add(sample_rate)
+            channel_counts.add(samples.shape[1])
+            frame_counts.append(samples.shape[0])
+            if stem in gains_db:
+                self._sources.append((samples, np.float32(10 ** (gains_db[stem] / 20) / scale)))
+        if len(sample_rates) != 1 or len(channel_counts) != 1:
+            raise ValueError("Stems differ in sample rate or channel count")
+
+        self.sample_rate = sample_rates.pop()
+        self.channels = channel_counts.pop()
+        # Stems of one separation have the same length; pad any shorter one with silence
+        self.frames = max(frame_counts)
+        self.header = wav_header(self.frames, self.channels, self.sample_rate)
+
+    @property
+    def content_length(self) -> int:
+        return len(self.header) + self.frames * self.channels * 4
+
+    def chunks(self) -> Iterator[bytes]:
+        """The encoded mix: the WAV header, then one chunk per block of frames."""
+        yield self.header
+        for start in range(0, self.frames, self.block_frames):
+            stop = min(start + self.block_frames, self.frames)
+            out = np.zeros((stop - start, self.channels), dtype=np.float32)
+            for samples, gain in self._sources:
+                block = samples[start:stop]
+                if len(block):
+                    mixed = _to_float(block)
+                    mixed *= gain
+                    out[:len(mixed)] += mixed
+            yield out.astype("<f4", copy=False).tobytes()
+
+
+class MixCache:
+    """
+    Bounded on-disk cache of popular mixes.
+
+    A mix is stored once its parameter set has been requested
+    `min_requests` times (counted in memory for the most recent keys), and
+    the least recently served mixes are deleted when the cache grows past
+    `max_bytes`. File names start with the job ID, so the mixes of a job
+    whose stems are deleted can be deleted with them (`discard_job`).
+    """
+
+    def __init__(self, directory: Path, max_bytes: int, min_requests: int = 2, tracked_keys: int = 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.min_requests = min_requests
+        self.tracked_keys = tracked_keys
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self._requests: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def path(self, key: str) -> Path:
+        return self.directory / f"{key}.wav"
+
+    def lookup(self, key: str) -> Optional[Path]:
+        """The cached mix for `key`, if any, marked as recently used."""
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def record_request(self, key: str) -> bool:
+        """Count a request for `key`. Returns True once the mix is popular enough to store."""
+        with self._lock:
+            count = self._requests.pop(key, 0) + 1
+            self._requests[key] = count
+            while len(self._requests) > self.tracked_keys:
+                self._requests.popitem(last=False)
+        return self.max_bytes > 0 and count >= self.min_requests
+
+    def store_while_streaming(self, key: str, chunks: Iterator[bytes]) -> Iterator[bytes]:
+        """Pass `chunks` through, writing them to the cache; kept only if the stream completes."""
+        tmp_path = self.directory / f"{key}.{uuid.uuid4().hex}.tmp"
+        completed = False
+        try:
+            with tmp_path.open("wb") as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    yield chunk
+            os.replace(tmp_path, self.path(key))
+            completed = True
+        finally:
+            if not completed:
+                tmp_path.unlink(missing_ok=True)
+        self.prune()
+
+    def discard_job(self, job_id: str) -> int:
+        """Delete every cached mix of a job. Returns the number deleted."""
+        deleted = 0
+        for path in self.directory.glob(f"{glob.escape(job_id)}.*.wav"):
+            path.unlink(missing_ok=True)
+            deleted += 1
+        return deleted
+
+    def prune(self) -> int:
+        """Delete the least recently used mixes beyond `max_bytes`. Returns the number deleted."""
+        entries = []
+        for path in self.directory.glob("*.wav"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        deleted = 0
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            deleted += 1
+        return deleted
@@ -0,0 +1,256 @@
+"""
+Storage garbage collection for uploads and separated stems.
+
+Finished jobs keep their upload and stems until `auto_cleanup_at`. A
+background collector deletes those files in small batches and marks the
+jobs with `files_deleted`. When free space on the volume drops below a
+threshold it first deletes pre-decoded copies of uploads (a cache the
+processor can do without) and unused uploads still in their grace period,
+then evicts the outputs of the least recently accessed jobs early, until
+enough space is free again.
+
+Uploads stored under their content hash (`upload_blobs`) are reference
+counted by the jobs using them. Deleting a job's files releases its upload,
+which is only deleted once no job uses it and nobody re-uploaded it for a
+grace period.
+
+Files are only ever deleted inside the configured storage roots, and an
+older upload that another job still uses is kept until that job expires too.
+Cached mixes of a job are deleted together with its files.
+"""
+
+import shutil
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from database.repositories import JobRepository, UploadBlobRepository
+from database.schema import Job
+from database.writer import DatabaseWriter
+from ingest import PREPARED_SUFFIX, prepared_path
+from stem_mixer import MixCache
+
+
+def _resolve_input_path(input_path: str) -> Path:
+    return Path(input_path.strip('"').strip("'")).resolve()
+
+
+def _job_input_path(job: Job) -> Path:
+    return _resolve_input_path(job.input_path)
+
+
+def job_stem_paths(job: Job) -> Dict[str, Path]:
+    """Stem name to file of a job (stems are stored relative to the upload's parent folder)."""
+    if not job.input_path:
+        return {}
+    base_dir = _job_input_path(job).parent.parent
+    return {stem: (base_dir / rel).resolve() for stem, rel in (job.stem_files or {}).items()}
+
+
+def job_file_paths(job: Job, include_input: bool = True) -> List[Path]:
+    """Upload, pre-decoded copy and stem files of a job."""
+    if not job.input_path:
+        return []
+    stem_paths = list(job_stem_paths(job).values())
+    if not include_input:
+        return stem_paths
+    input_path = _job_input_path(job)
+    return [input_path, prepared_path(input_path)] + stem_paths
+
+
+class StorageCollector:
+    """Background deleter of expired and, under disk pressure, least recently accessed job files"""
+
+    def __init__(
+        self,
+        roots: Iterable[Path],
+        session_factory: Callable[[], Session],
+        writer: DatabaseWriter,
+        min_free_percent: float = 10.0,
+        batch_size: int = 100,
+        interval_seconds: float = 600.0,
+        batch_pause_seconds: float = 0.5,
+        unused_upload_seconds: float = 86400.0,
+        mix_cache: Optional[MixCache] = None,
+    ):
+        self.roots = [Path(root).resolve() for root in roots]
+        self.session_factory = session_factory
+        self.writer = writer
+        self.min_free_percent = min_free_percent
+        self.batch_size = batch_size
+        self.interval_seconds = interval_seconds
+        self.batch_pause_seconds = batch_pause_seconds
+        self.unused_upload_seconds = unused_upload_seconds
+        self.mix_cache = mix_cache
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def free_percent(self) -> float:
+        """Free space left on the volume holding the first storage root."""
+        usage = shutil.disk_usage(self.roots[0])
+        return usage.free * 100.0 / usage.total
+
+    def under_pressure(self) -> bool:
+        return self.free_percent() < self.min_free_percent
+
+    def collect(self) -> Tuple[int, int, int, int]:
+        """
+        Run one sweep. Returns (expired jobs cleaned, jobs evicted for space,
+        unused uploads deleted, pre-decoded copies deleted for space).
+        """
+        expired = self._sweep(lambda repo: repo.get_jobs_due_for_cleanup(datetime.utcnow(), self.batch_size))
+        uploads = self._sweep_unused_uploads(datetime.utcnow() - timedelta(seconds=self.unused_upload_seconds))
+
+        evicted = prepared = 0
+        if self.under_pressure():
+            print(f"[Storage] Free space {self.free_percent():.1f}% is below {self.min_free_percent}%, evicting")
+            relieved = lambda: not self.under_pressure()
+            # Cheapest first: the copies are only a cache, and unused uploads only lose their grace period
+            prepared = self._delete_prepared_files(until=relieved)
+            uploads += self._sweep_unused_uploads(datetime.utcnow(), until=relieved)
+            evicted = self._sweep(lambda repo: repo.get_least_recently_accessed(self.batch_size), until=relieved)
+        return expired, evicted, uploads, prepared
+
+    def start(self) -> None:
+        """Start the background sweep thread."""
+        if self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._run, name="storage-gc", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop after the current batch."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=30)
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stopped.is_set():
+            try:
+                expired, evicted, uploads, prepared = self.collect()
+                if expired or evicted or uploads or prepared:
+                    print(
+                        f"[Storage] Deleted files of {expired} expired and {evicted} evicted jobs, "
+                        f"{uploads} unused uploads and {prepared} pre-decoded copies"
+                    )
+            except Exception as e:
+                print(f"[Storage] Sweep failed: {e}")
+            self._stopped.wait(self.interval_seconds)
+
+    def _sweep(self, next_batch: Callable[[JobRepository], List[Job]], until: Callable[[], bool] = None) -> int:
+        """Delete job files batch by batch until no candidates are left (or `until` holds)."""
+        cleaned = 0
+        while not self._stopped.is_set() and not (until and until()):
+            db = self.session_factory()
+            try:
+                job_repo = JobRepository(db)
+                batch = next_batch(job_repo)
+                if not batch:
+                    break
+                input_paths = [job.input_path for job in batch]
+                blobs = UploadBlobRepository(db).get_blob_paths(input_paths)
+                shared = job_repo.get_shared_input_paths(input_paths, [job.id for job in batch])
+            finally:
+                db.close()
+
+            deleted_ids = []
+            for job in batch:
+                if until and until():
+                    break
+                if self._delete_job_files(
+                    job,
+                    keep_files=job.input_path in shared and job.input_path not in blobs,
+                    keep_input=job.input_path in blobs,
+                ):
+                    deleted_ids.append(job.id)
+            if not deleted_ids:
+                # Everything left failed to delete; retry on the next sweep
+                break
+            self.writer.run(lambda db: JobRepository(db).mark_files_deleted_bulk(deleted_ids))
+            cleaned += len(deleted_ids)
+
+            # Yield the disk and the writer to request traffic between batches
+            self._stopped.wait(self.batch_pause_seconds)
+        return cleaned
+
+    def _sweep_unused_uploads(self, cutoff: datetime, until: Callable[[], bool] = None) -> int:
+        """Delete uploads no job uses that were last uploaded before `cutoff`, batch by batch."""
+        deleted = 0
+        while not self._stopped.is_set() and not (until and until()):
+            paths = self.writer.run(lambda db: UploadBlobRepository(db).delete_unreferenced(cutoff, self.batch_size))
+            if not paths:
+                break
+            for path in paths:
+                path = Path(path).resolve()
+                self._delete_paths([path, prepared_path(path)], "unused upload")
+            deleted += len(paths)
+            self._stopped.wait(self.batch_pause_seconds)
+        return deleted
+
+    def _delete_prepared_files(self, until: Callable[[], bool]) -> int:
+        """Delete pre-decoded copies of uploads, oldest first, except those of queued or running jobs."""
+        candidates = []
+        for root in self.roots:
+            for path in root.rglob(f"*{PREPARED_SUFFIX}"):
+                try:
+                    candidates.append((path.stat().st_mtime, path))
+                except OSError:
+                    continue  # deleted meanwhile
+        if not candidates:
+            return 0
+
+        db = self.session_factory()
+        try:
+            active = {prepared_path(_resolve_input_path(path)) for path in JobRepository(db).get_active_input_paths()}
+        finally:
+            db.close()
+
+        deleted = 0
+        for _, path in sorted(candidates):
+            if self._stopped.is_set() or until():
+                break
+            if path.resolve() in active:
+                continue
+            if self._delete_paths([path.resolve()], "pre-decoded upload"):
+                deleted += 1
+        return deleted
+
+    def _delete_job_files(self, job: Job, keep_files: bool = False, keep_input: bool = False) -> bool:
+        """Delete a job's files. Returns False if any file could not be deleted."""
+        if self.mix_cache is not None:
+            # Mixes belong to this job alone, and cannot be served once its files are marked deleted
+            try:
+                self.mix_cache.discard_job(job.id)
+            except OSError as e:
+                print(f"[Storage] Failed to delete cached mixes of job {job.id}: {e}")
+                return False
+        if keep_files:
+            # Another job still uses the upload (and the stems derived from it)
+            return True
+        # Reference-counted uploads are deleted by _sweep_unused_uploads
+        return self._delete_paths(job_file_paths(job, include_input=not keep_input), f"job {job.id}")
+
+    def _delete_paths(self, paths: List[Path], owner: str) -> bool:
+        ok = True
+        for path in paths:
+            root = next((root for root in self.roots if path.is_relative_to(root)), None)
+            if root is None:
+                continue
+            try:
+                path.unlink(missing_ok=True)
+                self._remove_empty_parents(path.parent, root)
+            except OSError as e:
+                print(f"[Storage] Failed to delete {path} of {owner}: {e}")
+                ok = False
+        return ok
+
+    def _remove_empty_parents(self, directory: Path, root: Path) -> None:
+        while directory != root and directory.is_relative_to(root):
+            try:
+                directory.rmdir()
+            except OSError:
+                return  # not empty
+            directory = directory.parent
@@ -0,0 +1,92 @@
+"""
+Cache of verified auth tokens.
+
+Clients poll `/status` every few seconds with the same bearer token, and
+verifying its signature and claims every time is a measurable share of
+the API's CPU. `TokenCache` remembers the decoded payload of a token that
+passed verification, keyed by the token's SHA-256 so the cache never
+holds usable credentials. An entry never outlives the token's `exp`
+claim; tokens without one are only kept for a short TTL.
+"""
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+class TokenCache:
+    """Bounded LRU map of token digest to verified payload, with per-entry expiry"""
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[bytes, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expirations = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode("utf-8")).digest()
+
+    def get(self, token: str, now: float = None) -> Optional[Dict[str, Any]]:
+        """The cached payload of `token`, or None if it is unknown or expired."""
+        now = now if now is not None else time.time()
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            # Callers get their own copy, so the cached payload cannot be modified
+            return dict(entry[1])
+
+    def put(self, token: str, payload: Dict[str, Any], now: float = None) -> None:
+        """Remember a verified payload until its `exp`, or for the TTL if it has none."""
+        if self.max_entries <= 0:
+            return
+        now = now if now is not None else time.time()
+        expires_at = now + self.ttl_seconds
+        exp = payload.get("exp")
+        if exp is not None:
+            try:
+                expires_at = float(exp)
+            except (TypeError, ValueError):
+                return
+        if expires_at <= now:
+            return
+
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (expires_at, dict(payload))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "maxEntries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hitRate": round(self.hits / lookups, 4) if lookups else None,
+                "expirations": self.expirations,
+                "evictions": self.evictions,
+            }
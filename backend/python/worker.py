@@ -3,7 +3,29 @@ import os
 import subprocess
 import json
 import argparse
+import signal
+import socket
+import threading
 import time
+from pathlib import Path
+from dotenv import load_dotenv
+
+# Load environment variables before the database config reads DATABASE_URL
+load_dotenv()
+
+from database.config import init_database, get_db_session
+from database.repositories import JobRepository, JobMetricRepository
+from database.progress import ProgressBatcher
+from database.writer import db_writer
+from processor import AudioProcessor
+
+# Queue consumer configuration
+WORKER_POLL_INTERVAL_SECONDS = float(os.getenv("WORKER_POLL_INTERVAL_SECONDS", "2"))
+WORKER_LEASE_SECONDS = int(os.getenv("WORKER_LEASE_SECONDS", "60"))
+MAX_JOB_ATTEMPTS = int(os.getenv("MAX_JOB_ATTEMPTS", "3"))
+JOB_FLUSH_INTERVAL_SECONDS = float(os.getenv("JOB_FLUSH_INTERVAL_SECONDS", "2"))
+CHECKPOINT_DIR = Path(os.getenv("CHECKPOINT_DIR", "./checkpoints")).resolve()
+CHECKPOINT_SEGMENT_SECONDS = int(os.getenv("CHECKPOINT_SEGMENT_SECONDS", "60"))
 
 def write_status(output_dir, status, progress=0, message="", data=None, error=None):
     """Writes a status.json file for the frontend to poll."""
@@ -86,10 +108,169 @@ def separate_audio(input_file, output_dir):
         write_status(output_dir, "error", 0, f"System error: {str(e)}")
         sys.exit(1)
 
+def _heartbeat(job_id, worker_id, done, lease_lost):
+    """Renew the worker's lease on a job until `done` is set; set `lease_lost` if it is gone."""
+    while not done.wait(WORKER_LEASE_SECONDS / 3):
+        db = get_db_session()
+        try:
+            if not JobRepository(db).renew_lease(job_id, worker_id, WORKER_LEASE_SECONDS):
+                print(f"[Worker] Lost lease on job {job_id}; stopping it, another worker may pick it up")
+                lease_lost.set()
+                return
+        except Exception as e:
+            db.rollback()
+            print(f"[Worker] Lease renewal for job {job_id} failed: {e}")
+        finally:
+            db.close()
+
+
+def _record_metric(job_id, input_path, stems, result, device):
+    """Record a finished job's performance; feeds the queue ETA estimator."""
+    db = get_db_session()
+    try:
+        JobMetricRepository(db).record_job_result(job_id, input_path, stems, result, device)
+    except Exception as e:
+        db.rollback()
+        print(f"[Worker] Failed to record metrics for job {job_id}: {e}")
+    finally:
+        db.close()
+
+
+def run_claimed_job(job_id, input_path, output_dir, stems, worker_id, progress_batcher):
+    """
+    Separate a job this worker holds the lease for and record the outcome.
+
+    If the lease is lost midway (e.g. heartbeats stalled and the job was
+    re-queued), the run is aborted and records nothing, so it cannot
+    overwrite the outcome of the worker that took the job over.
+    """
+    def _finish(**fields):
+        progress_batcher.discard(job_id)
+        db = get_db_session()
+        try:
+            if not JobRepository(db).finish_leased_job(job_id, worker_id, **fields):
+                print(f"[Worker] Lease on job {job_id} lost; outcome not recorded")
+        except Exception as e:
+            db.rollback()
+            print(f"[Worker] Failed to update job {job_id} in database: {e}")
+        finally:
+            db.close()
+
+    done = threading.Event()
+    lease_lost = threading.Event()
+    heartbeat = threading.Thread(target=_heartbeat, args=(job_id, worker_id, done, lease_lost), daemon=True)
+    heartbeat.start()
+
+    try:
+        processor = AudioProcessor(
+            output_dir=output_dir,
+            stems=stems,
+            checkpoint_segment_seconds=CHECKPOINT_SEGMENT_SECONDS
+        )
+
+        def progress_callback(progress_data):
+            progress_batcher.record(
+                job_id,
+                progress_data.get("progress", 0),
+                progress_data.get("raw", "Processing..."),
+                lease_owner=worker_id
+            )
+
+        result = processor.process(
+            input_path,
+            callback=progress_callback,
+            checkpoint_dir=CHECKPOINT_DIR / job_id,
+            output_name=job_id,
+            cancel_event=lease_lost
+        )
+        if lease_lost.is_set():
+            progress_batcher.discard(job_id)
+            print(f"[Worker] Aborted job {job_id} after losing its lease")
+            return
+        _record_metric(job_id, input_path, stems, result, processor.device)
+
+        if result.get("status") == "complete":
+            _finish(
+                status="completed",
+                progress=100,
+                message="Separation successful.",
+                stem_files=result.get("stems"),
+                audio_duration_seconds=result.get("audio_duration"),
+            )
+        else:
+            _finish(status="error", error=result.get("message", "Unknown error"))
+    except Exception as e:
+        if lease_lost.is_set():
+            progress_batcher.discard(job_id)
+        else:
+            _finish(status="error", error=str(e))
+    finally:
+        done.set()
+
+
+def run_worker(worker_id=None):
+    """
+    Queue-consumer daemon: claim jobs from the jobs table and separate them.
+
+    Each job is claimed with an atomic lease that a heartbeat thread renews.
+    Leases of crashed workers expire and are re-queued by any live worker, so
+    any number of workers can run on any number of hosts against one database.
+    """
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+    stopping = threading.Event()
+
+    def _request_stop(signum, frame):
+        print(f"[Worker] {worker_id} stopping after the current job...")
+        stopping.set()
+
+    signal.signal(signal.SIGTERM, _request_stop)
+    signal.signal(signal.SIGINT, _request_stop)
+
+    init_database()
+    progress_batcher = ProgressBatcher(db_writer, JOB_FLUSH_INTERVAL_SECONDS)
+    progress_batcher.start()
+    print(f"[Worker] {worker_id} polling for jobs every {WORKER_POLL_INTERVAL_SECONDS}s")
+
+    while not stopping.is_set():
+        claimed = None
+        db = get_db_session()
+        try:
+            job_repo = JobRepository(db)
+            recovered = job_repo.requeue_expired_leases(MAX_JOB_ATTEMPTS)
+            if recovered:
+                print(f"[Worker] Recovered {recovered} jobs with expired leases")
+
+            job = job_repo.claim_next_job(worker_id, WORKER_LEASE_SECONDS)
+            if job:
+                claimed = (job.id, job.input_path, job.output_dir, job.stems or 2)
+        except Exception as e:
+            db.rollback()
+            print(f"[Worker] Failed to claim a job: {e}")
+        finally:
+            db.close()
+
+        if not claimed:
+            stopping.wait(WORKER_POLL_INTERVAL_SECONDS)
+            continue
+
+        print(f"[Worker] {worker_id} claimed job {claimed[0]}")
+        run_claimed_job(*claimed, worker_id=worker_id, progress_batcher=progress_batcher)
+
+    progress_batcher.stop()
+    print(f"[Worker] {worker_id} stopped")
+
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
-    parser.add_argument("--input", required=True, help="Input audio file path")
-    parser.add_argument("--out", required=True, help="Output directory")
+    parser.add_argument("--input", help="Input audio file path")
+    parser.add_argument("--out", help="Output directory")
+    parser.add_argument("--daemon", action="store_true", help="Consume jobs from the database queue")
+    parser.add_argument("--worker-id", help="Worker ID used for job leases (default: host-pid)")
     args = parser.parse_args()
 
-    separate_audio(args.input, args.out)
+    if args.daemon:
+        run_worker(args.worker_id)
+    else:
+        if not args.input or not args.out:
+            parser.error("--input and --out are required unless --daemon is given")
+        separate_audio(args.input, args.out)